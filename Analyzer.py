@@ -0,0 +1,131 @@
+import bisect
+from collections import namedtuple
+
+from Disassembler import decode
+
+
+##############################
+# control flow analysis
+#
+# Recursive descent from the entry points: every command is decoded
+# once, jump and call targets and the command behind a conditional
+# jump, a call or a return start new blocks. Nothing is executed, so
+# JP (HL), JP (IX) and RET end a block without a known successor.
+# A call is expected to return to the next command.
+#
+# The result is a snapshot of the memory, after a write into the code
+# analyze() has to run again.
+
+# entry points besides the load origin
+rst_vectors = ( 0x00, 0x08, 0x10, 0x18, 0x20, 0x28, 0x30, 0x38)
+nmi_vector  = 0x66
+
+# start: first address, length: bytes, commands: number of commands,
+# kind: of the last command ( None, "jump", "call" or "return"),
+# successors: ( address, edge) with edge "next", "jump" or "call"
+Block = namedtuple( "Block", "start length commands kind successors")
+
+
+class Analyzer:
+    "basic blocks and their edges of a memory image"
+
+    def __init__( self, mem, start = 0, end = 0x10000):
+        # only commands in start..end are followed,
+        # edges leaving the range are kept
+        self.mem = mem
+        self.start = start
+        self.end = end
+        self.lines = {}       # address -> Disassembler Line
+        self.leaders = set()  # block starts
+        self.blocks = {}      # start -> Block
+        self.starts = []      # sorted block starts
+        self.predecessors = {}  # start -> list of block starts
+
+    def inside( self, address):
+        return self.start <= address < self.end
+
+    def vector_table( self, i):
+        # IM 2: the 128 vectors of the table at I * 256
+        return [ self.mem.read16( ( ( i << 8) + index) & 0xffff) for index in range( 0, 256, 2)]
+
+    def analyze( self, entries):
+        # add the code reached from entries, returns the number of blocks
+        lines = self.lines
+        leaders = self.leaders
+        work = []
+        for address in entries:
+            address &= 0xffff
+            if self.inside( address):
+                leaders.add( address)
+                work.append( address)
+
+        while work:
+            address = work.pop()
+            while address not in lines and self.inside( address):
+                line = decode( self.mem.read_block( address, 4), 0, address)
+                lines[ address] = line
+                for target in line.targets:
+                    if target not in leaders and self.inside( target):
+                        leaders.add( target)
+                        work.append( target)
+                address = ( address + line.length) & 0xffff
+                if line.kind is not None:
+                    if line.ends:
+                        break
+                    leaders.add( address)
+
+        self.build()
+        return len( self.blocks)
+
+    def build( self):
+        # blocks from the decoded commands, a leader in the middle of
+        # a block splits it
+        lines = self.lines
+        leaders = self.leaders
+        blocks = {}
+        predecessors = {}
+        for start in sorted( leaders):
+            if start not in lines:
+                continue
+            address = start
+            length = 0
+            commands = 0
+            while True:
+                line = lines[ address]
+                length += line.length
+                commands += 1
+                address = ( address + line.length) & 0xffff
+                if line.kind is not None or address in leaders or address not in lines:
+                    break
+            edge = "call" if line.kind == "call" else "jump"
+            successors = [ ( target, edge) for target in line.targets]
+            if not line.ends:
+                successors.append( ( address, "next"))
+            blocks[ start] = Block( start, length, commands, line.kind, tuple( successors))
+            for target, edge in successors:
+                predecessors.setdefault( target, []).append( start)
+        self.blocks = blocks
+        self.starts = sorted( blocks)
+        self.predecessors = predecessors
+
+    def block_of( self, address):
+        # the block holding address, None if the address is no known code
+        index = bisect.bisect_right( self.starts, address) - 1
+        if index < 0:
+            return None
+        block = self.blocks[ self.starts[ index]]
+        if address < block.start + block.length:
+            return block
+        return None
+
+    def edges( self):
+        # ( from, to, edge) of all blocks
+        return [ ( block.start, target, edge) for block in self.blocks.values()
+                 for target, edge in block.successors]
+
+    def dump( self):
+        for start in self.starts:
+            block = self.blocks[ start]
+            text = ", ".join( "%s %04X" % ( edge, target) for target, edge in block.successors)
+            print( "%04X-%04X %3d  %-6s %s" % ( start, start + block.length - 1, block.commands,
+                                                block.kind or "", text))
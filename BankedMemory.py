@@ -0,0 +1,201 @@
+from Memory import Memory
+
+
+##############################
+# banked memory
+#
+# The 64K address space is split into slots of page_size bytes, each slot
+# shows one page of a larger physical store. A bank switch only replaces
+# the view of one slot, nothing is copied. Pages can be marked as ROM,
+# writes into them are ignored.
+#
+# A page mapped into more than one slot at the same time is possible,
+# but decoded code is only invalidated at the address it was written to.
+
+class BankedMemory( Memory):
+
+    flat = False
+
+    def __init__( self, size = 0x20000, page_size = 0x4000):
+        if page_size & ( page_size - 1) or page_size < 0x100 or page_size > 0x10000:
+            raise ValueError( "page size 0x%X is not a power of 2 between 0x100 and 0x10000" % page_size)
+        if size < 0x10000 or size % page_size:
+            raise ValueError( "size 0x%X is not a multiple of the page size 0x%X or below 64K" % ( size, page_size))
+
+        self.physical  = bytearray( size)
+        self.page_size = page_size
+        self.shift     = page_size.bit_length() - 1
+        self.mask      = page_size - 1
+
+        view = memoryview( self.physical)
+        self.pages = [ view[ start : start + page_size] for start in range( 0, size, page_size)]
+        self.rom   = bytearray( len( self.pages))
+
+        # slot -> page, first pages mapped 1:1
+        self.mapping  = list( range( 0x10000 // page_size))
+        self.slots    = [ self.pages[ page] for page in self.mapping]
+        self.slot_rom = bytearray( len( self.slots))
+
+        # see Memory
+        self.code = bytearray( 65536)
+        self.listeners = {}
+        self.images = []
+
+    ##############################
+    # bank switching
+
+    def map( self, slot, page):
+        if self.mapping[ slot] == page:
+            return
+        self.mapping[ slot]  = page
+        self.slots[ slot]    = self.pages[ page]
+        self.slot_rom[ slot] = self.rom[ page]
+        self.invalidate_slot( slot)
+
+    def set_rom( self, page, rom = True):
+        self.rom[ page] = rom
+        for slot, mapped in enumerate( self.mapping):
+            if mapped == page:
+                self.slot_rom[ slot] = rom
+
+    def invalidate_slot( self, slot):
+        start = slot << self.shift
+        self.invalidate_range( start, start + self.page_size)
+
+    def invalidate_range( self, start, end):
+        if any( self.code[ start : end]):
+            for address in range( start, end):
+                if self.code[ address]:
+                    self.invalidate( address)
+
+    ##############################
+    # access by cpu address
+
+    def read( self, address):
+        return self.slots[ address >> self.shift][ address & self.mask]
+
+    __getitem__ = read
+
+    def read16( self, address):
+        val_lo = self.read( address)
+        val_hi = self.read( ( address + 1) & 0xffff)
+        value = ( val_hi << 8) + val_lo
+        return value
+
+    def read32( self, address):
+        value = self.read16( address) + ( self.read16( ( address + 2) & 0xffff) << 16)
+        return value
+
+    def write( self, address, data):
+        slot = address >> self.shift
+        if self.slot_rom[ slot]:
+            return
+        self.slots[ slot][ address & self.mask] = data
+        if self.code[ address]:
+            self.invalidate( address)
+
+    def write16( self, address, data):
+        address &= 0xffff
+        self.write( address, data & 0xff)
+        self.write( ( address + 1) & 0xffff, data >> 8)
+
+    def read_block( self, address, length):
+        # like Memory, one slice per slot
+        data = bytearray()
+        while length > 0:
+            start = address & self.mask
+            count = min( self.page_size - start, length)
+            data += self.slots[ address >> self.shift][ start : start + count]
+            address = ( address + count) & 0xffff
+            length -= count
+        return bytes( data)
+
+    def write_block( self, address, data):
+        # like Memory, but ROM slots are left alone
+        index = 0
+        while index < len( data):
+            slot  = address >> self.shift
+            start = address & self.mask
+            count = min( self.page_size - start, len( data) - index)
+            if not self.slot_rom[ slot]:
+                self.slots[ slot][ start : start + count] = data[ index : index + count]
+                self.invalidate_range( address, address + count)
+            address = ( address + count) & 0xffff
+            index  += count
+
+    def store( self, data, offset = 0):
+        # bulk write through the current mapping, ROM pages included
+        if offset < 0 or offset > 0xffff:
+            raise ValueError( "offset 0x%X outside of memory" % offset)
+        end = offset + len( data)
+        if end > 0x10000:
+            raise ValueError( "%i bytes at 0x%04X do not fit into memory" % ( len( data), offset))
+        index = 0
+        while offset < end:
+            slot  = offset >> self.shift
+            start = offset & self.mask
+            count = min( self.page_size - start, end - offset)
+            self.slots[ slot][ start : start + count] = data[ index : index + count]
+            offset += count
+            index  += count
+        self.invalidate_range( end - len( data), end)
+
+    ##############################
+    # access by page
+
+    def store_page( self, data, page, offset = 0):
+        # bulk write into the physical store, may span several pages
+        start = page * self.page_size + offset
+        if page < 0 or offset < 0 or start + len( data) > len( self.physical):
+            raise ValueError( "%i bytes at page %i + 0x%X do not fit into memory" % ( len( data), page, offset))
+        self.physical[ start : start + len( data)] = data
+        first, last = self.page_range( start, len( data))
+        for slot, mapped in enumerate( self.mapping):
+            if first <= mapped <= last:
+                self.invalidate_slot( slot)
+
+    def page_range( self, start, length):
+        # first and last page of length bytes at physical address start
+        return start // self.page_size, ( start + length - 1) // self.page_size
+
+    def load_page( self, filename, page, offset = 0, length = -1, rom = False):
+        with open( filename, 'rb') as file:
+            binary_data = file.read( length)
+        self.store_page( binary_data, page, offset)
+        if rom:
+            first, last = self.page_range( page * self.page_size + offset, len( binary_data))
+            for index in range( first, last + 1):
+                self.set_rom( index)
+
+        print( "report: load %i bytes into page %i at 0x%04X" % ( len( binary_data), page, offset))
+
+
+
+##############################
+# bank select port
+#
+# OUT to the port maps page data into slot, IN returns the current page
+
+class BankSelect:
+    "bank select port"
+
+    # the value only changes by write()
+    stable_read = True
+
+    def __init__( self, memory, address, slot, mask = 0xff):
+        self.memory  = memory
+        self.address = address
+        self.slot    = slot
+        # OUT (C),r puts B on the upper address lines
+        self.mask    = mask
+
+    def read( self, address):
+        if ( address & self.mask) == self.address:
+            return self.memory.mapping[ self.slot]
+
+    def write( self, address, data):
+        if ( address & self.mask) == self.address:
+            self.memory.map( self.slot, data % len( self.memory.pages))
+
+    def dump( self):
+        print( "BANK %04X: slot %i = page %i" % ( self.address, self.slot, self.memory.mapping[ self.slot]))
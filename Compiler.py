@@ -0,0 +1,412 @@
+##############################
+# basic block compiler
+#
+# Translates straight-line Z80 code starting at a PC into one Python
+# function. The registers live in local variables, immediates are folded
+# into the source and there is no dispatch per instruction. A block ends
+# with the first jump, call or return, or before the first command the
+# compiler does not know. Commands the compiler does not know are run by
+# Register.execute.
+#
+# Compiled blocks are kept until one of their bytes is written.
+
+from Flags import szp, and_flags, inc_flags, dec_flags
+from Flags import adc_result, adc_flags, sbc_result, sbc_flags, cp_flags
+from Register import main_length, main_cycles
+
+
+# 8 bit registers in opcode order: B C D E H L (HL) A
+reg_get = ( "( bc >> 8)", "( bc & 0xff)", "( de >> 8)", "( de & 0xff)",
+            "( hl >> 8)", "( hl & 0xff)", "m[ hl]", "a")
+reg_set = ( "bc = ( bc & 0x00ff) | ( %s << 8)", "bc = ( bc & 0xff00) | %s",
+            "de = ( de & 0x00ff) | ( %s << 8)", "de = ( de & 0xff00) | %s",
+            "hl = ( hl & 0x00ff) | ( %s << 8)", "hl = ( hl & 0xff00) | %s",
+            None, "a = %s")
+
+# 16 bit registers in opcode order
+pair_names = ( "bc", "de", "hl", "sp")
+
+# conditions in opcode order: NZ Z NC C PO PE P M
+conditions = ( "not f & 0x40", "f & 0x40", "not f & 0x01", "f & 0x01",
+               "not f & 0x04", "f & 0x04", "not f & 0x80", "f & 0x80")
+
+# ALU commands in opcode order: ADD ADC SUB SBC AND XOR OR CP
+alu_source = (
+    ( "i = ( a << 8) | %s", "a = adc_result[ i]", "f = adc_flags[ i]"),
+    ( "i = ( ( f & 0x01) << 16) | ( a << 8) | %s", "a = adc_result[ i]", "f = adc_flags[ i]"),
+    ( "i = ( a << 8) | %s", "a = sbc_result[ i]", "f = sbc_flags[ i]"),
+    ( "i = ( ( f & 0x01) << 16) | ( a << 8) | %s", "a = sbc_result[ i]", "f = sbc_flags[ i]"),
+    ( "a &= %s", "f = and_flags[ a]"),
+    ( "a ^= %s", "f = szp[ a]"),
+    ( "a |= %s", "f = szp[ a]"),
+    ( "f = cp_flags[ ( a << 8) | %s]",),
+    )
+
+# registers a block may touch, loaded at the start and stored at the end
+block_registers = ( "a", "f", "bc", "de", "hl", "sp")
+
+# tables visible in the compiled code
+block_globals = {
+    "szp": szp, "and_flags": and_flags,
+    "inc_flags": inc_flags, "dec_flags": dec_flags,
+    "adc_result": adc_result, "adc_flags": adc_flags,
+    "sbc_result": sbc_result, "sbc_flags": sbc_flags, "cp_flags": cp_flags,
+    }
+
+
+class BlockCompiler:
+    "translate basic blocks into python functions"
+
+    def __init__( self, max_commands = 64, verbose = False):
+        self.max_commands = max_commands
+        self.verbose = verbose
+        self.blocks = {}      # pc -> function, None if not compilable
+        self.sources = {}     # pc -> generated source
+        self.owners = {}      # address -> set of block start addresses
+        self.mem = None
+
+    def attach( self, mem):
+        # forget everything compiled from another memory
+        if self.mem is not None:
+            self.mem.remove_listener( self.invalidate)
+        self.blocks = {}
+        self.sources = {}
+        self.owners = {}
+        self.mem = mem
+        mem.add_listener( self.invalidate)
+
+    def invalidate( self, address):
+        starts = self.owners.pop( address, None)
+        if starts is None:
+            return
+        for start in starts:
+            self.blocks.pop( start, None)
+            self.sources.pop( start, None)
+
+    def prepare( self, mem, starts):
+        # compile ahead, e.g. the block starts of an Analyzer,
+        # returns the number of compiled blocks
+        if mem is not self.mem:
+            self.attach( mem)
+        count = 0
+        for start in starts:
+            if start not in self.blocks and self.compile( mem, start) is not None:
+                count += 1
+        return count
+
+    def step( self, cpu, mem, ios):
+        # run one block, or one command on the interpreter
+        # returns the number of executed commands
+        if mem is not self.mem:
+            self.attach( mem)
+        pc = cpu.pc
+        if pc in self.blocks:
+            block = self.blocks[ pc]
+        else:
+            block = self.compile( mem, pc)
+        if block is None:
+            cpu.execute( mem, ios, False)
+            return 1
+        return block( cpu, mem, ios)
+
+
+    ##############################
+    # translation
+
+    def compile( self, mem, start):
+        # banked memory reads through mem[ address]
+        if mem.flat:
+            m = mem.mem
+        else:
+            m = mem
+        lines = []
+        pc = start
+        count = 0
+        cycles = 0
+        jump = False
+        while count < self.max_commands:
+            cmd = m[ pc]
+            length = main_length[ cmd]
+            if pc + length > 0x10000:
+                break
+            code = self.translate( m, pc, cmd)
+            if code is None:
+                break
+            count += 1
+            cycles += main_cycles[ cmd]
+            lines.append( "    # %04X" % pc)
+            pc += length
+            body, jump = code
+            for line in body:
+                if line.startswith( "WRITE "):
+                    # see source()
+                    line = "WRITE %d %d %d %s" % ( count, cycles, pc, line[ 6:])
+                lines.append( "    " + line)
+            if jump:
+                break
+
+        end = pc
+        if count == 0:
+            # remember the failure until the bytes change
+            end = start + main_length[ m[ start]]
+            self.own( mem, start, end)
+            self.blocks[ start] = None
+            return None
+
+        if not jump:
+            lines.append( "    pc = 0x%04X" % ( end & 0xffff))
+        source = self.source( start, end, count, cycles, lines, mem.flat)
+        namespace = dict( block_globals)
+        exec( compile( source, "<block %04X>" % start, "exec"), namespace)
+        block = namespace[ "block"]
+
+        self.own( mem, start, end)
+        self.blocks[ start] = block
+        self.sources[ start] = source
+        if self.verbose:
+            print( source)
+        return block
+
+    def own( self, mem, start, end):
+        for address in range( start, end):
+            self.owners.setdefault( address & 0xffff, set()).add( start)
+        mem.mark_code( start, end - start)
+
+    def source( self, start, end, count, cycles, lines, flat = True):
+        # "WRITE done cycles next_pc address" leaves the block after a
+        # write into the block itself, done commands with their T-states
+        # are executed then
+        text = []
+        text.append( "def block( cpu, mem, ios):")
+        if flat:
+            text.append( "    m = mem.mem")
+        else:
+            text.append( "    m = mem")
+        text.append( "    write = mem.write")
+        for name in block_registers:
+            text.append( "    %s = cpu.%s" % ( name, name))
+        for line in lines:
+            if line.strip().startswith( "WRITE"):
+                indent = line[ : len( line) - len( line.lstrip())]
+                done, done_cycles, next_pc, address = line.split( None, 4)[ 1:]
+                text.append( "%sif 0x%04X <= %s < 0x%04X:" % ( indent, start, address, end))
+                text.append( "%s    pc = 0x%04X" % ( indent, int( next_pc) & 0xffff))
+                text.extend( self.epilogue( indent + "    ", int( done), int( done_cycles)))
+            else:
+                text.append( line)
+        text.extend( self.epilogue( "    ", count, cycles))
+        return "\n".join( text) + "\n"
+
+    def epilogue( self, indent, count, cycles):
+        text = []
+        for name in block_registers:
+            text.append( "%scpu.%s = %s" % ( indent, name, name))
+        text.append( "%scpu.pc = pc" % indent)
+        text.append( "%scpu.cycles += %d" % ( indent, cycles))
+        text.append( "%scpu.r = ( cpu.r & 0x80) | ( ( cpu.r + %d) & 0x7f)" % ( indent, count))
+        text.append( "%sreturn %d" % ( indent, count))
+        return text
+
+    def translate( self, m, pc, cmd):
+        # returns ( lines, ends_block) or None if unknown
+        n  = m[ ( pc + 1) & 0xffff]
+        nn = n | ( m[ ( pc + 2) & 0xffff] << 8)
+        # displacement of relative jumps
+        e = n - 256 if n > 127 else n
+        # NOP
+        if cmd == 0x00:
+            return [], False
+
+        # LD r,r' / LD r,(HL) / LD (HL),r
+        if 0x40 <= cmd <= 0x7f and cmd != 0x76:
+            dst = ( cmd >> 3) & 7
+            src = cmd & 7
+            return self.store( dst, reg_get[ src]), False
+
+        # LD r,n
+        if cmd & 0xc7 == 0x06:
+            return self.store( ( cmd >> 3) & 7, "0x%02X" % n), False
+
+        # INC r / DEC r
+        if cmd & 0xc7 == 0x04 or cmd & 0xc7 == 0x05:
+            reg = ( cmd >> 3) & 7
+            if cmd & 1:
+                lines = [ "v = %s" % reg_get[ reg],
+                          "f = ( f & 0x01) | dec_flags[ v]"]
+                value = "( ( v - 1) & 0xff)"
+            else:
+                lines = [ "v = %s" % reg_get[ reg],
+                          "f = ( f & 0x01) | inc_flags[ v]"]
+                value = "( ( v + 1) & 0xff)"
+            return lines + self.store( reg, value), False
+
+        # LD rr,nn
+        if cmd & 0xcf == 0x01:
+            return [ "%s = 0x%04X" % ( pair_names[ cmd >> 4], nn)], False
+
+        # INC rr / DEC rr
+        if cmd & 0xcf == 0x03:
+            pair = pair_names[ cmd >> 4]
+            return [ "%s = ( %s + 1) & 0xffff" % ( pair, pair)], False
+        if cmd & 0xcf == 0x0b:
+            pair = pair_names[ cmd >> 4]
+            return [ "%s = ( %s - 1) & 0xffff" % ( pair, pair)], False
+
+        # ALU A,r and ALU A,n
+        if 0x80 <= cmd <= 0xbf:
+            source = reg_get[ cmd & 7]
+            return [ line % source if "%s" in line else line for line in alu_source[ ( cmd >> 3) & 7]], False
+        if cmd & 0xc7 == 0xc6:
+            source = "0x%02X" % n
+            return [ line % source if "%s" in line else line for line in alu_source[ ( cmd >> 3) & 7]], False
+
+        # LD (BC),A / LD (DE),A
+        if cmd == 0x02 or cmd == 0x12:
+            pair = pair_names[ cmd >> 4]
+            return [ "write( %s, a)" % pair, "WRITE %s" % pair], False
+
+        # LD A,(BC) / LD A,(DE)
+        if cmd == 0x0a or cmd == 0x1a:
+            return [ "a = m[ %s]" % pair_names[ cmd >> 4]], False
+
+        # LD (nn),A / LD A,(nn)
+        if cmd == 0x32:
+            return [ "write( 0x%04X, a)" % nn, "WRITE 0x%04X" % nn], False
+        if cmd == 0x3a:
+            return [ "a = m[ 0x%04X]" % nn], False
+
+        # LD (nn),HL / LD HL,(nn)
+        if cmd == 0x22 and nn < 0xffff:
+            return [ "write( 0x%04X, hl & 0xff)" % nn,
+                     "write( 0x%04X, hl >> 8)" % ( nn + 1),
+                     "WRITE 0x%04X" % nn,
+                     "WRITE 0x%04X" % ( nn + 1)], False
+        if cmd == 0x2a and nn < 0xffff:
+            return [ "hl = m[ 0x%04X] | ( m[ 0x%04X] << 8)" % ( nn, nn + 1)], False
+
+        # EX DE,HL
+        if cmd == 0xeb:
+            return [ "de, hl = hl, de"], False
+
+        # EXX
+        if cmd == 0xd9:
+            return [ "bc, cpu.bc_ = cpu.bc_, bc",
+                     "de, cpu.de_ = cpu.de_, de",
+                     "hl, cpu.hl_ = cpu.hl_, hl"], False
+
+        # EX AF,AF'
+        if cmd == 0x08:
+            return [ "a, cpu.a_ = cpu.a_, a",
+                     "f, cpu.f_ = cpu.f_, f"], False
+
+        # CPL, SCF, CCF
+        if cmd == 0x2f:
+            return [ "a ^= 0xff", "f |= 0x12"], False
+        if cmd == 0x37:
+            return [ "f = ( f & 0xed) | 0x01"], False
+        if cmd == 0x3f:
+            return [ "f = ( f ^ 0x01) & 0xfd"], False
+
+        # RLCA, RRCA, RLA, RRA, S Z P/V are kept, H and N reset
+        if cmd == 0x07:
+            return [ "c = a >> 7", "a = ( ( a << 1) & 0xff) | c", "f = ( f & 0xc4) | ( a & 0x28) | c"], False
+        if cmd == 0x0f:
+            return [ "c = a & 0x01", "a = ( a >> 1) | ( c << 7)", "f = ( f & 0xc4) | ( a & 0x28) | c"], False
+        if cmd == 0x17:
+            return [ "c = a >> 7", "a = ( ( a << 1) & 0xff) | ( f & 0x01)", "f = ( f & 0xc4) | ( a & 0x28) | c"], False
+        if cmd == 0x1f:
+            return [ "c = a & 0x01", "a = ( a >> 1) | ( ( f & 0x01) << 7)", "f = ( f & 0xc4) | ( a & 0x28) | c"], False
+
+        # PUSH rr / POP rr
+        if cmd & 0xcf == 0xc5:
+            if cmd == 0xf5:
+                value = "( a << 8) | f"
+            else:
+                value = pair_names[ ( cmd >> 4) & 3]
+            return [ "sp = ( sp - 2) & 0xffff",
+                     "v = %s" % value,
+                     "write( sp, v & 0xff)",
+                     "write( ( sp + 1) & 0xffff, v >> 8)",
+                     "WRITE sp",
+                     "WRITE ( sp + 1) & 0xffff"], False
+        if cmd & 0xcf == 0xc1:
+            lines = [ "v = m[ sp] | ( m[ ( sp + 1) & 0xffff] << 8)",
+                      "sp = ( sp + 2) & 0xffff"]
+            if cmd == 0xf1:
+                lines += [ "a = v >> 8", "f = v & 0xff"]
+            else:
+                lines += [ "%s = v" % pair_names[ ( cmd >> 4) & 3]]
+            return lines, False
+
+        # LD SP,HL
+        if cmd == 0xf9:
+            return [ "sp = hl"], False
+
+        # jumps, calls and returns end the block
+        next_pc = ( pc + main_length[ cmd]) & 0xffff
+        target = ( pc + 2 + e) & 0xffff
+
+        # JR e / JR cc,e
+        if cmd == 0x18:
+            return [ "pc = 0x%04X" % target], True
+        if cmd in ( 0x20, 0x28, 0x30, 0x38):
+            return self.branch( conditions[ ( cmd >> 3) & 3], target, next_pc, 5), True
+
+        # DJNZ e, flags stay
+        if cmd == 0x10:
+            return [ "bc = ( bc - 0x100) & 0xffff"] + \
+                   self.branch( "bc >> 8", target, next_pc, 5), True
+
+        # JP nn / JP cc,nn / JP (HL)
+        if cmd == 0xc3:
+            return [ "pc = 0x%04X" % nn], True
+        if cmd & 0xc7 == 0xc2:
+            return self.branch( conditions[ ( cmd >> 3) & 7], nn, next_pc), True
+        if cmd == 0xe9:
+            return [ "pc = hl"], True
+
+        # CALL nn / CALL cc,nn
+        if cmd == 0xcd:
+            return self.call( nn, next_pc), True
+        if cmd & 0xc7 == 0xc4:
+            lines = [ "if %s:" % conditions[ ( cmd >> 3) & 7]]
+            lines += [ "    " + line for line in self.call( nn, next_pc)]
+            lines += [ "    cpu.cycles += 7"]
+            lines += [ "else:", "    pc = 0x%04X" % next_pc]
+            return lines, True
+
+        # RET / RET cc
+        if cmd == 0xc9:
+            return self.ret(), True
+        if cmd & 0xc7 == 0xc0:
+            lines = [ "if %s:" % conditions[ ( cmd >> 3) & 7]]
+            lines += [ "    " + line for line in self.ret()]
+            lines += [ "    cpu.cycles += 6"]
+            lines += [ "else:", "    pc = 0x%04X" % next_pc]
+            return lines, True
+
+        return None
+
+    def store( self, reg, value):
+        if reg == 6:
+            return [ "write( hl, %s)" % value, "WRITE hl"]
+        return [ reg_set[ reg] % value]
+
+    def branch( self, condition, target, next_pc, taken = 0):
+        # taken: T-states more when the jump is taken
+        lines = [ "if %s:" % condition,
+                  "    pc = 0x%04X" % target]
+        if taken:
+            lines.append( "    cpu.cycles += %d" % taken)
+        return lines + [ "else:", "    pc = 0x%04X" % next_pc]
+
+    def call( self, target, next_pc):
+        # a write into the block does not matter, the block ends here
+        return [ "sp = ( sp - 2) & 0xffff",
+                 "write( sp, 0x%02X)" % ( next_pc & 0xff),
+                 "write( ( sp + 1) & 0xffff, 0x%02X)" % ( next_pc >> 8),
+                 "pc = 0x%04X" % target]
+
+    def ret( self):
+        return [ "pc = m[ sp] | ( m[ ( sp + 1) & 0xffff] << 8)",
+                 "sp = ( sp + 2) & 0xffff"]
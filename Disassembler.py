@@ -0,0 +1,190 @@
+from collections import namedtuple, OrderedDict
+
+from Spec import main_spec, cb_spec, ed_spec, cond_names
+from Spec import dd_spec, fd_spec, ddcb_spec, fdcb_spec
+
+
+##############################
+# disassembler
+#
+# Decodes memory without a cpu, nothing is executed. The texts come
+# from the instruction specification, the DD/FD pages are derived from
+# the unprefixed one like in Register:
+#   (HL) becomes (IX+d), there H and L stay,
+#   HL, H and L become IX, IXH and IXL,
+#   EX DE,HL and EXX keep HL.
+# A DD or FD in front of DD, ED or FD counts as a NOP of one byte.
+#
+# The operands are decoded in text order:
+#   n   byte
+#   nn  word
+#   d   index offset, signed
+#   e   relative jump, decoded and shown as the absolute target
+
+# address: of the first byte, mnemonic: text with the operands filled in,
+# operands: values in text order, targets: addresses a jump, call or RST
+# may go to (not the next command, not RET and JP (HL)),
+# kind: None, "jump", "call" or "return",
+# ends: the next command is never reached from here
+Line = namedtuple( "Line", "address length mnemonic operands targets kind ends")
+
+# page entry: ( text, operand kinds, offset of the first operand,
+#               length, kind, ends, operand index of the target, fixed target)
+
+jump_kinds = { "JP": "jump", "JR": "jump", "DJNZ": "jump",
+               "CALL": "call", "RST": "call",
+               "RET": "return", "RETI": "return", "RETN": "return"}
+
+
+def entry( text, operands, offset, length):
+    # the relative jump is shown as its target
+    if "e" in operands:
+        text = text.replace( "%+i", "0%04Xh")
+    word, _, rest = text.partition( " ")
+    kind = jump_kinds.get( word)
+    first = rest.split( ",")[ 0].strip()
+    conditional = first in cond_names and word not in ( "RST", "CALL")
+    ends = kind in ( "jump", "return") and not conditional and word != "DJNZ"
+    target = None
+    fixed = None
+    if word == "RST":
+        fixed = int( rest.rstrip( "h"), 16)
+    elif kind is not None:
+        for index, operand in enumerate( operands):
+            if operand in ( "e", "nn"):
+                target = index
+    return ( text, tuple( operands), offset, length, kind, ends, target, fixed)
+
+def build_main():
+    # None for the prefixes
+    table = []
+    for item in main_spec:
+        if item.code in ( 0xcb, 0xdd, 0xed, 0xfd):
+            table.append( None)
+        else:
+            table.append( entry( item.text, item.operands, 1, item.length))
+    return table
+
+def build_page( spec):
+    return [ entry( item.text, item.operands, 2, item.length) for item in spec]
+
+def build_index( spec):
+    # DDCB is in its own table, the other prefixes end the one before
+    table = build_page( spec)
+    for code in ( 0xcb, 0xdd, 0xed, 0xfd):
+        table[ code] = entry( "NOP", (), 1, 1)
+    return table
+
+main_entries = build_main()
+cb_entries   = build_page( cb_spec)
+ed_entries   = build_page( ed_spec)
+dd_entries   = build_index( dd_spec)
+fd_entries   = build_index( fd_spec)
+ddcb_entries = build_page( ddcb_spec)
+fdcb_entries = build_page( fdcb_spec)
+
+
+def decode( data, index, address):
+    # the command at data[ index], data holds at least 4 bytes from there
+    code = data[ index]
+    item = main_entries[ code]
+    if item is None:
+        follow = data[ index + 1]
+        if code == 0xcb:
+            item = cb_entries[ follow]
+        elif code == 0xed:
+            item = ed_entries[ follow]
+        elif follow == 0xcb:
+            item = ( ddcb_entries if code == 0xdd else fdcb_entries)[ data[ index + 3]]
+        else:
+            item = ( dd_entries if code == 0xdd else fd_entries)[ follow]
+    text, kinds, offset, length, kind, ends, target, fixed = item
+
+    values = []
+    position = index + offset
+    for operand in kinds:
+        value = data[ position]
+        if operand == "n":
+            position += 1
+        elif operand == "nn":
+            value |= data[ position + 1] << 8
+            position += 2
+        else:
+            if value > 127:
+                value -= 256
+            if operand == "e":
+                value = ( address + length + value) & 0xffff
+            position += 1
+        values.append( value)
+    values = tuple( values)
+
+    if fixed is not None:
+        targets = ( fixed,)
+    elif target is not None:
+        targets = ( values[ target],)
+    else:
+        targets = ()
+    if values:
+        text = text % values
+    return Line( address, length, text, values, targets, kind, ends)
+
+
+class Disassembler:
+    "decode commands of a memory without executing them"
+
+    def __init__( self, mem, cache_size = 4096):
+        self.mem = mem
+        self.cache_size = cache_size
+        # ( address, 4 bytes from there) -> Line, last used at the end
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def line( self, address):
+        # one command, cached, a changed byte gives another key
+        address &= 0xffff
+        data = self.mem.read_block( address, 4)
+        key = ( address, data)
+        cache = self.cache
+        result = cache.get( key)
+        if result is not None:
+            cache.move_to_end( key)
+            self.hits += 1
+            return result
+        self.misses += 1
+        result = decode( data, 0, address)
+        cache[ key] = result
+        if len( cache) > self.cache_size:
+            cache.popitem( last = False)
+        return result
+
+    def disassemble( self, start = 0, end = 0x10000):
+        # commands from start up to end, the last one may reach behind
+        # end. The range is read in one go and not cached, it wraps
+        # around at 0xffff like the cpu.
+        start &= 0xffff
+        if end <= start:
+            end += 0x10000
+        data = self.mem.read_block( start, end - start + 3)
+        lines = []
+        index = 0
+        count = end - start
+        while index < count:
+            result = decode( data, index, ( start + index) & 0xffff)
+            lines.append( result)
+            index += result.length
+        return lines
+
+    def listing( self, start = 0, end = 0x10000):
+        # text lines: address, bytes and mnemonic
+        lines = []
+        for result in self.disassemble( start, end):
+            data = self.mem.read_block( result.address, result.length)
+            code = " ".join( "%02X" % value for value in data)
+            lines.append( "%04X: %-12s %s" % ( result.address, code, result.mnemonic))
+        return lines
+
+    def clear( self):
+        self.cache.clear()
+        self.hits = 0
+        self.misses = 0
@@ -0,0 +1,158 @@
+##############################
+# flag lookup tables
+#
+# All tables are built once at import. The big ALU tables are indexed by
+#   ( carry_in << 16) | ( a << 8) | b
+# and hold the 8 bit result and the complete F register of the operation.
+# The rotate and shift tables of the CB page are indexed by
+#   ( operation << 9) | ( carry_in << 8) | value
+
+
+# flag masks, same bit numbers as Register.flag_*
+mask_carry = 0x01
+mask_sub   = 0x02
+mask_par   = 0x04
+mask_tree  = 0x08
+mask_half  = 0x10
+mask_five  = 0x20
+mask_zero  = 0x40
+mask_sign  = 0x80
+
+
+# half carry and overflow, MAME style:
+# index = ( ( a & 0x88) >> 3) | ( ( b & 0x88) >> 2) | ( ( result & 0x88) >> 1)
+# bits 0..2 select the half carry case, bits 4..6 the overflow case
+half_add     = bytes( [ 0, mask_half, mask_half, mask_half, 0, 0, 0, mask_half])
+half_sub     = bytes( [ 0, 0, mask_half, 0, mask_half, 0, mask_half, mask_half])
+overflow_add = bytes( [ 0, 0, 0, mask_par, mask_par, 0, 0, 0])
+overflow_sub = bytes( [ 0, mask_par, 0, 0, 0, 0, mask_par, 0])
+
+
+def build_sz():
+    table = bytearray( 256)
+    for value in range( 256):
+        flags = value & ( mask_sign | mask_five | mask_tree)
+        if value == 0:
+            flags |= mask_zero
+        table[ value] = flags
+    return bytes( table)
+
+def build_szp():
+    table = bytearray( 256)
+    for value in range( 256):
+        flags = sz[ value]
+        if bin( value).count( "1") % 2 == 0:
+            flags |= mask_par
+        table[ value] = flags
+    return bytes( table)
+
+def build_and():
+    # AND always sets H
+    return bytes( [ flags | mask_half for flags in szp])
+
+def build_inc():
+    # without carry, INC keeps C
+    table = bytearray( 256)
+    for value in range( 256):
+        result = ( value + 1) & 0xff
+        flags = sz[ result]
+        if value & 0x0f == 0x0f:
+            flags |= mask_half
+        if value == 0x7f:
+            flags |= mask_par
+        table[ value] = flags
+    return bytes( table)
+
+def build_dec():
+    # without carry, DEC keeps C
+    table = bytearray( 256)
+    for value in range( 256):
+        result = ( value - 1) & 0xff
+        flags = sz[ result] | mask_sub
+        if value & 0x0f == 0x00:
+            flags |= mask_half
+        if value == 0x80:
+            flags |= mask_par
+        table[ value] = flags
+    return bytes( table)
+
+def build_adc():
+    result_table = bytearray( 0x20000)
+    flag_table   = bytearray( 0x20000)
+    for carry in range( 2):
+        for a in range( 256):
+            index = ( carry << 16) | ( a << 8)
+            for b in range( 256):
+                full = a + b + carry
+                result = full & 0xff
+                lookup = ( ( a & 0x88) >> 3) | ( ( b & 0x88) >> 2) | ( ( result & 0x88) >> 1)
+                flags = sz[ result] | half_add[ lookup & 0x07] | overflow_add[ lookup >> 4]
+                if full > 0xff:
+                    flags |= mask_carry
+                result_table[ index + b] = result
+                flag_table[ index + b] = flags
+    return bytes( result_table), bytes( flag_table)
+
+def build_sbc():
+    result_table = bytearray( 0x20000)
+    flag_table   = bytearray( 0x20000)
+    for carry in range( 2):
+        for a in range( 256):
+            index = ( carry << 16) | ( a << 8)
+            for b in range( 256):
+                full = a - b - carry
+                result = full & 0xff
+                lookup = ( ( a & 0x88) >> 3) | ( ( b & 0x88) >> 2) | ( ( result & 0x88) >> 1)
+                flags = sz[ result] | mask_sub | half_sub[ lookup & 0x07] | overflow_sub[ lookup >> 4]
+                if full < 0:
+                    flags |= mask_carry
+                result_table[ index + b] = result
+                flag_table[ index + b] = flags
+    return bytes( result_table), bytes( flag_table)
+
+def build_cp():
+    # like SUB without carry in, but bits 5 and 3 are copied from the operand
+    table = bytearray( 0x10000)
+    for a in range( 256):
+        for b in range( 256):
+            index = ( a << 8) | b
+            flags = sbc_flags[ index] & ~( mask_five | mask_tree)
+            table[ index] = flags | ( b & ( mask_five | mask_tree))
+    return bytes( table)
+
+def build_shift():
+    # CB rotate and shift commands in opcode order RLC RRC RL RR SLA SRA SLS SRL,
+    # index = ( operation << 9) | ( carry_in << 8) | value
+    # H and N are cleared, C is the bit shifted out
+    result_table = bytearray( 0x1000)
+    flag_table   = bytearray( 0x1000)
+    for operation in range( 8):
+        for carry in range( 2):
+            for value in range( 256):
+                if operation & 1:
+                    out = value & 0x01
+                    fill = ( out, carry, value >> 7, 0)[ operation >> 1]
+                    result = ( value >> 1) | ( fill << 7)
+                else:
+                    out = value >> 7
+                    fill = ( out, carry, 0, 1)[ operation >> 1]
+                    result = ( ( value << 1) & 0xff) | fill
+                index = ( operation << 9) | ( carry << 8) | value
+                result_table[ index] = result
+                flag_table[ index] = szp[ result] | out
+    return bytes( result_table), bytes( flag_table)
+
+
+sz  = build_sz()
+szp = build_szp()
+and_flags = build_and()
+
+inc_flags = build_inc()
+dec_flags = build_dec()
+
+# ADD uses the lower half (carry in = 0) of the ADC tables, SUB of the SBC tables
+adc_result, adc_flags = build_adc()
+sbc_result, sbc_flags = build_sbc()
+cp_flags = build_cp()
+
+shift_result, shift_flags = build_shift()
@@ -0,0 +1,105 @@
+##############################
+# I/O bus
+#
+# A table with one entry per 16 bit port address points to the device
+# which owns the port, so IN and OUT cost the same for any number of
+# devices. A device needs read( address), write( address, data) and
+# dump(), like IOtest. Ports nobody owns read as open_bus.
+#
+# A device with stable_read = True promises that a read has no side
+# effect and returns the same value until the device is written or one
+# of its scheduled events runs. All other reads are counted in
+# volatile_reads, the idle loop detection of Register looks at it.
+
+class IOBus:
+    "port indexed I/O bus"
+
+    def __init__( self, open_bus = 0xff):
+        self.open_bus = open_bus
+        self.ports    = [ None] * 65536
+        self.stable   = bytearray( b"\x01") * 65536
+        self.volatile_reads = 0
+        # device -> list of its ports, in order of registration
+        self.devices  = {}
+
+    def register( self, device, ports = None):
+        if ports is None:
+            ports = device_ports( device)
+        ports = list( ports)
+        for port in ports:
+            owner = self.ports[ port]
+            if owner is not None and owner is not device:
+                raise ValueError( "port %04X already used by %r" % ( port, owner))
+        stable = getattr( device, "stable_read", False)
+        for port in ports:
+            self.ports[ port]  = device
+            self.stable[ port] = stable
+        self.devices.setdefault( device, []).extend( ports)
+
+    def unregister( self, device):
+        for port in self.devices.pop( device, []):
+            self.ports[ port]  = None
+            self.stable[ port] = 1
+
+    def read( self, port):
+        device = self.ports[ port]
+        if device is None:
+            return self.open_bus
+        if not self.stable[ port]:
+            self.volatile_reads += 1
+        value = device.read( port)
+        if value is None:
+            return self.open_bus
+        return value
+
+    def write( self, port, data):
+        device = self.ports[ port]
+        if device is not None:
+            device.write( port, data)
+
+    # block accesses for INIR, OTIR and friends, one port per byte.
+    # A device may take the whole block with read_block( ports) and
+    # write_block( ports, data), when it owns all ports of it.
+
+    def read_block( self, ports):
+        device = self.block_device( ports)
+        if device is not None and hasattr( device, "read_block"):
+            if not getattr( device, "stable_read", False):
+                self.volatile_reads += 1
+            return bytes( device.read_block( ports))
+        read = self.read
+        return bytes( [ read( port) for port in ports])
+
+    def write_block( self, ports, data):
+        device = self.block_device( ports)
+        if device is not None and hasattr( device, "write_block"):
+            device.write_block( ports, data)
+            return
+        write = self.write
+        for port, value in zip( ports, data):
+            write( port, value)
+
+    def block_device( self, ports):
+        # the only device of all ports, else None
+        table  = self.ports
+        device = table[ ports[ 0]]
+        for port in ports:
+            if table[ port] is not device:
+                return None
+        return device
+
+    def __iter__( self):
+        return iter( self.devices)
+
+    def dump( self):
+        for device in self.devices:
+            device.dump()
+
+
+def device_ports( device):
+    # all port addresses a device answers on, devices with a mask
+    # ignore the address bits outside of it
+    mask = getattr( device, "mask", 0xffff)
+    if mask == 0xffff:
+        return [ device.address]
+    return [ port for port in range( 65536) if ( port & mask) == device.address]
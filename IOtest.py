@@ -1,6 +1,9 @@
 class IOtest:
     "IO tester"
 
+    # the value only changes by write()
+    stable_read = True
+
     def __init__( self, address, value = 0, verbose = False):
         self.address = address
         self.value = value
@@ -15,7 +18,7 @@ class IOtest:
     def write( self, address, data):
         if self.address == address:
             if self.verbose:
-                print = ( "IO write %04X = %02X" % ( address, data))
+                print( "IO write %04X = %02X" % ( address, data))
             self.value = data
 
     def dump( self):
@@ -1,27 +1,92 @@
+import mmap
+import os
+import types
+import weakref
+
+
 class Memory:
 
+    # one bytearray, mem[ address] is the byte at address
+    flat = True
+
     def __init__( self):
         self.mem = bytearray( 65536)
+        # marks bytes of decoded instructions, see invalidate()
+        self.code = bytearray( 65536)
+        self.listeners = {}
+        # mapped images, see load_mmap()
+        self.images = []
 
 
     def load( self, filename, offset = 0, length = -1):
         with open( filename, 'rb') as file:
-            binary_data = file.read()
-            index = 0
-            for by in binary_data:
-                if length == 0:
-                    break
-                length -= 1
-                self.mem[ index + offset] = by
-                index += 1
+            binary_data = file.read( length)
+        self.store( binary_data, offset)
+
+        print( "report: load %i bytes from 0x%04X to 0x%04X" % ( len( binary_data), offset, len( binary_data) + offset))
+
+    def load_mmap( self, filename, offset = 0, length = -1):
+        # map the image read-only and copy it into memory with one slice
+        # assignment, returns a read-only memoryview of the whole file.
+        # The view is valid until close(), a slice of it still held keeps
+        # the file mapped, see close().
+        with open( filename, 'rb') as file:
+            if os.fstat( file.fileno()).st_size == 0:
+                # mmap can not map an empty file
+                image = None
+                view = memoryview( b"")
+            else:
+                image = mmap.mmap( file.fileno(), 0, access = mmap.ACCESS_READ)
+                view = memoryview( image)
+        if length < 0 or length > len( view):
+            length = len( view)
+        data = view[ : length]
+        try:
+            self.store( data, offset)
+        except ValueError:
+            data.release()
+            view.release()
+            if image is not None:
+                image.close()
+            raise
+        data.release()
+        if image is not None:
+            self.images.append( ( image, view))
+
+        print( "report: map %i bytes from 0x%04X to 0x%04X" % ( length, offset, length + offset))
+        return view
+
+    def store( self, data, offset = 0):
+        # bulk write, without wraparound
+        if offset < 0 or offset > 0xffff:
+            raise ValueError( "offset 0x%X outside of memory" % offset)
+        end = offset + len( data)
+        if end > 0x10000:
+            raise ValueError( "%i bytes at 0x%04X do not fit into memory" % ( len( data), offset))
+        self.mem[ offset : end] = data
+        if any( self.code[ offset : end]):
+            for address in range( offset, end):
+                if self.code[ address]:
+                    self.invalidate( address)
 
-        print( "report: load %i bytes from 0x%04X to 0x%04X" % ( index, offset, index + offset))
+    def close( self):
+        # release the mapped images, returns the number of images still
+        # in use, they stay mapped until a later close()
+        used = []
+        for image, view in self.images:
+            view.release()
+            try:
+                image.close()
+            except BufferError:
+                used.append( ( image, view))
+        self.images = used
+        return len( used)
 
     def hexdump( self, start = 0, length = 0x20, width = 8):
         index = start
         print( "%04X: " % index, end = '')
         for i in range( length):
-            print( "%02X " % self.mem[ index], end = '')
+            print( "%02X " % self.read( index & 0xffff), end = '')
             index += 1
             if i % 4 == 3:
                 print( " ", end = '')
@@ -34,23 +99,90 @@ class Memory:
     def read( self, address):
         return self.mem[ address]
 
+    # block accesses for LDIR and friends, wrap around at 0xffff
+
+    def read_block( self, address, length):
+        end = address + length
+        if end <= 0x10000:
+            return bytes( self.mem[ address : end])
+        return bytes( self.mem[ address :]) + bytes( self.mem[ : end - 0x10000])
+
+    def write_block( self, address, data):
+        split = 0x10000 - address
+        if len( data) <= split:
+            self.store( data, address)
+        else:
+            self.store( data[ : split], address)
+            self.store( data[ split :], 0)
+
+    # 16 and 32 bit accesses wrap around at 0xffff
+
     def read16( self, address):
         val_lo = self.mem[ address]
-        val_hi = self.mem[ address + 1]
+        val_hi = self.mem[ ( address + 1) & 0xffff]
         value = ( val_hi << 8) + val_lo
         return value
 
     def read32( self, address):
-        val_0   = self.mem[ address + 0]
-        val_1   = self.mem[ address + 1]
-        val_2   = self.mem[ address + 2]
-        val_3   = self.mem[ address + 3]
+        val_0   = self.mem[ ( address + 0) & 0xffff]
+        val_1   = self.mem[ ( address + 1) & 0xffff]
+        val_2   = self.mem[ ( address + 2) & 0xffff]
+        val_3   = self.mem[ ( address + 3) & 0xffff]
         value = ( val_3 << 24) + ( val_2 << 16) + ( val_1 << 8) + val_0
         return value
 
     def write( self, address, data):
         self.mem[ address] = data
+        if self.code[ address]:
+            self.invalidate( address)
 
     def write16( self, address, data):
-        self.mem[ address + 0] = data & 0xff
-        self.mem[ address + 1] = data >> 8
+        address &= 0xffff
+        high = ( address + 1) & 0xffff
+        self.mem[ address] = data & 0xff
+        self.mem[ high] = data >> 8
+        if self.code[ address]:
+            self.invalidate( address)
+        if self.code[ high]:
+            self.invalidate( high)
+
+    ##############################
+    # decode cache support
+    #
+    # a cpu which caches decoded instructions marks their bytes with
+    # mark_code() and registers a listener, write() calls every listener
+    # with the address when a marked byte is changed. A bound method is
+    # only held weakly, a cpu thrown away without remove_listener() drops
+    # out when it is collected.
+
+    def add_listener( self, listener):
+        key = listener_key( listener)
+        if key in self.listeners:
+            return
+        if isinstance( listener, types.MethodType):
+            listeners = self.listeners
+            self.listeners[ key] = weakref.WeakMethod( listener, lambda ref: listeners.pop( key, None))
+        else:
+            self.listeners[ key] = lambda: listener
+
+    def remove_listener( self, listener):
+        self.listeners.pop( listener_key( listener), None)
+
+    def mark_code( self, address, length):
+        for index in range( length):
+            self.code[ ( address + index) & 0xffff] = 1
+
+    def invalidate( self, address):
+        self.code[ address] = 0
+        # a collected cpu may change the dict while it is walked
+        for reference in tuple( self.listeners.values()):
+            listener = reference()
+            if listener is not None:
+                listener( address)
+
+
+def listener_key( listener):
+    # the same method of the same object gives the same key
+    if isinstance( listener, types.MethodType):
+        return ( id( listener.__self__), listener.__func__)
+    return listener
@@ -0,0 +1,87 @@
+import struct
+
+from Disassembler import decode
+
+
+##############################
+# flight recorder
+#
+# Keeps the last commands of a cpu in a ring buffer: pc, the 4 bytes
+# at pc and the registers before the command. Nothing is formatted
+# while the cpu runs, the buffer is only read by dump(). Register.run()
+# dumps it at an unknown command, at a breakpoint and when a handler
+# raises an exception, Register.execute() at an unknown command and
+# an exception.
+#
+# While a recorder is attached run() executes every command on its own,
+# without fused pairs and skipped idle or delay loops.
+
+# one entry: the registers in record_names, af is ( a << 8) | f,
+# and the 4 bytes at pc
+record_names  = ( "pc", "af", "bc", "de", "hl", "ix", "iy", "sp")
+record_struct = struct.Struct( "<8H4s")
+
+class FlightRecorder:
+    "ring buffer of the last commands of a cpu"
+
+    def __init__( self, cpu, size = 256, report = print):
+        # size is rounded up to a power of 2, report gets each line of a dump
+        self.size = 1
+        while self.size < size:
+            self.size <<= 1
+        self.mask = self.size - 1
+        self.cpu = cpu
+        self.report = report
+        self.buffer = bytearray( record_struct.size * self.size)
+        self.pack = record_struct.pack_into
+        # commands recorded since the start or clear()
+        self.count = 0
+        self.dumps = 0
+        # pcs where run() stops and dumps
+        self.breakpoints = frozenset()
+        cpu.recorder = self
+        # decoded again without fused pairs and skipped loops
+        cpu.detach()
+
+    def record( self, cpu, mem):
+        pc = cpu.pc
+        if mem.flat and pc < 0xfffd:
+            code = mem.mem[ pc : pc + 4]
+        else:
+            code = mem.read_block( pc, 4)
+        self.pack( self.buffer, ( self.count & self.mask) * record_struct.size,
+                   pc, ( cpu.a << 8) | cpu.f, cpu.bc, cpu.de, cpu.hl, cpu.ix, cpu.iy, cpu.sp, code)
+        self.count += 1
+
+    def set_breakpoints( self, addresses):
+        self.breakpoints = frozenset( address & 0xffff for address in addresses)
+
+    def clear( self):
+        self.count = 0
+
+    def entries( self):
+        # ( registers as in record_names, 4 bytes at pc), the oldest first
+        result = []
+        for number in range( max( 0, self.count - self.size), self.count):
+            entry = record_struct.unpack_from( self.buffer, ( number & self.mask) * record_struct.size)
+            result.append( ( entry[ : 8], entry[ 8]))
+        return result
+
+    def format( self):
+        # one text line per entry, the oldest first
+        lines = []
+        flags = self.cpu.flags_to_str
+        for registers, data in self.entries():
+            pc, af, bc, de, hl, ix, iy, sp = registers
+            line = decode( data, 0, pc)
+            code = " ".join( "%02X" % value for value in data[ : line.length])
+            lines.append( "%04X: %-12s %-17s A=%02X F=%s BC=%04X DE=%04X HL=%04X  IX=%04X IY=%04X  SP=%04X" %
+                          ( pc, code, line.mnemonic, af >> 8, flags( af & 0xff), bc, de, hl, ix, iy, sp))
+        return lines
+
+    def dump( self, reason = None):
+        self.dumps += 1
+        self.report( "flight recorder: %s at %04X, last %d of %d commands" %
+                     ( reason, self.cpu.pc, min( self.count, self.size), self.count))
+        for line in self.format():
+            self.report( line)
@@ -1,3 +1,14 @@
+from Flags import mask_carry, mask_sub, mask_par, mask_tree, mask_half, mask_five, mask_zero, mask_sign
+from Flags import sz, szp, and_flags, inc_flags, dec_flags
+from Flags import adc_result, adc_flags, sbc_result, sbc_flags, cp_flags
+from Flags import shift_result, shift_flags
+from Spec import main_spec, cb_spec, ed_spec, dd_spec, fd_spec, ddcb_spec, fdcb_spec, spec_source, index_source
+import Spec
+from collections import namedtuple, Counter
+import struct
+import types
+
+
 ##############################
 # helper functions
 
@@ -35,6 +46,31 @@ def hi_nibble( byte):
 
 
 
+##############################
+# result of Register.run()
+
+# reasons
+reason_steps   = "steps"      # max_steps executed
+reason_pc      = "pc"         # pc reached one of stop_pc
+reason_halt    = "halt"       # HALT executed, no event left to wake the cpu
+reason_unknown = "unknown"    # command not implemented, pc points to it
+reason_cycles  = "cycles"     # max_cycles T-states executed
+
+# cycles are the T-states of this run
+RunResult = namedtuple( "RunResult", "reason steps pc cycles")
+
+# a cycle count never reached
+never = float( "inf")
+
+
+##############################
+# packed register state, see Register.state_names
+# pc sp a f bc de hl ix iy a' f' bc' de' hl' i r im iff1 iff2 running
+
+state_struct = struct.Struct( "<HHBBHHHHHBBHHHBBBBBB")
+
+
+
 ##############################
 # main class
 class Register:
@@ -49,9 +85,25 @@ class Register:
     flag_zero = 6
     flag_sign = 7
 
+    # register file, no per instance __dict__
+    __slots__ = ( "running", "pc", "sp", "i", "r", "a", "a_", "f", "f_",
+                  "bc", "bc_", "de", "de_", "hl", "hl_", "ix", "iy", "im",
+                  "iff1", "iff2", "irq", "nmi_pending", "ei_cycle",
+                  "cycles", "scheduler", "deadline", "decoded", "decoded_mem", "decoded_owners", "fusion",
+                  "recorder", "__weakref__")
+
+    # order of get_state() and set_state()
+    state_names = ( "pc", "sp", "a", "f", "bc", "de", "hl", "ix", "iy",
+                    "a_", "f_", "bc_", "de_", "hl_", "i", "r", "im", "iff1", "iff2", "running")
+
+    # handlers write masked registers, there is no masking behind a
+    # command. For debugging set Register.check = True, execute() and
+    # run() call check_registers() after each command.
+    check = False
+
 
     def __init__( self):
-        self.run = True
+        self.running = True
         self.pc  = 0
         self.sp  = 0xfffe
         self.i   = 0
@@ -73,7 +125,69 @@ class Register:
 
         self.im  = 0
 
-        self.result = ''
+        # interrupts, irq is the byte on the data bus
+        # of a pending request or None, see interrupt()
+        self.iff1 = False
+        self.iff2 = False
+        self.irq  = None
+        self.nmi_pending = False
+        # cycles after the last EI, no interrupt directly behind it
+        self.ei_cycle = -1
+
+        # T-states since reset
+        self.cycles = 0
+        # events, see Scheduler, run() stops at deadline to call them
+        self.scheduler = None
+        self.deadline  = never
+        # last commands for a post mortem dump, see FlightRecorder
+        self.recorder  = None
+
+        # decode cache, pc -> ( handler, quiet handler, cmd, stop, T-states)
+        self.decoded = {}
+        self.decoded_mem = None
+        # address -> pcs of entries which read it besides their own
+        # bytes, the body of an idle or delay loop for its jump
+        self.decoded_owners = {}
+        # pairs of unprefixed commands run in one dispatch, see fuse()
+        self.fusion = fusion_pairs
+
+    ##############################
+    # state
+
+    def get_state( self):
+        # all registers as tuple, see state_names
+        return ( self.pc, self.sp, self.a, self.f, self.bc, self.de, self.hl, self.ix, self.iy,
+                 self.a_, self.f_, self.bc_, self.de_, self.hl_, self.i, self.r, self.im,
+                 self.iff1, self.iff2, self.running)
+
+    def set_state( self, state):
+        ( self.pc, self.sp, self.a, self.f, self.bc, self.de, self.hl, self.ix, self.iy,
+          self.a_, self.f_, self.bc_, self.de_, self.hl_, self.i, self.r, self.im,
+          self.iff1, self.iff2, self.running) = state
+
+    def pack_state( self):
+        # all registers as 30 bytes
+        return state_struct.pack( *self.get_state())
+
+    def unpack_state( self, data):
+        pc, sp, a, f, bc, de, hl, ix, iy, a_, f_, bc_, de_, hl_, i, r, im, iff1, iff2, running = state_struct.unpack( data)
+        self.set_state( ( pc, sp, a, f, bc, de, hl, ix, iy, a_, f_, bc_, de_, hl_, i, r, im,
+                          bool( iff1), bool( iff2), bool( running)))
+
+    def check_registers( self, cmd):
+        # raise ValueError for a register out of its range
+        for name in self.state_names[ : 16]:
+            value = getattr( self, name)
+            limit = 0xffff if len( name.rstrip( "_")) == 2 else 0xff
+            if not 0 <= value <= limit:
+                raise ValueError( "register %s = 0x%X out of range after command 0%02Xh at 0x%04X" % ( name, value, cmd, self.pc))
+
+    def clone( self):
+        # same registers, own decode cache
+        cpu = self.__class__()
+        cpu.set_state( self.get_state())
+        cpu.cycles = self.cycles
+        return cpu
 
     def print( self):
         print("A  -Flags-- B C  D E  H L  M  IX   IY   I") 
@@ -157,7 +271,7 @@ class Register:
 
     def set_b( self, value):
         if value < 0 or value > 255:
-            raise RangeError
+            raise ValueError( "8 bit register value out of range: %r" % value)
         self.bc = ( value << 8) + ( self.bc & 0x00ff)
 
     def get_b( self):
@@ -165,7 +279,7 @@ class Register:
 
     def set_c( self, value):
         if value < 0 or value > 255:
-            raise RangeError
+            raise ValueError( "8 bit register value out of range: %r" % value)
         self.bc = ( self.bc & 0xff00) + value 
 
     def get_c( self):
@@ -176,7 +290,7 @@ class Register:
 
     def set_d( self, value):
         if value < 0 or value > 255:
-            raise RangeError
+            raise ValueError( "8 bit register value out of range: %r" % value)
         self.de = ( value << 8) + ( self.de & 0x00ff)
 
     def get_d( self):
@@ -184,7 +298,7 @@ class Register:
 
     def set_e( self, value):
         if value < 0 or value > 255:
-            raise RangeError
+            raise ValueError( "8 bit register value out of range: %r" % value)
         self.de = ( self.de & 0xff00) + value 
 
     def get_e( self):
@@ -195,7 +309,7 @@ class Register:
 
     def set_h( self, value):
         if value < 0 or value > 255:
-            raise RangeError
+            raise ValueError( "8 bit register value out of range: %r" % value)
         self.hl = ( value << 8) + ( self.hl & 0x00ff)
 
     def get_h( self):
@@ -203,7 +317,7 @@ class Register:
 
     def set_l( self, value):
         if value < 0 or value > 255:
-            raise RangeError
+            raise ValueError( "8 bit register value out of range: %r" % value)
         self.hl = ( self.hl & 0xff00) + value 
 
     def get_l( self):
@@ -222,110 +336,86 @@ class Register:
         self.iy = iy
 
 
-    # input: value a, value b, carry in
-    # output: sum, half carry, carry, overflow
-    def __add( self, a, b, cy_in):
+    # 8 bit ALU, result and flags from the tables in Flags.py
 
-        # 4 bit sum
-        q4 = ( a & 0x0F) + ( b & 0x0F) + cy_in
-        # half carry
-        if q4 > 0x0F:
-            half_cy = 1
-        else:
-            half_cy = 0
-
-        # 7 bit sum
-        q7 = ( a & 0x7F) + ( b & 0x7F) + cy_in
-        # half carry
-        if q7 > 0x7F:
-            cy7 = 1
-        else:
-            cy7 = 0
-
-        # sum
-        result = a + b + cy_in
+    def compare( self, value):
+        self.f = cp_flags[ ( self.a << 8) | value]
 
-        # overflow
-        if result > 0xFF:
-            cy_out = 1
-        else:
-            cy_out = 0
-        result &= 0xFF
 
-        # overflow
-        if cy_out == cy7:
-            ov = 0
-        else:
-            ov = 1
+    def adc_( self, value):
+        index = ( ( self.f & mask_carry) << 16) | ( self.a << 8) | value
+        self.a = adc_result[ index]
+        self.f = adc_flags[ index]
 
-        return( result, half_cy, cy_out, ov)
 
-    # input: value a, value b, carry in
-    # output: sum, half carry, carry, overflow
-    def __sub( self, a, b, cy_in):
+    def add_( self, value):
+        index = ( self.a << 8) | value
+        self.a = adc_result[ index]
+        self.f = adc_flags[ index]
+
+
+    def add16_( self, first, second):
+        # S Z P/V unchanged, H from bit 11, N reset, 5 3 from the high byte
+        result = first + second
+        self.f = ( self.f & ( mask_sign | mask_zero | mask_par)) | ( ( result >> 8) & ( mask_five | mask_tree)) | \
+                 ( ( ( first ^ second ^ result) >> 8) & mask_half) | ( result >> 16)
+        return result & 0xffff
+
+
+    def adc16_( self, value):
+        # S Z H P/V C of the 16 bit result, N reset
+        result = self.hl + value + ( self.f & mask_carry)
+        hl = result & 0xffff
+        self.f = ( ( hl >> 8) & ( mask_sign | mask_five | mask_tree)) | \
+                 ( ( ( self.hl ^ value ^ result) >> 8) & mask_half) | ( result >> 16)
+        # both operands of one sign, the result of the other
+        if ( self.hl ^ hl) & ( value ^ hl) & 0x8000:
+            self.f |= mask_par
+        if hl == 0:
+            self.f |= mask_zero
+        self.hl = hl
 
-        # 4 bit sum
-        q4 = ( a & 0x0F) - ( b & 0x0F) - cy_in
-        # half carry
-        if q4 > 0x0F:
-            half_cy = 1
-        else:
-            half_cy = 0
 
-        # 7 bit sum
-        q7 = ( a & 0x7F) - ( b & 0x7F) - cy_in
-        # half carry
-        if q7 > 0x7F:
-            cy7 = 1
-        else:
-            cy7 = 0
+    def and_( self, value):
+        self.a = self.a & value
+        self.f = and_flags[ self.a]
 
-        # sum
-        result = a - b - cy_in
 
-        # overflow
-        if result > 0xFF:
-            cy_out = 1
-        else:
-            cy_out = 0
-        result &= 0xFF
+    def bit_( self, value, bit):
+        self.f = clr_bit( self.f, self.flag_sub)
+        self.f = set_bit( self.f, self.flag_half)
 
-        # overflow
-        if cy_out == cy7:
-            ov = 0
+        if bit_is_clear( value, bit):
+            self.f = set_bit( self.f, self.flag_zero)
         else:
-            ov = 1
+            self.f = clr_bit( self.f, self.flag_zero)
 
-        return( result, half_cy, cy_out, ov)
 
+    def dec_( self, value):
+        self.f = ( self.f & mask_carry) | dec_flags[ value]
+        return ( value - 1) & 0xff
 
-    def compare( self, value):
-        self.f = set_bit( self.f, self.flag_sub)
-        self.f = clr_bit( self.f, self.flag_par)
 
-        diff = self.a - value
-        diff &= 0xff
+    def inc_( self, value):
+        self.f = ( self.f & mask_carry) | inc_flags[ value]
+        return ( value + 1) & 0xff
 
-        if diff > 127:
-            self.f = set_bit( self.f, self.flag_sign)
-        else:
-            self.f = clr_bit( self.f, self.flag_sign)
 
-        if diff == 0:
-            self.f = set_bit( self.f, self.flag_zero)
-        else:
-            self.f = clr_bit( self.f, self.flag_zero)
+    def or_( self, value):
+        self.a = self.a | value
+        self.f = szp[ self.a]
 
-        if value > self.a:
-            self.f = set_bit( self.f, self.flag_carry)
-        else:
-            self.f = clr_bit( self.f, self.flag_carry)
 
-        # TODO: half carry
+    def sbc_( self, value):
+        index = ( ( self.f & mask_carry) << 16) | ( self.a << 8) | value
+        self.a = sbc_result[ index]
+        self.f = sbc_flags[ index]
 
 
-    def adc_( self, value):
-        self.f = clr_bit( self.f, self.flag_sub)
+    def sbc16_( self, value):
+        # S Z H P/V N C
+        # * * x   V 1 *
+        self.f = set_bit( self.f, self.flag_sub)
         self.f = clr_bit( self.f, self.flag_par)
 
         if bit_is_set( self.f, self.flag_carry):
@@ -333,13 +423,19 @@ class Register:
         else:
             carry_in = 0
 
-        self.a, half_a, carry, overflow = self.__add( self.a, value, carry_in)
+        result = self.hl - value - carry_in
 
+        carry = 0
+        if result & 0xf0000:
+            carry = 1
 
-        if half_a == 1:
-            self.f = set_bit( self.f, self.flag_half)
-        else:
-            self.f = clr_bit( self.f, self.flag_half)
+        overflow = 0
+        if result < 0:
+            overflow = 1
+
+        result &= 0xffff
+
+        self.hl = result
 
         if carry == 1:
             self.f = set_bit( self.f, self.flag_carry)
@@ -351,4224 +447,3002 @@ class Register:
         else:
             self.f = clr_bit( self.f, self.flag_par)
 
-        if self.a > 0x7f:
+        # sign
+        if self.hl > 0x7fff:
             self.f = set_bit( self.f, self.flag_sign)
         else:
             self.f = clr_bit( self.f, self.flag_sign)
 
-        if self.a == 0:
+        # zero
+        if self.hl == 0:
             self.f = set_bit( self.f, self.flag_zero)
         else:
             self.f = clr_bit( self.f, self.flag_zero)
 
 
+    def sub_( self, value):
+        index = ( self.a << 8) | value
+        self.a = sbc_result[ index]
+        self.f = sbc_flags[ index]
 
-    def add_( self, value):
-        self.f = clr_bit( self.f, self.flag_sub)
-        self.f = clr_bit( self.f, self.flag_par)
 
-        self.a, half_a, carry, overflow = self.__add( self.a, value, 0)
+    def xor_( self, value):
+        self.a = self.a ^ value
+        self.f = szp[ self.a]
+
 
-        if half_a == 1:
-            self.f = set_bit( self.f, self.flag_half)
-        else:
-            self.f = clr_bit( self.f, self.flag_half)
+    def push_( self, mem, value):
+        self.sp = ( self.sp - 2) & 0xffff
+        mem.write16( self.sp, value & 0xffff)
 
-        if carry == 1:
+
+    def pop_( self, mem):
+        value = mem.read16( self.sp)
+        self.sp = ( self.sp + 2) & 0xffff
+        return value
+
+
+    # block instructions, step is 1 for LDI/LDIR/..., -1 for LDD/LDDR/...
+    #
+    # The repeating forms do all iterations in one call, with block reads
+    # and writes on the memory and the I/O bus. Only the flags of the last
+    # iteration are visible, so they are computed once at the end.
+
+    def ld_block_( self, mem, step, repeat):
+        # S Z H P/V N C, bit 3 and 5 from A + value
+        # * * 0  *  0 *
+        count = 1
+        if repeat:
+            count = self.block_count_( self.own_code_( self.de, step, self.bc or 0x10000))
+        if step > 0:
+            source = self.hl
+            dest   = self.de
+            # a destination above the source by less than count
+            # repeats the first distance bytes
+            distance = ( dest - source) & 0xffff
+            if 0 < distance < count:
+                data = ( mem.read_block( source, distance) * ( count // distance + 1))[ : count]
+            else:
+                data = mem.read_block( source, count)
+            value = data[ -1]
+        else:
+            source = ( self.hl - count + 1) & 0xffff
+            dest   = ( self.de - count + 1) & 0xffff
+            distance = ( self.hl - self.de) & 0xffff
+            if 0 < distance < count:
+                data = ( mem.read_block( ( self.hl - distance + 1) & 0xffff, distance) * ( count // distance + 1))[ -count :]
+            else:
+                data = mem.read_block( source, count)
+            value = data[ 0]
+        mem.write_block( dest, data)
+
+        self.hl = ( self.hl + step * count) & 0xffff
+        self.de = ( self.de + step * count) & 0xffff
+        self.bc = ( self.bc - count) & 0xffff
+
+        value += self.a
+        self.f = ( self.f & ( mask_sign | mask_zero | mask_carry)) | ( value & mask_tree) | ( ( value << 4) & mask_five)
+        if self.bc:
+            self.f |= mask_par
+        self.block_end_( count, repeat and self.bc)
+
+
+    def cp_block_( self, mem, step, repeat):
+        # S Z H P/V N C, bit 3 and 5 from A - value - H
+        # * * *  *  1 -
+        count = 1
+        if repeat:
+            count = self.block_count_( self.bc or 0x10000)
+        if step > 0:
+            data  = mem.read_block( self.hl, count)
+            index = data.find( self.a)
+            if index >= 0:
+                count = index + 1
+            value = data[ count - 1]
+        else:
+            data  = mem.read_block( ( self.hl - count + 1) & 0xffff, count)
+            index = data.rfind( self.a)
+            if index >= 0:
+                count = len( data) - index
+            value = data[ len( data) - count]
+
+        self.hl = ( self.hl + step * count) & 0xffff
+        self.bc = ( self.bc - count) & 0xffff
+
+        flags = ( cp_flags[ ( self.a << 8) | value] & ( mask_sign | mask_zero | mask_half)) | mask_sub
+        value = self.a - value - ( flags >> 4 & 1)
+        flags |= ( self.f & mask_carry) | ( value & mask_tree) | ( ( value << 4) & mask_five)
+        if self.bc:
+            flags |= mask_par
+        self.f = flags
+        self.block_end_( count, repeat and self.bc and not flags & mask_zero)
+
+
+    def in_block_( self, mem, ios, step, repeat):
+        # the port is BC before B is decremented
+        b = self.bc >> 8
+        c = self.bc & 0xff
+        count = 1
+        if repeat:
+            count = self.block_count_( self.own_code_( self.hl, step, b or 0x100))
+        ports = [ ( ( ( b - index) & 0xff) << 8) | c for index in range( count)]
+        if mem.flat:
+            data = ios.read_block( ports)
+            if step > 0:
+                mem.write_block( self.hl, data)
+            else:
+                mem.write_block( ( self.hl - count + 1) & 0xffff, data[ :: -1])
+            value = data[ -1]
+        else:
+            # a port may switch banks, one byte after the other
+            address = self.hl
+            for port in ports:
+                value = ios.read( port)
+                mem.write( address, value)
+                address = ( address + step) & 0xffff
+
+        b = ( b - count) & 0xff
+        self.hl = ( self.hl + step * count) & 0xffff
+        self.bc = ( b << 8) | c
+        self.io_block_flags_( value, value + ( ( c + step) & 0xff), b)
+        self.block_end_( count, repeat and b)
+
+
+    def out_block_( self, mem, ios, step, repeat):
+        # the port is BC after B is decremented
+        b = self.bc >> 8
+        c = self.bc & 0xff
+        count = 1
+        if repeat:
+            count = self.block_count_( b or 0x100)
+        ports = [ ( ( ( b - 1 - index) & 0xff) << 8) | c for index in range( count)]
+        if mem.flat:
+            if step > 0:
+                data = mem.read_block( self.hl, count)
+            else:
+                data = mem.read_block( ( self.hl - count + 1) & 0xffff, count)[ :: -1]
+            ios.write_block( ports, data)
+            value = data[ -1]
+        else:
+            address = self.hl
+            for port in ports:
+                value = mem.read( address)
+                ios.write( port, value)
+                address = ( address + step) & 0xffff
+
+        b = ( b - count) & 0xff
+        self.hl = ( self.hl + step * count) & 0xffff
+        self.bc = ( b << 8) | c
+        self.io_block_flags_( value, value + ( self.hl & 0xff), b)
+        self.block_end_( count, repeat and b)
+
+
+    def io_block_flags_( self, value, k, b):
+        # S Z H P/V N C, S Z 5 3 from B, N is bit 7 of value,
+        # H and C from k, P/V is the parity of ( k & 7) ^ B
+        flags = sz[ b] | ( ( value >> 6) & mask_sub) | ( szp[ ( k & 7) ^ b] & mask_par)
+        if k > 0xff:
+            flags |= mask_half | mask_carry
+        self.f = flags
+
+
+    def ld_a_ir_( self):
+        # LD A,I and LD A,R: S Z 5 3 from A, H=N=0, P/V is IFF2
+        self.f = ( self.f & mask_carry) | sz[ self.a]
+        if self.iff2:
+            self.f |= mask_par
+
+
+    def own_code_( self, address, step, count):
+        # a block write over the block instruction itself stops after
+        # that byte, the next step fetches the new code
+        for code in ( self.pc, self.pc + 1):
+            index = ( ( code - address) * step) & 0xffff
+            if index < count:
+                count = index + 1
+        return count
+
+
+    def block_count_( self, count):
+        # no pass behind the deadline: the passes end at the first one
+        # reaching it, as they would one by one. The instruction stays
+        # at pc and run() calls the events and interrupts in between.
+        # The first pass is charged with 16 T-states already.
+        if self.deadline != never:
+            passes = ( self.deadline - self.cycles + 16 + 20) // 21
+            if passes < count:
+                count = max( 1, passes)
+        return count
+
+
+    def block_end_( self, count, more):
+        # 21 T-states for each repeat, 16 for the last iteration,
+        # with more left the instruction stays at pc
+        if more:
+            self.cycles += 21 * count - 16
+        else:
+            self.cycles += 21 * ( count - 1)
+            self.pc = ( self.pc + 2) & 0xffff
+
+    # missing opcodes:
+    # on prefix CB, DD, ED, FD
+
+    def execute( self, mem, ios, trace = True):
+        # with trace the command is returned as text, else None
+        if mem is not self.decoded_mem:
+            self.attach( mem)
+        if self.cycles >= self.deadline:
+            self.due( mem, never, False)
+
+        # load command
+        entry = self.decoded.get( self.pc)
+        if entry is None:
+            entry = self.decode( mem, self.pc)
+        handler, quiet, cmd, stop, cycles = entry
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.record( self, mem)
+            if stop is reason_unknown:
+                recorder.dump( stop)
+
+        if trace:
+            # read before the command may change it
+            text = trace_text( mem, self.pc)
+
+        self.cycles += cycles
+        try:
+            if trace:
+                handler( self, mem, ios)
+            else:
+                quiet( self, mem, ios)
+            if self.check:
+                self.check_registers( cmd)
+        except Exception as error:
+            # an unknown command is dumped already
+            if recorder is not None and stop is not reason_unknown:
+                recorder.dump( repr( error))
+            raise
+
+        # refresh, bit 7 stays
+        self.r = ( self.r & 0x80) | ( ( self.r + 1) & 0x7f)
+
+        if trace:
+            return( "cmd: 0%02Xh   %-17s" % ( cmd, text))
+
+
+    def run( self, mem, ios, max_steps = 1000000, stop_pc = (), max_cycles = None):
+        # execute without trace until max_steps, max_cycles T-states,
+        # a pc in stop_pc, HALT or an unknown command, returns a RunResult.
+        # A FlightRecorder records each command, fused pairs and skipped
+        # loops are not used then, and adds its breakpoints to stop_pc.
+        # The last command may end behind max_cycles. Scheduled events
+        # are called at the first command boundary at or behind their cycle.
+        if mem is not self.decoded_mem:
+            self.attach( mem)
+        decoded = self.decoded
+        decode  = self.decode
+        check   = self.check
+        recorder = self.recorder
+        stop_at = frozenset( stop_pc)
+        if recorder is not None:
+            stop_at |= recorder.breakpoints
+        if max_steps is None:
+            max_steps = never
+        start = self.cycles
+        if max_cycles is None:
+            end = never
+        else:
+            end = start + max_cycles
+        self.deadline = self.next_deadline( end)
+
+        steps = 0
+        reason = reason_steps
+        try:
+            while steps < max_steps:
+                if self.cycles >= self.deadline:
+                    reason = self.due( mem, end)
+                    if reason is not None:
+                        break
+                    reason = reason_steps
+                    if not self.running:
+                        # one wait for the next event
+                        steps += 1
+                        continue
+                pc = self.pc
+                if pc in stop_at:
+                    reason = reason_pc
+                    if recorder is not None and pc in recorder.breakpoints:
+                        recorder.dump( "breakpoint")
+                    break
+                entry = decoded.get( pc)
+                if entry is None:
+                    entry = decode( mem, pc)
+                handler, quiet, cmd, stop, cycles = entry
+                if recorder is not None:
+                    recorder.record( self, mem)
+                if stop is not None:
+                    if stop is reason_unknown:
+                        reason = stop
+                        if recorder is not None:
+                            recorder.dump( stop)
+                        break
+                    # fused pair, when the second command may run as well
+                    if steps + 1 < max_steps and stop[ 1] not in stop_at:
+                        self.cycles += cycles
+                        steps += stop[ 0]( self, mem, ios)
+                        if check:
+                            self.check_registers( cmd)
+                        continue
+
+                self.cycles += cycles
+                quiet( self, mem, ios)
+                if check:
+                    self.check_registers( cmd)
+                self.r = ( self.r & 0x80) | ( ( self.r + 1) & 0x7f)
+                steps += 1
+        except Exception as error:
+            if recorder is not None:
+                recorder.dump( repr( error))
+            raise
+
+        return RunResult( reason, steps, self.pc, self.cycles - start)
+
+    def next_deadline( self, end):
+        # now, when an interrupt or a halted cpu waits,
+        # else the next event or end, whatever comes first
+        if self.nmi_pending or not self.running:
+            return self.cycles
+        if self.irq is not None and self.iff1:
+            if self.cycles != self.ei_cycle:
+                return self.cycles
+            # EI just executed, one command later
+            return self.cycles + 1
+        return self.event_cycle( end)
+
+    def event_cycle( self, end):
+        # the next event or end, whatever comes first
+        if self.scheduler is not None:
+            cycle = self.scheduler.next_cycle()
+            if cycle is not None and cycle < end:
+                return cycle
+        return end
+
+
+    ##############################
+    # interrupts
+    #
+    # Requests are checked at the deadline of run() (and before each
+    # execute()), so raising one sets the deadline to now.
+
+    def interrupt( self, data = 0xff):
+        # maskable request, data is the byte the device puts on the bus:
+        # the RST command in IM 0, the low byte of the vector in IM 2.
+        # The request is held until accepted or clear_interrupt().
+        self.irq = data
+        self.deadline = self.cycles
+
+    def clear_interrupt( self):
+        self.irq = None
+
+    def nmi( self):
+        # non maskable request, accepted at the next command boundary
+        self.nmi_pending = True
+        self.deadline = self.cycles
+
+    def due( self, mem, end, wait = True):
+        # at the deadline: call the due events, accept an interrupt and,
+        # with wait, let a halted cpu skip ahead to the next event.
+        # Returns the reason for run() to stop or None.
+        if self.scheduler is not None:
+            self.scheduler.service( self.cycles)
+        if self.nmi_pending:
+            self.nmi_pending = False
+            self.iff1 = False
+            self.accept_( mem, 0x66, 11)
+        elif self.irq is not None and self.iff1 and self.cycles != self.ei_cycle:
+            self.accept_irq_( mem)
+        if self.cycles >= end:
+            return reason_cycles
+
+        if not self.running and wait:
+            # HALT executes NOPs, 4 T-states each, until the next event
+            cycle = self.event_cycle( end)
+            if cycle == never:
+                return reason_halt
+            nops = max( 0, cycle - self.cycles + 3) // 4
+            self.cycles += 4 * nops
+            self.r = ( self.r & 0x80) | ( ( self.r + nops) & 0x7f)
+            self.deadline = self.cycles
+            return None
+
+        self.deadline = self.next_deadline( end)
+        return None
+
+    def accept_irq_( self, mem):
+        data = self.irq
+        self.irq = None
+        self.iff1 = False
+        self.iff2 = False
+        if self.im == 2:
+            # vector table at I * 256 + data
+            self.accept_( mem, mem.read16( ( self.i << 8) | data), 19)
+        elif self.im == 1:
+            self.accept_( mem, 0x38, 13)
+        else:
+            # IM 0 executes the command on the bus, only RST n is emulated,
+            # anything else acts as RST 38h
+            if data & 0xc7 != 0xc7:
+                data = 0xff
+            self.accept_( mem, data & 0x38, 13)
+
+    def accept_( self, mem, address, cycles):
+        # leave HALT behind, call address
+        if not self.running:
+            self.running = True
+            self.pc = ( self.pc + 1) & 0xffff
+        self.push_( mem, self.pc)
+        self.pc = address
+        self.cycles += cycles
+        self.r = ( self.r & 0x80) | ( ( self.r + 1) & 0x7f)
+
+    def run_cycles( self, mem, ios, cycles, stop_pc = ()):
+        # run for cycles T-states, stops at the first command boundary
+        # behind them or for the other reasons of run()
+        return self.run( mem, ios, None, stop_pc, cycles)
+
+
+    ##############################
+    # decode cache
+
+    def attach( self, mem):
+        # forget everything decoded from another memory
+        self.detach()
+        self.decoded_mem = mem
+        mem.add_listener( self.invalidate_decoded)
+
+    def detach( self):
+        # forget the decoded instructions, the memory no longer calls back
+        if self.decoded_mem is not None:
+            self.decoded_mem.remove_listener( self.invalidate_decoded)
+        self.decoded = {}
+        self.decoded_owners = {}
+        self.decoded_mem = None
+
+    def decode( self, mem, pc, fuse = True):
+        # resolve the prefixes once and bind the immediate byte and the
+        # displacement to the handlers, see bind_operands(),
+        # with fuse the command may become the first one of a fused pair
+        cmd = mem.read( pc)
+        if cmd == 0xcb:
+            cmd2 = mem.read( ( pc + 1) & 0xffff)
+            handler = self.cb_table[ cmd2]
+            known = cb_known[ cmd2]
+            length = 2
+            cycles = cb_cycles[ cmd2]
+        elif cmd == 0xed:
+            cmd2 = mem.read( ( pc + 1) & 0xffff)
+            handler = self.ed_table[ cmd2]
+            known = ed_known[ cmd2]
+            length = ed_length[ cmd2]
+            cycles = ed_cycles[ cmd2]
+        elif cmd == 0xdd or cmd == 0xfd:
+            cmd2 = mem.read( ( pc + 1) & 0xffff)
+            if cmd2 == 0xcb:
+                cmd4 = mem.read( ( pc + 3) & 0xffff)
+                if cmd == 0xdd:
+                    handler = self.ddcb_table[ cmd4]
+                    known = ddcb_known[ cmd4]
+                else:
+                    handler = self.fdcb_table[ cmd4]
+                    known = fdcb_known[ cmd4]
+                length = 4
+                cycles = index_cb_cycles[ cmd4]
+            else:
+                if cmd == 0xdd:
+                    handler = self.dd_table[ cmd2]
+                    known = dd_known[ cmd2]
+                else:
+                    handler = self.fd_table[ cmd2]
+                    known = fd_known[ cmd2]
+                length = index_length[ cmd2]
+                cycles = index_cycles[ cmd2]
+            handler = bind_operands( handler, mem, pc + 2)
+        else:
+            cmd2 = cmd
+            handler = bind_operands( self.main_table[ cmd], mem, pc + 1)
+            known = main_known[ cmd]
+            length = main_length[ cmd]
+            cycles = main_cycles[ cmd]
+
+        # run() and execute( trace = False) may skip loops,
+        # a FlightRecorder sees every command
+        quiet = handler
+        loop = None
+        if cmd in delay_branches and self.recorder is None:
+            loop = delay_loop( mem, pc, cmd)
+        if loop is not None:
+            quiet = delay_handler( quiet, *loop)
+            self.own_body_( mem, loop[ 0], pc)
+        elif cmd in idle_branches and self.recorder is None:
+            loop = idle_loop( mem, pc, cmd)
+            if loop is not None:
+                quiet = idle_handler( quiet, *loop)
+                self.own_body_( mem, loop[ 0], pc)
+
+        # tell run() where to stop, or what to fuse
+        stop = None
+        if not known:
+            stop = reason_unknown
+        elif cmd == cmd2 and fuse and self.fusion and self.recorder is None:
+            next_pc = ( pc + length) & 0xffff
+            if ( cmd, mem.read( next_pc)) in self.fusion:
+                second = self.decoded.get( next_pc)
+                if second is None:
+                    second = self.decode( mem, next_pc, False)
+                if second[ 3] is not reason_unknown:
+                    stop = ( fused_handler( quiet, second, next_pc), next_pc)
+
+        entry = ( handler, quiet, cmd, stop, cycles)
+        self.decoded[ pc] = entry
+        mem.mark_code( pc, length)
+        return entry
+
+    def profile_pairs( self, mem, ios, max_steps = 100000):
+        # execute up to max_steps commands and count the pairs of
+        # unprefixed commands, the second directly behind the first
+        pairs = Counter()
+        for step in range( max_steps):
+            if not self.running:
+                break
+            cmd = mem.read( self.pc)
+            next_pc = ( self.pc + main_length[ cmd]) & 0xffff
+            self.execute( mem, ios, False)
+            if self.pc == next_pc and cmd not in prefixes:
+                cmd2 = mem.read( next_pc)
+                if cmd2 not in prefixes:
+                    pairs[ ( cmd, cmd2)] += 1
+        return pairs
+
+    def fuse( self, pairs, count = 8):
+        # run the count most frequent pairs of profile_pairs() fused
+        self.fusion = frozenset( pair for pair, number in Counter( pairs).most_common( count))
+        self.decoded.clear()
+        self.decoded_owners.clear()
+
+    def own_body_( self, mem, target, pc):
+        # a write into target..pc drops the entry at pc
+        for address in range( target, pc):
+            self.decoded_owners.setdefault( address, set()).add( pc)
+        mem.mark_code( target, pc - target)
+
+    def invalidate_decoded( self, address):
+        # drop every cached instruction covering address (max. 4 bytes long)
+        for start in range( address - 3, address + 1):
+            start &= 0xffff
+            if start in self.decoded:
+                del self.decoded[ start]
+        owners = self.decoded_owners.pop( address, None)
+        if owners is not None:
+            for start in owners:
+                self.decoded.pop( start, None)
+
+
+    ##############################
+    # unprefixed commands
+    #
+    # LD r,r', LD r,n, INC r, DEC r and the ALU commands are generated
+    # from the semantics in Spec.py, see below
+
+    def op_00( self, mem, ios):
+        self.pc = ( self.pc + 1) & 0xffff
+
+    def op_01( self, mem, ios):
+        val_lo = mem.read( self.pc + 1)
+        val_hi = mem.read( self.pc + 2)
+        value = ( val_hi << 8) + val_lo
+        self.set_bc( value)
+        self.pc = ( self.pc + 3) & 0xffff
+
+    def op_02( self, mem, ios):
+        mem.write( self.bc, self.a)
+        self.pc = ( self.pc + 1) & 0xffff
+
+    def op_03( self, mem, ios):
+        self.bc = ( self.bc + 1) & 0xffff
+        self.pc = ( self.pc + 1) & 0xffff
+
+    def op_07( self, mem, ios):
+        new_a = (self.a << 1 ) & 0xff
+        if bit_is_set( self.a, 7):
+            new_a |= 0x01
             self.f = set_bit( self.f, self.flag_carry)
         else:
             self.f = clr_bit( self.f, self.flag_carry)
-
-        if overflow == 1:
-            self.f = set_bit( self.f, self.flag_par)
+        self.a = new_a
+        self.f = ( self.f & ( mask_sign | mask_zero | mask_par | mask_carry)) | ( new_a & ( mask_five | mask_tree))
+        self.pc = ( self.pc + 1) & 0xffff
+
+    def op_08( self, mem, ios):
+        ( self.a, self.a_) = ( self.a_, self.a)
+        ( self.f, self.f_) = ( self.f_, self.f)
+        self.pc = ( self.pc + 1) & 0xffff
+
+    def op_09( self, mem, ios):
+        self.hl = self.add16_( self.hl, self.bc)
+        self.pc = ( self.pc + 1) & 0xffff
+
+    def op_0a( self, mem, ios):
+        value = mem.read( self.bc)
+        self.a = value
+        self.pc = ( self.pc + 1) & 0xffff
+
+    def op_0b( self, mem, ios):
+        self.bc = ( self.bc - 1) & 0xffff
+        self.pc = ( self.pc + 1) & 0xffff
+
+    def op_0f( self, mem, ios):
+        new_a = self.a >> 1
+        new_cy = self.a & 0x01
+        if bit_is_set( self.a, 0):
+            new_a |= 0x80
+        self.a = new_a
+        if new_cy > 0:
+            self.f = set_bit( self.f, self.flag_carry)
         else:
-            self.f = clr_bit( self.f, self.flag_par)
-
-        if self.a > 0x7f:
-            self.f = set_bit( self.f, self.flag_sign)
+            self.f = clr_bit( self.f, self.flag_carry)
+        self.f = ( self.f & ( mask_sign | mask_zero | mask_par | mask_carry)) | ( new_a & ( mask_five | mask_tree))
+        self.pc = ( self.pc + 1) & 0xffff
+
+    def op_10( self, mem, ios):
+        # dec b, without flags
+        b = ( ( self.bc >> 8) - 1) & 0xff
+        self.bc = ( b << 8) | ( self.bc & 0x00ff)
+        # jr nz,xx
+        offset = mem.read( self.pc + 1)
+        if offset > 127:
+            offset -= 256 
+        if b != 0:
+            self.pc = self.pc + offset
+            self.cycles += 5
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_11( self, mem, ios):
+        val_lo = mem.read( self.pc + 1)
+        val_hi = mem.read( self.pc + 2)
+        value = ( val_hi << 8) + val_lo
+        self.set_de( value)
+        self.pc = ( self.pc + 3) & 0xffff
+
+    def op_12( self, mem, ios):
+        mem.write( self.de, self.a)
+        self.pc = ( self.pc + 1) & 0xffff
+
+    def op_13( self, mem, ios):
+        self.de = ( self.de + 1) & 0xffff
+        self.pc = ( self.pc + 1) & 0xffff
+
+    def op_17( self, mem, ios):
+        new_a = (self.a << 1 ) & 0xff
+        if bit_is_set( self.f, self.flag_carry):
+            new_a |= 0x01
+        if bit_is_set( self.a, 7):
+            self.f = set_bit( self.f, self.flag_carry)
         else:
-            self.f = clr_bit( self.f, self.flag_sign)
-
-        if self.a == 0:
-            self.f = set_bit( self.f, self.flag_zero)
+            self.f = clr_bit( self.f, self.flag_carry)
+        self.a = new_a
+        self.f = ( self.f & ( mask_sign | mask_zero | mask_par | mask_carry)) | ( new_a & ( mask_five | mask_tree))
+        self.pc = ( self.pc + 1) & 0xffff
+
+    def op_18( self, mem, ios):
+        value = mem.read( self.pc + 1)
+        if value > 127:
+            value -= 256 
+        self.pc = self.pc + value
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_19( self, mem, ios):
+        self.hl = self.add16_( self.hl, self.de)
+        self.pc = ( self.pc + 1) & 0xffff
+
+    def op_1a( self, mem, ios):
+        value = mem.read( self.de)
+        self.a = value
+        self.pc = ( self.pc + 1) & 0xffff
+
+    def op_1b( self, mem, ios):
+        self.de = ( self.de - 1) & 0xffff
+        self.pc = ( self.pc + 1) & 0xffff
+
+    def op_1f( self, mem, ios):
+        new_a = self.a >> 1
+        new_cy = self.a & 0x01
+        if bit_is_set( self.f, self.flag_carry):
+            new_a |= 0x80
+        self.a = new_a
+        if new_cy > 0:
+            self.f = set_bit( self.f, self.flag_carry)
         else:
-            self.f = clr_bit( self.f, self.flag_zero)
+            self.f = clr_bit( self.f, self.flag_carry)
+        self.f = ( self.f & ( mask_sign | mask_zero | mask_par | mask_carry)) | ( new_a & ( mask_five | mask_tree))
+        self.pc = ( self.pc + 1) & 0xffff
+
+    def op_20( self, mem, ios):
+        offset = mem.read( self.pc + 1)
+        if offset > 127:
+            offset -= 256 
+        if bit_is_clear( self.f, self.flag_zero):
+            self.pc = self.pc + offset
+            self.cycles += 5
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_21( self, mem, ios):
+        value = mem.read16( self.pc + 1)
+        self.set_hl( value)
+        self.pc = ( self.pc + 3) & 0xffff
+
+    def op_22( self, mem, ios):
+        addr = mem.read16( self.pc + 1)
+        mem.write16( addr, self.hl)
+        self.pc = ( self.pc + 3) & 0xffff
+
+    def op_23( self, mem, ios):
+        self.hl = ( self.hl + 1) & 0xffff
+        self.pc = ( self.pc + 1) & 0xffff
+
+    def op_27( self, mem, ios):
+        """
+When this instruction is executed, the A register is BCD corrected using the contents of the flags. The exact process is the following: if the least significant four bits of A contain a non-BCD digit (i. e. it is greater than 9) or the H flag is set, then $06 is added to the register. Then the four most significant bits are checked. If this more significant digit also happens to be greater than 9 or the C flag is set, then $60 is added.
+"""
+        value = self.a
+        correction = 0
+        carry = self.f & mask_carry
+        if ( value & 0x0f) > 9 or self.f & mask_half:
+            correction |= 0x06
+        if value > 0x99 or carry:
+            correction |= 0x60
+            carry = mask_carry
+
+        if self.f & mask_sub:
+            if self.f & mask_half and ( value & 0x0f) < 6:
+                half = mask_half
+            else:
+                half = 0
+            value = ( value - correction) & 0xff
+        else:
+            if ( value & 0x0f) > 9:
+                half = mask_half
+            else:
+                half = 0
+            value = ( value + correction) & 0xff
+
+        self.a = value
+        self.f = szp[ value] | half | carry | ( self.f & mask_sub)
+        self.pc = ( self.pc + 1) & 0xffff
+
+    def op_28( self, mem, ios):
+        value = mem.read( self.pc + 1)
+        if value > 127:
+            value -= 256 
+        if bit_is_set( self.f, self.flag_zero):
+            self.pc = self.pc + value
+            self.cycles += 5
+        self.pc = ( self.pc + 2) & 0xffff
 
+    def op_29( self, mem, ios):
+        self.hl = self.add16_( self.hl, self.hl)
+        self.pc = ( self.pc + 1) & 0xffff
 
-    def and_( self, value):
-        self.f = clr_bit( self.f, self.flag_sub)
-        self.f = set_bit( self.f, self.flag_par)
-        self.f = clr_bit( self.f, self.flag_carry)
+    def op_2a( self, mem, ios):
+        addr = mem.read16( self.pc + 1)
+        self.set_hl( mem.read16( addr))
+        self.pc = ( self.pc + 3) & 0xffff
+
+    def op_2b( self, mem, ios):
+        self.hl = ( self.hl - 1) & 0xffff
+        self.pc = ( self.pc + 1) & 0xffff
+
+    def op_2f( self, mem, ios):
         self.f = set_bit( self.f, self.flag_half)
+        self.f = set_bit( self.f, self.flag_sub)
+        self.a = self.a ^ 0xff
+        self.pc = ( self.pc + 1) & 0xffff
+
+    def op_30( self, mem, ios):
+        value = mem.read( self.pc + 1)
+        if value > 127:
+            value -= 256 
+        if bit_is_clear( self.f, self.flag_carry):
+            self.pc = self.pc + value
+            self.cycles += 5
+        self.pc = ( self.pc + 2) & 0xffff
 
-        self.a = self.a & value
+    def op_31( self, mem, ios):
+        value = mem.read16( self.pc + 1)
+        self.set_sp( value)
+        self.pc = ( self.pc + 3) & 0xffff
 
-        if self.a > 127:
-            self.f = set_bit( self.f, self.flag_sign)
-        else:
-            self.f = clr_bit( self.f, self.flag_sign)
+    def op_32( self, mem, ios):
+        addr = mem.read16( self.pc + 1)
+        mem.write( addr, self.a)
+        self.pc = ( self.pc + 3) & 0xffff
 
-        if self.a == 0:
-            self.f = set_bit( self.f, self.flag_zero)
-        else:
-            self.f = clr_bit( self.f, self.flag_zero)
+    def op_33( self, mem, ios):
+        self.sp = ( self.sp + 1) & 0xffff
+        self.pc = ( self.pc + 1) & 0xffff
 
-    def bit_( self, value, bit):
+    def op_37( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_carry)
         self.f = clr_bit( self.f, self.flag_sub)
-        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_half)
+        self.pc = ( self.pc + 1) & 0xffff
 
-        if bit_is_clear( value, bit):
-            self.f = set_bit( self.f, self.flag_zero)
-        else:
-            self.f = clr_bit( self.f, self.flag_zero)
+    def op_38( self, mem, ios):
+        value = mem.read( self.pc + 1)
+        if value > 127:
+            value -= 256 
+        if bit_is_set( self.f, self.flag_carry):
+            self.pc = self.pc + value
+            self.cycles += 5
+        self.pc = ( self.pc + 2) & 0xffff
 
+    def op_39( self, mem, ios):
+        self.hl = self.add16_( self.hl, self.sp)
+        self.pc = ( self.pc + 1) & 0xffff
 
-    def dec_( self, value):
-        self.f = set_bit( self.f, self.flag_sub)
-        self.f = clr_bit( self.f, self.flag_par)
+    def op_3a( self, mem, ios):
+        addr = mem.read16( self.pc + 1)
+        self.a = mem.read( addr)
+        self.pc = ( self.pc + 3) & 0xffff
 
-        result, half_a, carry, overflow = self.__sub( value, 1, 0)
+    def op_3b( self, mem, ios):
+        self.sp = ( self.sp - 1) & 0xffff
+        self.pc = ( self.pc + 1) & 0xffff
 
-        if half_a == 1:
-            self.f = set_bit( self.f, self.flag_half)
+    def op_3f( self, mem, ios):
+        if bit_is_set( self.f, self.flag_carry):
+            self.f = clr_bit( self.f, self.flag_carry)
         else:
-            self.f = clr_bit( self.f, self.flag_half)
-
-        if carry == 1:
             self.f = set_bit( self.f, self.flag_carry)
-        else:
-            self.f = clr_bit( self.f, self.flag_carry)
+        self.f = clr_bit( self.f, self.flag_sub)
+        self.pc = ( self.pc + 1) & 0xffff
 
-        if overflow == 1:
-            self.f = set_bit( self.f, self.flag_par)
-        else:
-            self.f = clr_bit( self.f, self.flag_par)
+    def op_76( self, mem, ios):
+        # pc stays, HALT repeats until an interrupt, see due()
+        self.running = False
+        self.deadline = self.cycles
 
-        if result > 0x7f:
-            self.f = set_bit( self.f, self.flag_sign)
+    def op_c0( self, mem, ios):
+        if bit_is_clear( self.f, self.flag_zero):
+            self.pc = self.pop_( mem)
+            self.cycles += 6
         else:
-            self.f = clr_bit( self.f, self.flag_sign)
+            self.pc = ( self.pc + 1) & 0xffff
 
-        if result == 0:
-            self.f = set_bit( self.f, self.flag_zero)
+    def op_c1( self, mem, ios):
+        self.bc = self.pop_( mem)
+        self.pc = ( self.pc + 1) & 0xffff
+
+    def op_c2( self, mem, ios):
+        addr = mem.read16( self.pc + 1)
+        if bit_is_clear( self.f, self.flag_zero):
+            self.pc = addr
         else:
-            self.f = clr_bit( self.f, self.flag_zero)
+            self.pc = ( self.pc + 3) & 0xffff
 
-        return result
+    def op_c3( self, mem, ios):
+        addr = mem.read16( self.pc + 1)
+        self.pc = addr
 
+    def op_c4( self, mem, ios):
+        addr = mem.read16( self.pc + 1)
+        if bit_is_clear( self.f, self.flag_zero):
+            self.push_( mem, self.pc + 3)
+            self.pc = addr
+            self.cycles += 7
+        else:
+            self.pc = ( self.pc + 3) & 0xffff
 
-    def inc_( self, value):
-        self.f = clr_bit( self.f, self.flag_sub)
-        self.f = clr_bit( self.f, self.flag_par)
+    def op_c5( self, mem, ios):
+        self.push_( mem, self.bc)
+        self.pc = ( self.pc + 1) & 0xffff
 
-        result, half_a, carry, overflow = self.__add( value, 1, 0)
+    def op_c7( self, mem, ios):
+        self.push_( mem, self.pc + 1)
+        self.pc = 0x00
 
-        if half_a == 1:
-            self.f = set_bit( self.f, self.flag_half)
+    def op_c8( self, mem, ios):
+        if bit_is_set( self.f, self.flag_zero):
+            self.pc = self.pop_( mem)
+            self.cycles += 6
         else:
-            self.f = clr_bit( self.f, self.flag_half)
+            self.pc = ( self.pc + 1) & 0xffff
 
-        if carry == 1:
-            self.f = set_bit( self.f, self.flag_carry)
-        else:
-            self.f = clr_bit( self.f, self.flag_carry)
+    def op_c9( self, mem, ios):
+        self.pc = self.pop_( mem)
 
-        if overflow == 1:
-            self.f = set_bit( self.f, self.flag_par)
+    def op_ca( self, mem, ios):
+        addr = mem.read16( self.pc + 1)
+        if bit_is_set( self.f, self.flag_zero):
+            self.pc = addr
         else:
-            self.f = clr_bit( self.f, self.flag_par)
+            self.pc = ( self.pc + 3) & 0xffff
 
-        if result > 0x7f:
-            self.f = set_bit( self.f, self.flag_sign)
-        else:
-            self.f = clr_bit( self.f, self.flag_sign)
+    ###################
+    # enhanced commands
+    def op_cb( self, mem, ios):
+        cmd2 = mem.read( self.pc + 1)
+        self.cb_table[ cmd2]( self, mem, ios)
 
-        if result == 0:
-            self.f = set_bit( self.f, self.flag_zero)
+
+    def op_cc( self, mem, ios):
+        addr = mem.read16( self.pc + 1)
+        if bit_is_set( self.f, self.flag_zero):
+            self.push_( mem, self.pc + 3)
+            self.pc = addr
+            self.cycles += 7
         else:
-            self.f = clr_bit( self.f, self.flag_zero)
+            self.pc = ( self.pc + 3) & 0xffff
 
-        return result
+    def op_cd( self, mem, ios):
+        addr = mem.read16( self.pc + 1)
+        self.push_( mem, self.pc + 3)
+        self.pc = addr
 
+    def op_cf( self, mem, ios):
+        self.push_( mem, self.pc + 1)
+        self.pc = 0x08
 
-    def or_( self, value):
-        self.f = clr_bit( self.f, self.flag_sub)
-        self.f = set_bit( self.f, self.flag_par)
-        self.f = clr_bit( self.f, self.flag_carry)
-        self.f = set_bit( self.f, self.flag_half)
+    def op_d0( self, mem, ios):
+        if bit_is_clear( self.f, self.flag_carry):
+            self.pc = self.pop_( mem)
+            self.cycles += 6
+        else:
+            self.pc = ( self.pc + 1) & 0xffff
 
-        self.a = self.a | value
+    def op_d1( self, mem, ios):
+        self.de = self.pop_( mem)
+        self.pc = ( self.pc + 1) & 0xffff
 
-        if self.a > 127:
-            self.f = set_bit( self.f, self.flag_sign)
+    def op_d2( self, mem, ios):
+        addr = mem.read16( self.pc + 1)
+        if bit_is_clear( self.f, self.flag_carry):
+            self.pc = addr
         else:
-            self.f = clr_bit( self.f, self.flag_sign)
+            self.pc = ( self.pc + 3) & 0xffff
 
-        if self.a == 0:
-            self.f = set_bit( self.f, self.flag_zero)
+    def op_d3( self, mem, ios):
+        port = mem.read( self.pc + 1)
+        self.pc = ( self.pc + 2) & 0xffff
+        ios.write( port, self.a)
+
+    def op_d4( self, mem, ios):
+        addr = mem.read16( self.pc + 1)
+        if bit_is_clear( self.f, self.flag_carry):
+            self.push_( mem, self.pc + 3)
+            self.pc = addr
+            self.cycles += 7
         else:
-            self.f = clr_bit( self.f, self.flag_zero)
+            self.pc = ( self.pc + 3) & 0xffff
 
+    def op_d5( self, mem, ios):
+        self.push_( mem, self.de)
+        self.pc = ( self.pc + 1) & 0xffff
 
-    def sbc_( self, value):
-        self.f = set_bit( self.f, self.flag_sub)
-        self.f = clr_bit( self.f, self.flag_par)
+    def op_d7( self, mem, ios):
+        self.push_( mem, self.pc + 1)
+        self.pc = 0x10
 
+    def op_d8( self, mem, ios):
         if bit_is_set( self.f, self.flag_carry):
-            carry_in = 1
+            self.pc = self.pop_( mem)
+            self.cycles += 6
         else:
-            carry_in = 0
+            self.pc = ( self.pc + 1) & 0xffff
 
-        result, half_a, carry, overflow = self.__sub( self.a, value, carry_in)
-        self.a = result
+    def op_d9( self, mem, ios):
+        self.bc, self.bc_ = self.bc_, self.bc
+        self.de, self.de_ = self.de_, self.de
+        self.hl, self.hl_ = self.hl_, self.hl
+        self.pc = ( self.pc + 1) & 0xffff
 
-        if half_a == 1:
-            self.f = set_bit( self.f, self.flag_half)
+    def op_da( self, mem, ios):
+        addr = mem.read16( self.pc + 1)
+        if bit_is_set( self.f, self.flag_carry):
+            self.pc = addr
         else:
-            self.f = clr_bit( self.f, self.flag_half)
+            self.pc = ( self.pc + 3) & 0xffff
 
-        if carry == 1:
-            self.f = set_bit( self.f, self.flag_carry)
-        else:
-            self.f = clr_bit( self.f, self.flag_carry)
+    def op_db( self, mem, ios):
+        port = mem.read( self.pc + 1)
+        self.pc = ( self.pc + 2) & 0xffff
+        value = ios.read( port)
+        self.a = value
+        # keine Flagbeeinflussung
 
-        if overflow == 1:
-            self.f = set_bit( self.f, self.flag_par)
+    def op_dc( self, mem, ios):
+        addr = mem.read16( self.pc + 1)
+        if bit_is_set( self.f, self.flag_carry):
+            self.push_( mem, self.pc + 3)
+            self.pc = addr
+            self.cycles += 7
         else:
-            self.f = clr_bit( self.f, self.flag_par)
+            self.pc = ( self.pc + 3) & 0xffff
 
-        if self.a > 0x7f:
-            self.f = set_bit( self.f, self.flag_sign)
+    ###################
+    # enhanced commands
+    def op_dd( self, mem, ios):
+        cmd2 = mem.read( self.pc + 1)
+        bind_operands( self.dd_table[ cmd2], mem, self.pc + 2)( self, mem, ios)
+
+
+    def op_df( self, mem, ios):
+        self.push_( mem, self.pc + 1)
+        self.pc = 0x18
+
+    def op_e0( self, mem, ios):
+        if bit_is_clear( self.f, self.flag_par):
+            self.pc = self.pop_( mem)
+            self.cycles += 6
         else:
-            self.f = clr_bit( self.f, self.flag_sign)
+            self.pc = ( self.pc + 1) & 0xffff
 
-        if self.a == 0:
-            self.f = set_bit( self.f, self.flag_zero)
+    def op_e1( self, mem, ios):
+        self.hl = self.pop_( mem)
+        self.pc = ( self.pc + 1) & 0xffff
+
+    def op_e2( self, mem, ios):
+        addr = mem.read16( self.pc + 1)
+        if bit_is_clear( self.f, self.flag_par):
+            self.pc = addr
         else:
-            self.f = clr_bit( self.f, self.flag_zero)
+            self.pc = ( self.pc + 3) & 0xffff
 
+    def op_e3( self, mem, ios):
+        value1 = mem.read16( self.sp)
+        value2 = self.hl
 
-    def sbc16_( self, value):
-        # S Z H P/V N C
-        # * * x   V 1 *
-        self.f = set_bit( self.f, self.flag_sub)
-        self.f = clr_bit( self.f, self.flag_par)
+        mem.write16( self.sp, value2)
+        self.hl = value1
 
-        if bit_is_set( self.f, self.flag_carry):
-            carry_in = 1
+        self.pc = ( self.pc + 1) & 0xffff
+
+    def op_e4( self, mem, ios):
+        addr = mem.read16( self.pc + 1)
+        if bit_is_clear( self.f, self.flag_par):
+            self.push_( mem, self.pc + 3)
+            self.pc = addr
+            self.cycles += 7
         else:
-            carry_in = 0
+            self.pc = ( self.pc + 3) & 0xffff
 
-        result = self.hl - value - carry_in
+    def op_e5( self, mem, ios):
+        self.push_( mem, self.hl)
+        self.pc = ( self.pc + 1) & 0xffff
 
-        carry = 0
-        if result % 0xf0000 > 0:
-            carry = 1
+    def op_e7( self, mem, ios):
+        self.push_( mem, self.pc + 1)
+        self.pc = 0x20
 
-        overflow = 0
-        if result < 0:
-            overflow = 1
+    def op_e8( self, mem, ios):
+        if bit_is_set( self.f, self.flag_par):
+            self.pc = self.pop_( mem)
+            self.cycles += 6
+        else:
+            self.pc = ( self.pc + 1) & 0xffff
 
-        result %= 0xffff
+    def op_e9( self, mem, ios):
+        self.pc = self.hl
 
-        self.hl = result
+    def op_ea( self, mem, ios):
+        addr = mem.read16( self.pc + 1)
+        if bit_is_set( self.f, self.flag_par):
+            self.pc = addr
+        else:
+            self.pc = ( self.pc + 3) & 0xffff
 
-        if carry == 1:
-            self.f = set_bit( self.f, self.flag_carry)
+    def op_eb( self, mem, ios):
+        de = self.de
+        hl = self.hl
+        self.hl = de
+        self.de = hl
+        self.pc = ( self.pc + 1) & 0xffff
+
+    def op_ec( self, mem, ios):
+        addr = mem.read16( self.pc + 1)
+        if bit_is_set( self.f, self.flag_par):
+            self.push_( mem, self.pc + 3)
+            self.pc = addr
+            self.cycles += 7
         else:
-            self.f = clr_bit( self.f, self.flag_carry)
+            self.pc = ( self.pc + 3) & 0xffff
 
-        if overflow == 1:
-            self.f = set_bit( self.f, self.flag_par)
+    ###################
+    # enhanced commands
+    def op_ed( self, mem, ios):
+        cmd2 = mem.read( self.pc + 1)
+        self.ed_table[ cmd2]( self, mem, ios)
+
+
+    def op_ef( self, mem, ios):
+        self.push_( mem, self.pc + 1)
+        self.pc = 0x28
+
+    def op_f0( self, mem, ios):
+        if bit_is_clear( self.f, self.flag_sign):
+            self.pc = self.pop_( mem)
+            self.cycles += 6
         else:
-            self.f = clr_bit( self.f, self.flag_par)
+            self.pc = ( self.pc + 1) & 0xffff
 
-        # sign
-        if self.hl > 0x7fff:
-            self.f = set_bit( self.f, self.flag_sign)
+    def op_f1( self, mem, ios):
+        self.set_af( self.pop_( mem))
+        self.pc = ( self.pc + 1) & 0xffff
+
+    def op_f2( self, mem, ios):
+        addr = mem.read16( self.pc + 1)
+        if bit_is_clear( self.f, self.flag_sign):
+            self.pc = addr
         else:
-            self.f = clr_bit( self.f, self.flag_sign)
+            self.pc = ( self.pc + 3) & 0xffff
+
+    def op_f3( self, mem, ios):
+        self.iff1 = False
+        self.iff2 = False
+        self.pc = ( self.pc + 1) & 0xffff
+
+    def op_f4( self, mem, ios):
+        addr = mem.read16( self.pc + 1)
+        if bit_is_clear( self.f, self.flag_sign):
+            self.push_( mem, self.pc + 3)
+            self.pc = addr
+            self.cycles += 7
+        else:
+            self.pc = ( self.pc + 3) & 0xffff
+
+    def op_f5( self, mem, ios):
+        value = self.get_af()
+        self.push_( mem, value)
+        self.pc = ( self.pc + 1) & 0xffff
+
+    def op_f7( self, mem, ios):
+        self.push_( mem, self.pc + 1)
+        self.pc = 0x30
+
+    def op_f8( self, mem, ios):
+        if bit_is_set( self.f, self.flag_sign):
+            self.pc = self.pop_( mem)
+            self.cycles += 6
+        else:
+            self.pc = ( self.pc + 1) & 0xffff
+
+    def op_f9( self, mem, ios):
+        self.set_sp( self.hl)
+        self.pc = ( self.pc + 1) & 0xffff
+
+    def op_fa( self, mem, ios):
+        addr = mem.read16( self.pc + 1)
+        if bit_is_set( self.f, self.flag_sign):
+            self.pc = addr
+        else:
+            self.pc = ( self.pc + 3) & 0xffff
+
+    def op_fb( self, mem, ios):
+        self.iff1 = True
+        self.iff2 = True
+        self.ei_cycle = self.cycles
+        self.deadline = self.cycles
+        self.pc = ( self.pc + 1) & 0xffff
+
+    def op_fc( self, mem, ios):
+        addr = mem.read16( self.pc + 1)
+        if bit_is_set( self.f, self.flag_sign):
+            self.push_( mem, self.pc + 3)
+            self.pc = addr
+            self.cycles += 7
+        else:
+            self.pc = ( self.pc + 3) & 0xffff
+
+    ###################
+    # enhanced commands
+    def op_fd( self, mem, ios):
+        cmd2 = mem.read( self.pc + 1)
+        bind_operands( self.fd_table[ cmd2], mem, self.pc + 2)( self, mem, ios)
+
+
+    def op_ff( self, mem, ios):
+        self.push_( mem, self.pc + 1)
+        self.pc = 0x38
+
+    def op_unknown( self, mem, ios):
+        cmd = mem.read( self.pc)
+        self.pc = ( self.pc + 1) & 0xffff
+        print    ( "command %02X not implmented!  " % cmd)
+        #raise ValueError
+
+
+    ##############################
+    # prefix CB, bit commands
+    #
+    # rotate and shift CB 00..3F are built from tables, see below
+
+    def op_cb_40( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( ( self.bc >> 8), 0):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_41( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( ( self.bc & 0xff), 0):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_42( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( ( self.de >> 8), 0):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_43( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( ( self.de & 0xff), 0):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_44( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( ( self.hl >> 8), 0):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_45( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( ( self.hl & 0xff), 0):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_46( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( mem.read( self.hl), 0):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_47( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( self.a, 0):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_48( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( ( self.bc >> 8), 1):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_49( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( ( self.bc & 0xff), 1):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_4a( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( ( self.de >> 8), 1):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_4b( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( ( self.de & 0xff), 1):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_4c( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( ( self.hl >> 8), 1):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_4d( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( ( self.hl & 0xff), 1):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_4e( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( mem.read( self.hl), 1):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_4f( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( self.a, 1):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_50( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( ( self.bc >> 8), 2):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_51( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( ( self.bc & 0xff), 2):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_52( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( ( self.de >> 8), 2):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_53( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( ( self.de & 0xff), 2):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_54( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( ( self.hl >> 8), 2):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_55( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( ( self.hl & 0xff), 2):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_56( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( mem.read( self.hl), 2):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_57( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( self.a, 2):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_58( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( ( self.bc >> 8), 3):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_59( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( ( self.bc & 0xff), 3):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_5a( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( ( self.de >> 8), 3):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_5b( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( ( self.de & 0xff), 3):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_5c( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( ( self.hl >> 8), 3):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_5d( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( ( self.hl & 0xff), 3):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_5e( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( mem.read( self.hl), 3):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_5f( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( self.a, 3):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_60( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( ( self.bc >> 8), 4):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_61( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( ( self.bc & 0xff), 4):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_62( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( ( self.de >> 8), 4):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_63( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( ( self.de & 0xff), 4):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_64( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( ( self.hl >> 8), 4):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_65( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( ( self.hl & 0xff), 4):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_66( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( mem.read( self.hl), 4):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_67( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( self.a, 4):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_68( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( ( self.bc >> 8), 5):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_69( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( ( self.bc & 0xff), 5):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_6a( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( ( self.de >> 8), 5):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_6b( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( ( self.de & 0xff), 5):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_6c( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( ( self.hl >> 8), 5):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_6d( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( ( self.hl & 0xff), 5):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_6e( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( mem.read( self.hl), 5):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_6f( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( self.a, 5):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_70( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( ( self.bc >> 8), 6):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_71( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( ( self.bc & 0xff), 6):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_72( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( ( self.de >> 8), 6):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
 
-        # zero
-        if self.hl == 0:
+    def op_cb_73( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( ( self.de & 0xff), 6):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
             self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_74( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( ( self.hl >> 8), 6):
+            self.f = clr_bit( self.f, self.flag_zero)
         else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_75( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( ( self.hl & 0xff), 6):
             self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
 
+    def op_cb_76( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( mem.read( self.hl), 6):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
 
-    def sub_( self, value):
-        self.f = set_bit( self.f, self.flag_sub)
-        self.f = clr_bit( self.f, self.flag_par)
+    def op_cb_77( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( self.a, 6):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
 
-        result, half_a, carry, overflow = self.__sub( self.a, value, 0)
-        self.a = result
+    def op_cb_78( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( ( self.bc >> 8), 7):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
 
-        if half_a == 1:
-            self.f = set_bit( self.f, self.flag_half)
+    def op_cb_79( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( ( self.bc & 0xff), 7):
+            self.f = clr_bit( self.f, self.flag_zero)
         else:
-            self.f = clr_bit( self.f, self.flag_half)
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
 
-        if carry == 1:
-            self.f = set_bit( self.f, self.flag_carry)
+    def op_cb_7a( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( ( self.de >> 8), 7):
+            self.f = clr_bit( self.f, self.flag_zero)
         else:
-            self.f = clr_bit( self.f, self.flag_carry)
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
 
-        if overflow == 1:
-            self.f = set_bit( self.f, self.flag_par)
+    def op_cb_7b( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( ( self.de & 0xff), 7):
+            self.f = clr_bit( self.f, self.flag_zero)
         else:
-            self.f = clr_bit( self.f, self.flag_par)
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
 
-        if self.a > 0x7f:
-            self.f = set_bit( self.f, self.flag_sign)
+    def op_cb_7c( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( ( self.hl >> 8), 7):
+            self.f = clr_bit( self.f, self.flag_zero)
         else:
-            self.f = clr_bit( self.f, self.flag_sign)
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
 
-        if self.a == 0:
+    def op_cb_7d( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( ( self.hl & 0xff), 7):
+            self.f = clr_bit( self.f, self.flag_zero)
+        else:
             self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_7e( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( mem.read( self.hl), 7):
+            self.f = clr_bit( self.f, self.flag_zero)
         else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_7f( self, mem, ios):
+        self.f = set_bit( self.f, self.flag_half)
+        self.f = clr_bit( self.f, self.flag_sub)
+        if bit_is_set( self.a, 7):
             self.f = clr_bit( self.f, self.flag_zero)
+        else:
+            self.f = set_bit( self.f, self.flag_zero)
+        self.pc = ( self.pc + 2) & 0xffff
 
+    def op_cb_87( self, mem, ios):
+        self.a = clr_bit( self.a, 0)
+        self.pc = ( self.pc + 2) & 0xffff
 
-    def xor_( self, value):
-        self.f = clr_bit( self.f, self.flag_sub)
-        self.f = set_bit( self.f, self.flag_par)
-        self.f = clr_bit( self.f, self.flag_carry)
-        self.f = clr_bit( self.f, self.flag_half)
+    def op_cb_8f( self, mem, ios):
+        self.a = clr_bit( self.a, 1)
+        self.pc = ( self.pc + 2) & 0xffff
 
-        self.a = self.a ^ value
+    def op_cb_97( self, mem, ios):
+        self.a = clr_bit( self.a, 2)
+        self.pc = ( self.pc + 2) & 0xffff
 
-        if self.a > 127:
-            self.f = set_bit( self.f, self.flag_sign)
-        else:
-            self.f = clr_bit( self.f, self.flag_sign)
+    def op_cb_9f( self, mem, ios):
+        self.a = clr_bit( self.a, 3)
+        self.pc = ( self.pc + 2) & 0xffff
 
-        if self.a == 0:
-            self.f = set_bit( self.f, self.flag_zero)
-        else:
-            self.f = clr_bit( self.f, self.flag_zero)
+    def op_cb_a7( self, mem, ios):
+        self.a = clr_bit( self.a, 4)
+        self.pc = ( self.pc + 2) & 0xffff
 
-    def push_( self, mem, value):
-        self.sp -= 2
-        mem.write16( self.sp, value)
+    def op_cb_af( self, mem, ios):
+        self.a = clr_bit( self.a, 5)
+        self.pc = ( self.pc + 2) & 0xffff
 
+    def op_cb_b7( self, mem, ios):
+        self.a = clr_bit( self.a, 6)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_bf( self, mem, ios):
+        self.a = clr_bit( self.a, 7)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_c0( self, mem, ios):
+        self.bc = ( ( set_bit( ( self.bc >> 8), 0) & 0xff) << 8) | ( self.bc & 0x00ff)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_c1( self, mem, ios):
+        self.bc = ( self.bc & 0xff00) | ( set_bit( ( self.bc & 0xff), 0) & 0xff)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_c2( self, mem, ios):
+        self.de = ( ( set_bit( ( self.de >> 8), 0) & 0xff) << 8) | ( self.de & 0x00ff)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_c3( self, mem, ios):
+        self.de = ( self.de & 0xff00) | ( set_bit( ( self.de & 0xff), 0) & 0xff)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_c4( self, mem, ios):
+        self.hl = ( ( set_bit( ( self.hl >> 8), 0) & 0xff) << 8) | ( self.hl & 0x00ff)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_c5( self, mem, ios):
+        self.hl = ( self.hl & 0xff00) | ( set_bit( ( self.hl & 0xff), 0) & 0xff)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_c6( self, mem, ios):
+        value = mem.read( self.hl)
+        result = set_bit( value, 0)
+        mem.write( self.hl, result)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_c7( self, mem, ios):
+        self.a = set_bit( self.a, 0)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_c8( self, mem, ios):
+        self.bc = ( ( set_bit( ( self.bc >> 8), 1) & 0xff) << 8) | ( self.bc & 0x00ff)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_c9( self, mem, ios):
+        self.bc = ( self.bc & 0xff00) | ( set_bit( ( self.bc & 0xff), 1) & 0xff)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_ca( self, mem, ios):
+        self.de = ( ( set_bit( ( self.de >> 8), 1) & 0xff) << 8) | ( self.de & 0x00ff)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_cb( self, mem, ios):
+        self.de = ( self.de & 0xff00) | ( set_bit( ( self.de & 0xff), 1) & 0xff)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_cc( self, mem, ios):
+        self.hl = ( ( set_bit( ( self.hl >> 8), 1) & 0xff) << 8) | ( self.hl & 0x00ff)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_cd( self, mem, ios):
+        self.hl = ( self.hl & 0xff00) | ( set_bit( ( self.hl & 0xff), 1) & 0xff)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_ce( self, mem, ios):
+        value = mem.read( self.hl)
+        result = set_bit( value, 1)
+        mem.write( self.hl, result)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_cf( self, mem, ios):
+        self.a = set_bit( self.a, 1)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_d0( self, mem, ios):
+        self.bc = ( ( set_bit( ( self.bc >> 8), 2) & 0xff) << 8) | ( self.bc & 0x00ff)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_d1( self, mem, ios):
+        self.bc = ( self.bc & 0xff00) | ( set_bit( ( self.bc & 0xff), 2) & 0xff)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_d2( self, mem, ios):
+        self.de = ( ( set_bit( ( self.de >> 8), 2) & 0xff) << 8) | ( self.de & 0x00ff)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_d3( self, mem, ios):
+        self.de = ( self.de & 0xff00) | ( set_bit( ( self.de & 0xff), 2) & 0xff)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_d4( self, mem, ios):
+        self.hl = ( ( set_bit( ( self.hl >> 8), 2) & 0xff) << 8) | ( self.hl & 0x00ff)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_d5( self, mem, ios):
+        self.hl = ( self.hl & 0xff00) | ( set_bit( ( self.hl & 0xff), 2) & 0xff)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_d6( self, mem, ios):
+        value = mem.read( self.hl)
+        result = set_bit( value, 2)
+        mem.write( self.hl, result)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_d7( self, mem, ios):
+        self.a = set_bit( self.a, 2)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_d8( self, mem, ios):
+        self.bc = ( ( set_bit( ( self.bc >> 8), 3) & 0xff) << 8) | ( self.bc & 0x00ff)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_d9( self, mem, ios):
+        self.bc = ( self.bc & 0xff00) | ( set_bit( ( self.bc & 0xff), 3) & 0xff)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_da( self, mem, ios):
+        self.de = ( ( set_bit( ( self.de >> 8), 3) & 0xff) << 8) | ( self.de & 0x00ff)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_db( self, mem, ios):
+        self.de = ( self.de & 0xff00) | ( set_bit( ( self.de & 0xff), 3) & 0xff)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_dc( self, mem, ios):
+        self.hl = ( ( set_bit( ( self.hl >> 8), 3) & 0xff) << 8) | ( self.hl & 0x00ff)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_dd( self, mem, ios):
+        self.hl = ( self.hl & 0xff00) | ( set_bit( ( self.hl & 0xff), 3) & 0xff)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_de( self, mem, ios):
+        value = mem.read( self.hl)
+        result = set_bit( value, 3)
+        mem.write( self.hl, result)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_df( self, mem, ios):
+        self.a = set_bit( self.a, 3)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_e0( self, mem, ios):
+        self.bc = ( ( set_bit( ( self.bc >> 8), 4) & 0xff) << 8) | ( self.bc & 0x00ff)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_e1( self, mem, ios):
+        self.bc = ( self.bc & 0xff00) | ( set_bit( ( self.bc & 0xff), 4) & 0xff)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_e2( self, mem, ios):
+        self.de = ( ( set_bit( ( self.de >> 8), 4) & 0xff) << 8) | ( self.de & 0x00ff)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_e3( self, mem, ios):
+        self.de = ( self.de & 0xff00) | ( set_bit( ( self.de & 0xff), 4) & 0xff)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_e4( self, mem, ios):
+        self.hl = ( ( set_bit( ( self.hl >> 8), 4) & 0xff) << 8) | ( self.hl & 0x00ff)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_e5( self, mem, ios):
+        self.hl = ( self.hl & 0xff00) | ( set_bit( ( self.hl & 0xff), 4) & 0xff)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_e6( self, mem, ios):
+        value = mem.read( self.hl)
+        result = set_bit( value, 4)
+        mem.write( self.hl, result)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_e7( self, mem, ios):
+        self.a = set_bit( self.a, 4)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_e8( self, mem, ios):
+        self.bc = ( ( set_bit( ( self.bc >> 8), 5) & 0xff) << 8) | ( self.bc & 0x00ff)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_e9( self, mem, ios):
+        self.bc = ( self.bc & 0xff00) | ( set_bit( ( self.bc & 0xff), 5) & 0xff)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_ea( self, mem, ios):
+        self.de = ( ( set_bit( ( self.de >> 8), 5) & 0xff) << 8) | ( self.de & 0x00ff)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_eb( self, mem, ios):
+        self.de = ( self.de & 0xff00) | ( set_bit( ( self.de & 0xff), 5) & 0xff)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_ec( self, mem, ios):
+        self.hl = ( ( set_bit( ( self.hl >> 8), 5) & 0xff) << 8) | ( self.hl & 0x00ff)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_ed( self, mem, ios):
+        self.hl = ( self.hl & 0xff00) | ( set_bit( ( self.hl & 0xff), 5) & 0xff)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_ee( self, mem, ios):
+        value = mem.read( self.hl)
+        result = set_bit( value, 5)
+        mem.write( self.hl, result)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_ef( self, mem, ios):
+        self.a = set_bit( self.a, 5)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_f0( self, mem, ios):
+        self.bc = ( ( set_bit( ( self.bc >> 8), 6) & 0xff) << 8) | ( self.bc & 0x00ff)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_f1( self, mem, ios):
+        self.bc = ( self.bc & 0xff00) | ( set_bit( ( self.bc & 0xff), 6) & 0xff)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_f2( self, mem, ios):
+        self.de = ( ( set_bit( ( self.de >> 8), 6) & 0xff) << 8) | ( self.de & 0x00ff)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_f3( self, mem, ios):
+        self.de = ( self.de & 0xff00) | ( set_bit( ( self.de & 0xff), 6) & 0xff)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_f4( self, mem, ios):
+        self.hl = ( ( set_bit( ( self.hl >> 8), 6) & 0xff) << 8) | ( self.hl & 0x00ff)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_f5( self, mem, ios):
+        self.hl = ( self.hl & 0xff00) | ( set_bit( ( self.hl & 0xff), 6) & 0xff)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_f6( self, mem, ios):
+        value = mem.read( self.hl)
+        result = set_bit( value, 6)
+        mem.write( self.hl, result)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_f7( self, mem, ios):
+        self.a = set_bit( self.a, 6)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_f8( self, mem, ios):
+        self.bc = ( ( set_bit( ( self.bc >> 8), 7) & 0xff) << 8) | ( self.bc & 0x00ff)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_f9( self, mem, ios):
+        self.bc = ( self.bc & 0xff00) | ( set_bit( ( self.bc & 0xff), 7) & 0xff)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_fa( self, mem, ios):
+        self.de = ( ( set_bit( ( self.de >> 8), 7) & 0xff) << 8) | ( self.de & 0x00ff)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_fb( self, mem, ios):
+        self.de = ( self.de & 0xff00) | ( set_bit( ( self.de & 0xff), 7) & 0xff)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_fc( self, mem, ios):
+        self.hl = ( ( set_bit( ( self.hl >> 8), 7) & 0xff) << 8) | ( self.hl & 0x00ff)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_fd( self, mem, ios):
+        self.hl = ( self.hl & 0xff00) | ( set_bit( ( self.hl & 0xff), 7) & 0xff)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_fe( self, mem, ios):
+        value = mem.read( self.hl)
+        result = set_bit( value, 7)
+        mem.write( self.hl, result)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_ff( self, mem, ios):
+        self.a = set_bit( self.a, 7)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_cb_unknown( self, mem, ios):
+        cmd2 = mem.read( self.pc + 1)
+        self.pc = ( self.pc + 2) & 0xffff
+        print    ( "subcommand CB%02X not implmented!  " % cmd2)
+        raise ValueError
+
+
+    ##############################
+    # prefix DD and FD, IX and IY commands
+    #
+    # made from the unprefixed commands, see index registers below
+
+    def op_index_cb( self, mem, ios):
+        # DD CB d op, FD CB d op
+        offset = mem.read( self.pc + 2)
+        cmd4   = mem.read( self.pc + 3)
+        if offset > 127:
+            offset -= 256
+
+        if mem.read( self.pc) == 0xdd:
+            self.ddcb_table[ cmd4]( self, mem, ios, offset)
+        else:
+            self.fdcb_table[ cmd4]( self, mem, ios, offset)
+
+
+    def op_index_unknown( self, mem, ios):
+        cmd  = mem.read( self.pc)
+        cmd2 = mem.read( self.pc + 1)
+        self.pc = ( self.pc + 2) & 0xffff
+        print    ( "subcommand %02X%02X not implmented!  " % ( cmd, cmd2))
+        #raise ValueError
+
+
+    def op_index_cb_unknown( self, mem, ios, offset):
+        cmd  = mem.read( self.pc)
+        cmd4 = mem.read( self.pc + 3)
+        self.pc = ( self.pc + 4) & 0xffff
+        print    ( "subcommand %02XCB%02X%02X not implmented!  " % ( cmd, offset, cmd4))
+
+
+    ##############################
+    # prefix ED, extended commands
+
+    def op_ed_40( self, mem, ios):
+        port = self.bc
+        self.pc = ( self.pc + 2) & 0xffff
+        value = ios.read( port)
+        self.bc = ( ( value & 0xff) << 8) | ( self.bc & 0x00ff)
+        self.f = ( self.f & mask_carry) | szp[ value & 0xff]
+
+    def op_ed_41( self, mem, ios):
+        port = self.bc
+        self.pc = ( self.pc + 2) & 0xffff
+        ios.write( port, ( self.bc >> 8))
+
+    def op_ed_42( self, mem, ios):
+        self.sbc16_( self.bc)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_ed_43( self, mem, ios):
+        addr = mem.read16( self.pc + 2)
+        mem.write16( addr, self.bc)
+        self.pc = ( self.pc + 4) & 0xffff
+
+    def op_ed_45( self, mem, ios):
+        self.pc = self.pop_( mem)
+        self.iff1 = self.iff2
+        self.deadline = self.cycles
+
+    def op_ed_46( self, mem, ios):
+        self.set_im( 0)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_ed_47( self, mem, ios):
+        self.i = self.a
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_ed_48( self, mem, ios):
+        port = self.bc
+        self.pc = ( self.pc + 2) & 0xffff
+        value = ios.read( port)
+        self.bc = ( self.bc & 0xff00) | ( value & 0xff)
+        self.f = ( self.f & mask_carry) | szp[ value & 0xff]
+
+    def op_ed_49( self, mem, ios):
+        port = self.bc
+        self.pc = ( self.pc + 2) & 0xffff
+        ios.write( port, ( self.bc & 0xff))
+
+    def op_ed_4a( self, mem, ios):
+        self.adc16_( self.bc)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_ed_4b( self, mem, ios):
+        addr = mem.read16( self.pc + 2)
+        self.set_bc( mem.read16( addr))
+        self.pc = ( self.pc + 4) & 0xffff
+
+    def op_ed_4d( self, mem, ios):
+        self.pc = self.pop_( mem)
+        self.iff1 = self.iff2
+        self.deadline = self.cycles
+
+    def op_ed_4f( self, mem, ios):
+        self.r = self.a
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_ed_50( self, mem, ios):
+        port = self.bc
+        self.pc = ( self.pc + 2) & 0xffff
+        value = ios.read( port)
+        self.de = ( ( value & 0xff) << 8) | ( self.de & 0x00ff)
+        self.f = ( self.f & mask_carry) | szp[ value & 0xff]
+
+    def op_ed_51( self, mem, ios):
+        port = self.bc
+        self.pc = ( self.pc + 2) & 0xffff
+        ios.write( port, ( self.de >> 8))
+
+    def op_ed_52( self, mem, ios):
+        self.sbc16_( self.de)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_ed_53( self, mem, ios):
+        addr = mem.read16( self.pc + 2)
+        mem.write16( addr, self.de)
+        self.pc = ( self.pc + 4) & 0xffff
+
+    def op_ed_56( self, mem, ios):
+        self.set_im( 1)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_ed_57( self, mem, ios):
+        self.a = self.i
+        self.ld_a_ir_()
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_ed_58( self, mem, ios):
+        port = self.bc
+        self.pc = ( self.pc + 2) & 0xffff
+        value = ios.read( port)
+        self.de = ( self.de & 0xff00) | ( value & 0xff)
+        self.f = ( self.f & mask_carry) | szp[ value & 0xff]
+
+    def op_ed_59( self, mem, ios):
+        port = self.bc
+        self.pc = ( self.pc + 2) & 0xffff
+        ios.write( port, ( self.de & 0xff))
+
+    def op_ed_5a( self, mem, ios):
+        self.adc16_( self.de)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_ed_5b( self, mem, ios):
+        addr = mem.read16( self.pc + 2)
+        self.set_de( mem.read16( addr))
+        self.pc = ( self.pc + 4) & 0xffff
+
+    def op_ed_5e( self, mem, ios):
+        self.set_im( 2)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_ed_5f( self, mem, ios):
+        self.a = self.r
+        self.ld_a_ir_()
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_ed_60( self, mem, ios):
+        port = self.bc
+        self.pc = ( self.pc + 2) & 0xffff
+        value = ios.read( port)
+        self.hl = ( ( value & 0xff) << 8) | ( self.hl & 0x00ff)
+        self.f = ( self.f & mask_carry) | szp[ value & 0xff]
+
+    def op_ed_61( self, mem, ios):
+        port = self.bc
+        self.pc = ( self.pc + 2) & 0xffff
+        ios.write( port, ( self.hl >> 8))
+
+    def op_ed_62( self, mem, ios):
+        self.sbc16_( self.hl)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_ed_68( self, mem, ios):
+        port = self.bc
+        self.pc = ( self.pc + 2) & 0xffff
+        value = ios.read( port)
+        self.hl = ( self.hl & 0xff00) | ( value & 0xff)
+        self.f = ( self.f & mask_carry) | szp[ value & 0xff]
+
+    def op_ed_69( self, mem, ios):
+        port = self.bc
+        self.pc = ( self.pc + 2) & 0xffff
+        ios.write( port, ( self.hl & 0xff))
+
+    def op_ed_6a( self, mem, ios):
+        self.adc16_( self.hl)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_ed_72( self, mem, ios):
+        self.sbc16_( self.sp)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_ed_73( self, mem, ios):
+        addr = mem.read16( self.pc + 2)
+        mem.write16( addr, self.sp)
+        self.pc = ( self.pc + 4) & 0xffff
+
+    def op_ed_78( self, mem, ios):
+        port = self.bc
+        self.pc = ( self.pc + 2) & 0xffff
+        value = ios.read( port)
+        self.a = value
+        self.f = ( self.f & mask_carry) | szp[ value & 0xff]
+
+    def op_ed_79( self, mem, ios):
+        port = self.bc
+        self.pc = ( self.pc + 2) & 0xffff
+        ios.write( port, self.a)
+
+    def op_ed_7a( self, mem, ios):
+        self.adc16_( self.sp)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_ed_7b( self, mem, ios):
+        addr = mem.read16( self.pc + 2)
+        self.set_sp( mem.read16( addr))
+        self.pc = ( self.pc + 4) & 0xffff
+
+    def op_ed_a0( self, mem, ios):
+        self.ld_block_( mem, 1, False)
 
-    def pop_( self, mem):
-        value = mem.read16( self.sp)
-        self.sp += 2
-        return value
+    def op_ed_a1( self, mem, ios):
+        self.cp_block_( mem, 1, False)
+
+    def op_ed_a2( self, mem, ios):
+        self.in_block_( mem, ios, 1, False)
+
+    def op_ed_a3( self, mem, ios):
+        self.out_block_( mem, ios, 1, False)
 
-    # missing opcodes:
-    # on prefix CB, DD, ED, FD
+    def op_ed_a8( self, mem, ios):
+        self.ld_block_( mem, -1, False)
 
-    def execute( self, mem, ios):
-        # load command
-        cmd = mem.read( self.pc)
+    def op_ed_a9( self, mem, ios):
+        self.cp_block_( mem, -1, False)
 
-        if cmd == 0x00:
-            self.pc += 1
-            result = "NOP"
-
-        elif cmd == 0x01:
-            val_lo = mem.read( self.pc + 1)
-            val_hi = mem.read( self.pc + 2)
-            value = ( val_hi << 8) + val_lo
-            self.set_bc( value)
-            self.pc += 3
-            result = ( "LD BC, 0%04Xh" % value)
-
-        elif cmd == 0x02:
-            mem.write( self.bc, self.a)
-            self.pc += 1
-            result = ( "LD (BC), A")
-
-        elif cmd == 0x03:
-            self.bc += 1
-            self.pc += 1
-            result = ( "INC BC")
-
-        elif cmd == 0x04:
-            value = hi( self.bc)
-            value = self.inc_( value)
-            self.set_b( value)
-            self.pc += 1
-            result = ( "INC B")
-
-        elif cmd == 0x05:
-            value = hi( self.bc)
-            value = self.dec_( value)
-            self.set_b( value)
-            self.pc += 1
-            result = ( "DEC B")
-
-        elif cmd == 0x06:
-            value = mem.read( self.pc + 1)
-            self.set_b( value)
-            self.pc += 2
-            result = ( "LD B, 0%02Xh" % value)
-
-        elif cmd == 0x07:
-            new_a = (self.a << 1 ) & 0xff
-            if bit_is_set( self.a, 7):
-                new_a |= 0x01
-                self.f = set_bit( self.f, self.flag_carry)
-            else:
-                self.f = clr_bit( self.f, self.flag_carry)
-            self.a = new_a
-            self.pc += 1
-            result = ( "RLCA")
-
-        elif cmd == 0x08:
-            ( self.a, self.a_) = ( self.a_, self.a)
-            ( self.f, self.f_) = ( self.f_, self.f)
-            self.pc += 1
-            result = ( "EX AF,AF'")
-
-        elif cmd == 0x09:
-            self.hl += self.bc
-            self.hl %= 0xffff
-            self.pc += 1
-            result = ( "ADD HL,BC")
-
-        elif cmd == 0x0a:
-            value = mem.read( self.bc)
-            self.a = value
-            self.pc += 1
-            result = ( "LD A, (BC)")
-
-        elif cmd == 0x0b:
-            self.bc -= 1
-            self.pc += 1
-            result = ( "DEC BC")
-
-        elif cmd == 0x0c:
-            value = lo( self.bc)
-            value = self.inc_( value)
-            self.set_c( value)
-            self.pc += 1
-            result = ( "INC C")
-
-        elif cmd == 0x0d:
-            value = lo( self.bc)
-            value = self.dec_( value)
-            self.set_c( value)
-            self.pc += 1
-            result = ( "DEC C")
-
-        elif cmd == 0x0e:
-            value = mem.read( self.pc + 1)
-            self.set_c( value)
-            self.pc += 2
-            result = ( "LD C, 0%02Xh" % value)
-
-        elif cmd == 0x0f:
-            new_a = self.a >> 1
-            new_cy = self.a & 0x01
-            if bit_is_set( self.a, 0):
-                new_a |= 0x80
-            self.a = new_a
-            if new_cy > 0:
-                self.f = set_bit( self.f, self.flag_carry)
-            else:
-                self.f = clr_bit( self.f, self.flag_carry)
-            self.pc += 1
-            result = ( "RRCA")
-
-        elif cmd == 0x10:
-            # dec b
-            b = hi( self.bc)
-            b = self.dec_( b)
-            self.set_b( b)
-            # jr nz,xx
-            offset = mem.read( self.pc + 1)
-            if offset > 127:
-                offset -= 256 
-            if bit_is_clear( self.f, self.flag_zero):
-                self.pc = self.pc + offset
-            self.pc += 2
-            result = ( "DJNZ %+i" % offset)
-
-        elif cmd == 0x11:
-            val_lo = mem.read( self.pc + 1)
-            val_hi = mem.read( self.pc + 2)
-            value = ( val_hi << 8) + val_lo
-            self.set_de( value)
-            self.pc += 3
-            result = ( "LD DE, 0%04Xh" % value)
-
-        elif cmd == 0x12:
-            mem.write( self.de, self.a)
-            self.pc += 1
-            result = ( "LD (DE), A")
-
-        elif cmd == 0x13:
-            self.de += 1
-            self.pc += 1
-            result = ( "INC DE")
-
-        elif cmd == 0x14:
-            value = hi( self.de)
-            value = self.inc_( value)
-            self.set_d( value)
-            self.pc += 1
-            result = ( "INC D")
-
-        elif cmd == 0x15:
-            value = hi( self.de)
-            value = self.dec_( value)
-            self.set_d( value)
-            self.pc += 1
-            result = ( "DEC D")
-
-        elif cmd == 0x16:
-            value = mem.read( self.pc + 1)
-            self.set_d( value)
-            self.pc += 2
-            result = ( "LD D, 0%02Xh" % value)
-
-        elif cmd == 0x17:
-            new_a = (self.a << 1 ) & 0xff
-            if bit_is_set( self.f, self.flag_carry):
-                new_a |= 0x01
-            if bit_is_set( self.a, 7):
-                self.f = set_bit( self.f, self.flag_carry)
-            else:
-                self.f = clr_bit( self.f, self.flag_carry)
-            self.a = new_a
-            self.pc += 1
-            result = ( "RLA")
-
-        elif cmd == 0x18:
-            value = mem.read( self.pc + 1)
-            if value > 127:
-                value -= 256 
-            self.pc = self.pc + value
-            self.pc += 2
-            result = ( "JR %+i" % value )
-
-        elif cmd == 0x19:
-            self.hl += self.de
-            self.hl %= 0xffff
-            self.pc += 1
-            result = ( "ADD HL,DE")
-
-        elif cmd == 0x1a:
-            value = mem.read( self.de)
-            self.a = value
-            self.pc += 1
-            result = ( "LD A, (DE)")
-
-        elif cmd == 0x1b:
-            self.de -= 1
-            self.pc += 1
-            result = ( "DEC DE")
-
-        elif cmd == 0x1c:
-            value = lo( self.de)
-            value = self.inc_( value)
-            self.set_e( value)
-            self.pc += 1
-            result = ( "INC E")
-
-        elif cmd == 0x1d:
-            value = lo( self.de)
-            value = self.dec_( value)
-            self.set_e( value)
-            self.pc += 1
-            result = ( "DEC E")
-
-        elif cmd == 0x1e:
-            value = mem.read( self.pc + 1)
-            self.set_e( value)
-            self.pc += 2
-            result = ( "LD E, 0%02Xh" % value)
-
-        elif cmd == 0x1f:
-            new_a = self.a >> 1
-            new_cy = self.a & 0x01
-            if bit_is_set( self.f, self.flag_carry):
-                new_a |= 0x80
-            self.a = new_a
-            if new_cy > 0:
-                self.f = set_bit( self.f, self.flag_carry)
-            else:
-                self.f = clr_bit( self.f, self.flag_carry)
-            self.pc += 1
-            result = ( "RRA")
-
-        elif cmd == 0x20:
-            offset = mem.read( self.pc + 1)
-            if offset > 127:
-                offset -= 256 
-            if bit_is_clear( self.f, self.flag_zero):
-                self.pc = self.pc + offset
-            self.pc += 2
-            result = ( "JR NZ, %+i" % offset )
-
-        elif cmd == 0x21:
-            value = mem.read16( self.pc + 1)
-            self.set_hl( value)
-            self.pc += 3
-            result = ( "LD HL, 0%04Xh" % value)
-
-        elif cmd == 0x22:
-            addr = mem.read16( self.pc + 1)
-            mem.write16( addr, self.hl)
-            self.pc += 3
-            result = ( "LD (0%04Xh), HL" % addr)
-
-
-        elif cmd == 0x23:
-            self.hl += 1
-            self.pc += 1
-            result = ( "INC HL")
-
-        elif cmd == 0x24:
-            value = hi( self.hl)
-            value = self.inc_( value)
-            self.set_h( value)
-            self.pc += 1
-            result = ( "INC H")
-
-        elif cmd == 0x25:
-            value = hi( self.hl)
-            value = self.dec_( value)
-            self.set_h( value)
-            self.pc += 1
-            result = ( "DEC H")
-
-        elif cmd == 0x26:
-            value = mem.read( self.pc + 1)
-            self.set_h( value)
-            self.pc += 2
-            result = ( "LD H, 0%02Xh" % value)
-
-        elif cmd == 0x27:
-            """
-When this instruction is executed, the A register is BCD corrected using the contents of the flags. The exact process is the following: if the least significant four bits of A contain a non-BCD digit (i. e. it is greater than 9) or the H flag is set, then $06 is added to the register. Then the four most significant bits are checked. If this more significant digit also happens to be greater than 9 or the C flag is set, then $60 is added.
-"""
-            value = self.a
-            hnibble = (value & 0xf0) >> 4
-            lnibble = value & 0x0f
-            if bit_is_clear( self.f, self.flag_sub):
-                if lnibble > 9 or bit_is_set( self.f, self.flag_half):
-                    value += 0x06
-
-                if hnibble > 9 or bit_is_set( self.f, self.flag_carry):
-                    value += 0x60
-            else:
-                if lnibble > 9 or bit_is_set( self.f, self.flag_half):
-                    value += 0xfa
-
-                if hnibble > 9 or bit_is_set( self.f, self.flag_carry):
-                    value += 0xa0
-
-            value &= 0xff
-            self.a = value
-
-        elif cmd == 0x28:
-            value = mem.read( self.pc + 1)
-            if value > 127:
-                value -= 256 
-            if bit_is_set( self.f, self.flag_zero):
-                self.pc = self.pc + value
-            self.pc += 2
-            result = ( "JR Z, %+i" % value )
-
-        elif cmd == 0x29:
-            self.hl += self.hl
-            self.hl %= 0xffff
-            self.pc += 1
-            result = ( "ADD HL,HL")
-
-        elif cmd == 0x2a:
-            addr = mem.read16( self.pc + 1)
-            self.set_hl( mem.read16( addr))
-            self.pc += 3
-            result = ( "LD HL,(0%04Xh)" % addr)
-
-        elif cmd == 0x2b:
-            self.hl -= 1
-            self.pc += 1
-            result = ( "DEC HL")
-
-        elif cmd == 0x2c:
-            value = lo( self.hl)
-            value = self.inc_( value)
-            self.set_l( value)
-            self.pc += 1
-            result = ( "INC L")
-
-        elif cmd == 0x2d:
-            value = lo( self.hl)
-            value = self.dec_( value)
-            self.set_l( value)
-            self.pc += 1
-            result = ( "DEC L")
-
-        elif cmd == 0x2e:
-            value = mem.read( self.pc + 1)
-            self.set_l( value)
-            self.pc += 2
-            result = ( "LD L, 0%02Xh" % value)
-
-        elif cmd == 0x2f:
-            self.f = set_bit( self.f, self.flag_half)
-            self.f = set_bit( self.f, self.flag_sub)
-            self.a = ~ self.a
-            self.pc += 1
-            result = ( "CPL")
-
-        elif cmd == 0x30:
-            value = mem.read( self.pc + 1)
-            if value > 127:
-                value -= 256 
-            if bit_is_clear( self.f, self.flag_carry):
-                self.pc = self.pc + value
-            self.pc += 2
-            result = ( "JR NC, %+i" % value )
-
-        elif cmd == 0x31:
-            value = mem.read16( self.pc + 1)
-            self.set_sp( value)
-            self.pc += 3
-            result = ( "LD SP, 0%04Xh" % value)
-
-        elif cmd == 0x32:
-            addr = mem.read16( self.pc + 1)
-            mem.write( addr, self.a)
-            self.pc += 3
-            result = ( "LD (0%04X), A" % addr)
-
-        elif cmd == 0x33:
-            self.sp += 1
-            self.pc += 1
-            result = ( "INC SP")
-
-        elif cmd == 0x34:
-            value = mem.read( self.hl)
-            result = self.inc_( value)
-            mem.write( self.hl, result)
-            self.pc += 1
-            result = ( "INC (HL)")
-
-        elif cmd == 0x35:
-            value = mem.read( self.hl)
-            value = self.dec_( value)
-            mem.write( self.hl, value)
-            self.pc += 1
-            result = ( "DEC (HL)")
-
-        elif cmd == 0x36:
-            value = mem.read( self.pc + 1)
-            mem.write( self.hl, value)
-            self.pc += 2
-            result = ( "LD (HL), 0%02Xh" % value)
-
-        elif cmd == 0x37:
-            self.f = set_bit( self.f, self.flag_carry)
-            self.f = clr_bit( self.f, self.flag_sub)
-            self.f = clr_bit( self.f, self.flag_half)
-            self.pc += 1
-            result = ( "SCF")
-
-        elif cmd == 0x38:
-            value = mem.read( self.pc + 1)
-            if value > 127:
-                value -= 256 
-            if bit_is_set( self.f, self.flag_carry):
-                self.pc = self.pc + value
-            self.pc += 2
-            result = ( "JR C, %+i" % value )
-
-        elif cmd == 0x39:
-            self.hl += self.sp
-            self.hl %= 0xffff
-            self.pc += 1
-            result = ( "ADD HL,SP")
-
-        elif cmd == 0x3a:
-            addr = mem.read16( self.pc + 1)
-            self.a = mem.read( addr)
-            self.pc += 3
-            result = ( "LD A, (0%04X)" % addr)
-
-        elif cmd == 0x3b:
-            self.sp -= 1
-            self.pc += 1
-            result = ( "DEC SP")
-        
-        elif cmd == 0x3c:
-            self.a = self.inc_( self.a)
-            self.pc += 1
-            result = ( "INC A")
-        
-        elif cmd == 0x3d:
-            self.a = self.dec_( self.a)
-            self.pc += 1
-            result = ( "DEC A")
-
-        elif cmd == 0x3e:
-            value = mem.read( self.pc + 1)
-            self.a = value
-            self.pc += 2
-            result = ( "LD A, 0%02Xh" % value)
-
-        elif cmd == 0x3f:
-            if bit_is_set( self.f, self.flag_carry):
-                self.f = clr_bit( self.f, self.flag_carry)
-            else:
-                self.f = set_bit( self.f, self.flag_carry)
-            self.f = clr_bit( self.f, self.flag_sub)
-            self.pc += 1
-            result = ( "CCF")
-
-        elif cmd == 0x40:
-            value = hi( self.bc)
-            self.set_b( value)
-            self.pc += 1
-            result = ( "LD B, B" % value)
-
-        elif cmd == 0x41:
-            value = lo( self.bc)
-            self.set_b( value)
-            self.pc += 1
-            result = ( "LD B, C" % value)
-
-        elif cmd == 0x42:
-            value = hi( self.de)
-            self.set_b( value)
-            self.pc += 1
-            result = ( "LD B, D")
-
-        elif cmd == 0x43:
-            value = lo( self.de)
-            self.set_b( value)
-            self.pc += 1
-            result = ( "LD B, E")
-
-        elif cmd == 0x44:
-            value = hi( self.hl)
-            self.set_b( value)
-            self.pc += 1
-            result = ( "LD B, H")
-
-        elif cmd == 0x45:
-            value = lo( self.hl)
-            self.set_b( value)
-            self.pc += 1
-            result = ( "LD B, L")
-
-        elif cmd == 0x46:
-            value = mem.read( self.hl)
-            self.set_b( value)
-            self.pc += 1
-            result = ( "LD B, (HL)")
-
-        elif cmd == 0x47:
-            self.set_b( self.a)
-            self.pc += 1
-            result = ( "LD B, A")
-
-        elif cmd == 0x48:
-            value = hi( self.bc)
-            self.set_c( value)
-            self.pc += 1
-            result = ( "LD C, B" % value)
-
-        elif cmd == 0x49:
-            value = lo( self.bc)
-            self.set_c( value)
-            self.pc += 1
-            result = ( "LD C, C" % value)
-
-        elif cmd == 0x4a:
-            value = hi( self.de)
-            self.set_c( value)
-            self.pc += 1
-            result = ( "LD C, D" % value)
-
-        elif cmd == 0x4b:
-            value = lo( self.de)
-            self.set_c( value)
-            self.pc += 1
-            result = ( "LD C, E" % value)
-
-        elif cmd == 0x4c:
-            value = hi( self.hl)
-            self.set_c( value)
-            self.pc += 1
-            result = ( "LD C, H" % value)
-
-        elif cmd == 0x4d:
-            value = lo( self.hl)
-            self.set_c( value)
-            self.pc += 1
-            result = ( "LD C, L")
-
-        elif cmd == 0x4e:
-            value = mem.read( self.hl)
-            self.set_c( value)
-            self.pc += 1
-            result = ( "LD C, (HL)")
-
-        elif cmd == 0x4f:
-            self.set_c( self.a)
-            self.pc += 1
-            result = ( "LD C, A")
-
-        elif cmd == 0x50:
-            value = hi( self.bc)
-            self.set_d( value)
-            self.pc += 1
-            result = ( "LD D, B")
-
-        elif cmd == 0x51:
-            value = lo( self.bc)
-            self.set_d( value)
-            self.pc += 1
-            result = ( "LD D, C")
-
-        elif cmd == 0x52:
-            value = hi( self.de)
-            self.set_d( value)
-            self.pc += 1
-            result = ( "LD D, D")
-
-        elif cmd == 0x53:
-            value = lo( self.de)
-            self.set_d( value)
-            self.pc += 1
-            result = ( "LD D, E")
-
-        elif cmd == 0x54:
-            value = hi( self.hl)
-            self.set_d( value)
-            self.pc += 1
-            result = ( "LD D, H")
-
-        elif cmd == 0x55:
-            value = lo( self.hl)
-            self.set_d( value)
-            self.pc += 1
-            result = ( "LD D, L")
-
-        elif cmd == 0x56:
-            value = mem.read( self.hl)
-            self.set_d( value)
-            self.pc += 1
-            result = ( "LD D, (HL)")
-
-        elif cmd == 0x57:
-            self.set_d( self.a)
-            self.pc += 1
-            result = ( "LD D, A")
-
-        elif cmd == 0x58:
-            value = hi( self.bc)
-            self.set_e( value)
-            self.pc += 1
-            result = ( "LD E, B")
-
-        elif cmd == 0x59:
-            value = lo( self.bc)
-            self.set_e( value)
-            self.pc += 1
-            result = ( "LD E, C")
-
-        elif cmd == 0x5a:
-            value = hi( self.de)
-            self.set_e( value)
-            self.pc += 1
-            result = ( "LD E, D")
-
-        elif cmd == 0x5b:
-            value = lo( self.de)
-            self.set_e( value)
-            self.pc += 1
-            result = ( "LD E, E")
-
-        elif cmd == 0x5c:
-            value = hi( self.hl)
-            self.set_e( value)
-            self.pc += 1
-            result = ( "LD E, H")
-
-        elif cmd == 0x5d:
-            value = lo( self.hl)
-            self.set_e( value)
-            self.pc += 1
-            result = ( "LD E, L")
-
-        elif cmd == 0x5e:
-            value = mem.read( self.hl)
-            self.set_e( value)
-            self.pc += 1
-            result = ( "LD E, (HL)")
-
-        elif cmd == 0x5f:
-            self.set_e( self.a)
-            self.pc += 1
-            result = ( "LD E, A")
-
-        elif cmd == 0x60:
-            value = hi( self.bc)
-            self.set_h( value)
-            self.pc += 1
-            result = ( "LD H, B")
-
-        elif cmd == 0x61:
-            value = lo( self.bc)
-            self.set_h( value)
-            self.pc += 1
-            result = ( "LD H, C")
-
-        elif cmd == 0x62:
-            value = hi( self.de)
-            self.set_h( value)
-            self.pc += 1
-            result = ( "LD H, D")
-
-        elif cmd == 0x63:
-            value = lo( self.de)
-            self.set_h( value)
-            self.pc += 1
-            result = ( "LD H, E")
-
-        elif cmd == 0x64:
-            value = hi( self.hl)
-            self.set_h( value)
-            self.pc += 1
-            result = ( "LD H, H")
-
-        elif cmd == 0x65:
-            value = lo( self.hl)
-            self.set_h( value)
-            self.pc += 1
-            result = ( "LD H, L")
-
-        elif cmd == 0x66:
-            value = mem.read( self.hl)
-            self.set_h( value)
-            self.pc += 1
-            result = ( "LD H, (HL)")
-
-        elif cmd == 0x67:
-            self.set_h( self.a)
-            self.pc += 1
-            result = ( "LD H, A")
-
-        elif cmd == 0x68:
-            value = hi( self.bc)
-            self.set_l( value)
-            self.pc += 1
-            result = ( "LD L, B")
-
-        elif cmd == 0x69:
-            value = lo( self.bc)
-            self.set_l( value)
-            self.pc += 1
-            result = ( "LD L, C")
-
-        elif cmd == 0x6a:
-            value = hi( self.de)
-            self.set_l( value)
-            self.pc += 1
-            result = ( "LD L, D")
-
-        elif cmd == 0x6b:
-            value = lo( self.de)
-            self.set_l( value)
-            self.pc += 1
-            result = ( "LD L, E")
-
-        elif cmd == 0x6c:
-            value = hi( self.hl)
-            self.set_l( value)
-            self.pc += 1
-            result = ( "LD L, H")
-
-        elif cmd == 0x6d:
-            value = lo( self.hl)
-            self.set_l( value)
-            self.pc += 1
-            result = ( "LD L, L")
-
-        elif cmd == 0x6e:
-            value = mem.read( self.hl)
-            self.set_l( value)
-            self.pc += 1
-            result = ( "LD L, (HL)")
-
-        elif cmd == 0x6f:
-            self.set_l( self.a)
-            self.pc += 1
-            result = ( "LD L, A")
-
-        elif cmd == 0x70:
-            mem.write( self.hl, hi( self.bc))
-            self.pc += 1
-            result = ( "LD (HL), B")
-
-        elif cmd == 0x71:
-            mem.write( self.hl, lo( self.bc))
-            self.pc += 1
-            result = ( "LD (HL), C")
-
-        elif cmd == 0x72:
-            mem.write( self.hl, hi( self.de))
-            self.pc += 1
-            result = ( "LD (HL), D")
-
-        elif cmd == 0x73:
-            mem.write( self.hl, lo( self.de))
-            self.pc += 1
-            result = ( "LD (HL), E")
-
-        elif cmd == 0x74:
-            mem.write( self.hl, hi( self.hl))
-            self.pc += 1
-            result = ( "LD (HL), H")
-
-        elif cmd == 0x75:
-            mem.write( self.hl, lo( self.hl))
-            self.pc += 1
-            result = ( "LD (HL), L")
-
-        elif cmd == 0x76:
-            result = ( "HLT")
-            self.run = False
-
-        elif cmd == 0x77:
-            mem.write( self.hl, self.a)
-            self.pc += 1
-            result = ( "LD (HL), A")
-
-        elif cmd == 0x78:
-            self.a = hi( self.bc)
-            self.pc += 1
-            result = ( "LD A, B")
-
-        elif cmd == 0x79:
-            self.a = lo( self.bc)
-            self.pc += 1
-            result = ( "LD A, C")
-
-        elif cmd == 0x7a:
-            self.a = hi( self.de)
-            self.pc += 1
-            result = ( "LD A, D")
-
-        elif cmd == 0x7b:
-            self.a = lo( self.de)
-            self.pc += 1
-            result = ( "LD A, E")
-
-        elif cmd == 0x7c:
-            self.a = hi( self.hl)
-            self.pc += 1
-            result = ( "LD A, H")
-
-        elif cmd == 0x7d:
-            self.a = lo( self.hl)
-            self.pc += 1
-            result = ( "LD A, L")
-
-        elif cmd == 0x7e:
-            value = mem.read( self.hl)
-            self.a = value
-            self.pc += 1
-            result = ( "LD A, (HL)")
-
-        elif cmd == 0x7f:
-            self.pc += 1
-            result = ( "LD A, A")
-
-        elif cmd == 0x80:
-            self.add_( self.get_b())
-            self.pc += 1
-            result = ( "ADD B")
-
-        elif cmd == 0x81:
-            self.add_( self.get_c())
-            self.pc += 1
-            result = ( "ADD C")
-
-        elif cmd == 0x82:
-            self.add_( self.get_d())
-            self.pc += 1
-            result = ( "ADD D")
-
-        elif cmd == 0x83:
-            self.add_( self.get_e())
-            self.pc += 1
-            result = ( "ADD E")
-
-        elif cmd == 0x84:
-            self.add_( self.get_h())
-            self.pc += 1
-            result = ( "ADD H")
-
-        elif cmd == 0x85:
-            self.add_( self.get_l())
-            self.pc += 1
-            result = ( "ADD L")
-
-        elif cmd == 0x86:
-            value = mem.read( self.hl)
-            self.add_( value)
-            self.pc += 1
-            result = ( "ADD (HL)")
-
-        elif cmd == 0x87:
-            self.add_( self.a)
-            self.pc += 1
-            result = ( "ADD A")
-
-        elif cmd == 0x88:
-            self.adc_( self.get_b())
-            self.pc += 1
-            result = ( "ADC B")
-
-        elif cmd == 0x89:
-            self.adc_( self.get_c())
-            self.pc += 1
-            result = ( "ADC C")
-
-        elif cmd == 0x8a:
-            self.adc_( self.get_d())
-            self.pc += 1
-            result = ( "ADC D")
-
-        elif cmd == 0x8b:
-            self.adc_( self.get_e())
-            self.pc += 1
-            result = ( "ADC E")
-
-        elif cmd == 0x8c:
-            self.adc_( self.get_h())
-            self.pc += 1
-            result = ( "ADC H")
-
-        elif cmd == 0x8d:
-            self.adc_( self.get_l())
-            self.pc += 1
-            result = ( "ADC L")
-
-        elif cmd == 0x8e:
-            value = mem.read( self.hl)
-            self.adc_( value)
-            self.pc += 1
-            result = ( "ADC (HL)")
-
-        elif cmd == 0x8f:
-            self.adc_( self.a)
-            self.pc += 1
-            result = ( "ADC A")
-
-        elif cmd == 0x90:
-            self.sub_( self.get_b())
-            self.pc += 1
-            result = ( "SUB B")
-
-        elif cmd == 0x91:
-            self.sub_( self.get_c())
-            self.pc += 1
-            result = ( "SUB C")
-
-        elif cmd == 0x92:
-            self.sub_( self.get_d())
-            self.pc += 1
-            result = ( "SUB D")
-
-        elif cmd == 0x93:
-            self.sub_( self.get_e())
-            self.pc += 1
-            result = ( "SUB E")
-
-        elif cmd == 0x94:
-            self.sub_( self.get_h())
-            self.pc += 1
-            result = ( "SUB H")
-
-        elif cmd == 0x95:
-            self.sub_( self.get_l())
-            self.pc += 1
-            result = ( "SUB L")
-
-        elif cmd == 0x96:
-            value = mem.read( self.hl)
-            self.sub_( value)
-            self.pc += 1
-            result = ( "SUB (HL)")
-
-        elif cmd == 0x97:
-            self.sub_( self.a)
-            self.pc += 1
-            result = ( "SUB A")
-
-        elif cmd == 0x98:
-            self.sbc_( self.get_b())
-            self.pc += 1
-            result = ( "SBC B")
-
-        elif cmd == 0x99:
-            self.sbc_( self.get_c())
-            self.pc += 1
-            result = ( "SBC C")
-
-        elif cmd == 0x9a:
-            self.sbc_( self.get_d())
-            self.pc += 1
-            result = ( "SBC D")
-
-        elif cmd == 0x9b:
-            self.sbc_( self.get_e())
-            self.pc += 1
-            result = ( "SBC E")
-
-        elif cmd == 0x9c:
-            self.sbc_( self.get_h())
-            self.pc += 1
-            result = ( "SBC H")
-
-        elif cmd == 0x9d:
-            self.sbc_( self.get_l())
-            self.pc += 1
-            result = ( "SBC L")
-
-        elif cmd == 0x9e:
-            value = mem.read( self.hl)
-            self.sbc_( value)
-            self.pc += 1
-            result = ( "SBC (HL)")
-
-        elif cmd == 0x9f:
-            self.sbc_( self.a)
-            self.pc += 1
-            result = ( "SBC A")
-
-        elif cmd == 0xa0:
-            self.and_( self.get_b())
-            self.pc += 1
-            result = ( "AND B")
-
-        elif cmd == 0xa1:
-            self.and_( self.get_c())
-            self.pc += 1
-            result = ( "AND C")
-
-        elif cmd == 0xa2:
-            self.and_( self.get_d())
-            self.pc += 1
-            result = ( "AND D")
-
-        elif cmd == 0xa3:
-            self.and_( self.get_e())
-            self.pc += 1
-            result = ( "AND E")
-
-        elif cmd == 0xa4:
-            self.and_( self.get_h())
-            self.pc += 1
-            result = ( "AND H")
-
-        elif cmd == 0xa5:
-            self.and_( self.get_l())
-            self.pc += 1
-            result = ( "AND L")
-
-        elif cmd == 0xa6:
-            value = mem.read( self.hl)
-            self.and_( value)
-            self.pc += 1
-            result = ( "AND (HL)")
-
-        elif cmd == 0xa7:
-            self.and_( self.a)
-            self.pc += 1
-            result = ( "AND A")
-
-        elif cmd == 0xa8:
-            self.xor_( self.get_b())
-            self.pc += 1
-            result = ( "XOR B")
-
-        elif cmd == 0xa9:
-            self.xor_( self.get_c())
-            self.pc += 1
-            result = ( "XOR C")
-
-        elif cmd == 0xaa:
-            self.xor_( self.get_d())
-            self.pc += 1
-            result = ( "XOR D")
-
-        elif cmd == 0xab:
-            self.xor_( self.get_e())
-            self.pc += 1
-            result = ( "XOR E")
-
-        elif cmd == 0xac:
-            self.xor_( self.get_h())
-            self.pc += 1
-            result = ( "XOR H")
-
-        elif cmd == 0xad:
-            self.xor_( self.get_l())
-            self.pc += 1
-            result = ( "XOR L")
-
-        elif cmd == 0xae:
-            value = mem.read( self.hl)
-            self.xor_( value)
-            self.pc += 1
-            result = ( "XOR (HL)")
-
-        elif cmd == 0xaf:
-            value = self.a
-            self.xor_( value)
-            self.pc += 1
-            result = ( "XOR A")
-
-        elif cmd == 0xb0:
-            self.or_( self.get_b())
-            self.pc += 1
-            result = ( "OR B")
-
-        elif cmd == 0xb1:
-            self.or_( self.get_c())
-            self.pc += 1
-            result = ( "OR C")
-
-        elif cmd == 0xb2:
-            self.or_( self.get_d())
-            self.pc += 1
-            result = ( "OR D")
-
-        elif cmd == 0xb3:
-            self.or_( self.get_e())
-            self.pc += 1
-            result = ( "OR E")
-
-        elif cmd == 0xb4:
-            self.or_( self.get_h())
-            self.pc += 1
-            result = ( "OR H")
-
-        elif cmd == 0xb5:
-            self.or_( self.get_l())
-            self.pc += 1
-            result = ( "OR L")
-
-        elif cmd == 0xb6:
-            value = mem.read( self.hl)
-            self.or_( value)
-            self.pc += 1
-            result = ( "OR (HL)")
-
-        elif cmd == 0xb7:
-            self.or_( self.a)
-            self.pc += 1
-            result = ( "OR A")
-
-        elif cmd == 0xb8:
-            self.compare( self.get_b())
-            self.pc += 1
-            result = ( "CP B")
-
-        elif cmd == 0xb9:
-            self.compare( self.get_c())
-            self.pc += 1
-            result = ( "CP C")
-
-        elif cmd == 0xba:
-            self.compare( self.get_d())
-            self.pc += 1
-            result = ( "CP D")
-
-        elif cmd == 0xbb:
-            self.compare( self.get_e())
-            self.pc += 1
-            result = ( "CP E")
-
-        elif cmd == 0xbc:
-            self.compare( self.get_h())
-            self.pc += 1
-            result = ( "CP H")
-
-        elif cmd == 0xbd:
-            self.compare( self.get_l())
-            self.pc += 1
-            result = ( "CP L")
-
-        elif cmd == 0xbe:
-            value = mem.read( self.hl)
-            self.compare( value)
-            self.pc += 1
-            result = ( "CP (HL)")
-
-        elif cmd == 0xbf:
-            self.compare( self.a)
-            self.pc += 1
-            result = ( "CP A")
-
-        elif cmd == 0xc0:
-            if bit_is_clear( self.f, self.flag_zero):
-                self.pc = self.pop_( mem)
-            else:
-                self.pc += 1
-            result = ( "RET NZ")
-
-        elif cmd == 0xc1:
-            self.bc = self.pop_( mem)
-            self.pc += 1
-            result = ( "POP BC")
-
-        elif cmd == 0xc2:
-            addr = mem.read16( self.pc + 1)
-            if bit_is_clear( self.f, self.flag_zero):
-                self.pc = addr
-            else:
-                self.pc += 3
-            result = ( "JP NZ,0%04Xh" % addr)
+    def op_ed_aa( self, mem, ios):
+        self.in_block_( mem, ios, -1, False)
 
-        elif cmd == 0xc3:
-            addr = mem.read16( self.pc + 1)
-            self.pc = addr
-            result = ( "JP 0%04X" % addr)
+    def op_ed_ab( self, mem, ios):
+        self.out_block_( mem, ios, -1, False)
 
-        elif cmd == 0xc4:
-            addr = mem.read16( self.pc + 1)
-            if bit_is_clear( self.f, self.flag_zero):
-                self.push_( mem, self.pc + 3)
-                self.pc = addr
-            else:
-                self.pc += 3
-            result = ( "CALL NZ,0%04Xh" % addr)
-
-        elif cmd == 0xc5:
-            self.push_( mem, self.bc)
-            self.pc += 1
-            result = ( "PUSH BC")
-
-        elif cmd == 0xc6:
-            value = mem.read( self.pc + 1)
-            self.add_( value)
-            self.pc += 2
-            result = ( "ADD 0%02Xh" % value)
-
-        elif cmd == 0xc7:
-            self.push_( mem, self.pc + 1)
-            self.pc = 0x00
-            result = ( "RST 00h")
-
-        elif cmd == 0xc8:
-            if bit_is_set( self.f, self.flag_zero):
-                self.pc = self.pop_( mem)
-            else:
-                self.pc += 1
-            result = ( "RET Z")
+    def op_ed_b0( self, mem, ios):
+        self.ld_block_( mem, 1, True)
 
-        elif cmd == 0xc9:
-            self.pc = self.pop_( mem)
-            result = ( "RET")
+    def op_ed_b1( self, mem, ios):
+        self.cp_block_( mem, 1, True)
 
-        elif cmd == 0xca:
-            addr = mem.read16( self.pc + 1)
-            if bit_is_set( self.f, self.flag_zero):
-                self.pc = addr
-            else:
-                self.pc += 3
-            result = ( "JP Z,0%04Xh" % addr)
-
-        ###################
-        # enhanced commands
-        elif cmd == 0xcb:
-            cmd2 = mem.read( self.pc + 1)
-
-            if cmd2 == 0x07:
-                new_b = self.b << 1 | self.b >> 7
-                if bit_is_set( self.b, 7):
-                    self.f = set_bit( self.f, self.flag_carry)
-                else:
-                    self.f = clr_bit( self.f, self.flag_carry)
-                self.b = new_b
-                self.pc += 2
-                result = ( "RLC B")
-            elif cmd2 == 0x07:
-                new_a = self.a << 1 | self.a >> 7
-                if bit_is_set( self.a, 7):
-                    self.f = set_bit( self.f, self.flag_carry)
-                else:
-                    self.f = clr_bit( self.f, self.flag_carry)
-                self.a = new_a
-                self.pc += 2
-                result = ( "RLC A")
-            elif cmd2 == 0x20:
-                value = self.get_b()
-                if bit_is_set( value, 7):
-                    self.f = set_bit( self.f, self.flag_carry)
-                else:
-                    self.f = clr_bit( self.f, self.flag_carry)
-                value = value << 1
-                self.set_b( value)
-                self.pc += 2
-                result = ( "SLA B")
-            elif cmd2 == 0x21:
-                value = self.get_c()
-                if bit_is_set( value, 7):
-                    self.f = set_bit( self.f, self.flag_carry)
-                else:
-                    self.f = clr_bit( self.f, self.flag_carry)
-                value = value << 1
-                self.set_c( value)
-                self.pc += 2
-                result = ( "SLA C")
-            elif cmd2 == 0x22:
-                value = self.get_d()
-                if bit_is_set( value, 7):
-                    self.f = set_bit( self.f, self.flag_carry)
-                else:
-                    self.f = clr_bit( self.f, self.flag_carry)
-                value = value << 1
-                self.set_d( value)
-                self.pc += 2
-                result = ( "SLA D")
-            elif cmd2 == 0x23:
-                value = self.get_e()
-                if bit_is_set( value, 7):
-                    self.f = set_bit( self.f, self.flag_carry)
-                else:
-                    self.f = clr_bit( self.f, self.flag_carry)
-                value = value << 1
-                self.set_e( value)
-                self.pc += 2
-                result = ( "SLA E")
-            elif cmd2 == 0x24:
-                value = self.get_h()
-                if bit_is_set( value, 7):
-                    self.f = set_bit( self.f, self.flag_carry)
-                else:
-                    self.f = clr_bit( self.f, self.flag_carry)
-                value = value << 1
-                self.set_h( value)
-                self.pc += 2
-                result = ( "SLA H")
-            elif cmd2 == 0x25:
-                value = self.get_l()
-                if bit_is_set( value, 7):
-                    self.f = set_bit( self.f, self.flag_carry)
-                else:
-                    self.f = clr_bit( self.f, self.flag_carry)
-                value = value << 1
-                self.set_l( value)
-                self.pc += 2
-                result = ( "SLA L")
-            elif cmd2 == 0x26:
-                value = mem.read( self.hl)
-                if bit_is_set( value, 7):
-                    self.f = set_bit( self.f, self.flag_carry)
-                else:
-                    self.f = clr_bit( self.f, self.flag_carry)
-                value = value << 1
-                mem.write( self.hl, value)
-                self.pc += 2
-                result = ( "SLA (HL)")
-            elif cmd2 == 0x27:
-                value = self.a
-                if bit_is_set( value, 7):
-                    self.f = set_bit( self.f, self.flag_carry)
-                else:
-                    self.f = clr_bit( self.f, self.flag_carry)
-                value = value << 1
-                self.a = value
-                self.pc += 2
-                result = ( "SLA A")
-            elif cmd2 == 0x30:
-                value = self.get_b()
-                if bit_is_set( value, 7):
-                    self.f = set_bit( self.f, self.flag_carry)
-                else:
-                    self.f = clr_bit( self.f, self.flag_carry)
-                value = value << 1 + 1
-                self.set_b( value)
-                self.pc += 2
-                result = ( "SLS B")
-            elif cmd2 == 0x31:
-                value = self.get_c()
-                if bit_is_set( value, 7):
-                    self.f = set_bit( self.f, self.flag_carry)
-                else:
-                    self.f = clr_bit( self.f, self.flag_carry)
-                value = value << 1 + 1
-                self.set_c( value)
-                self.pc += 2
-                result = ( "SLS C")
-            elif cmd2 == 0x32:
-                value = self.get_d()
-                if bit_is_set( value, 7):
-                    self.f = set_bit( self.f, self.flag_carry)
-                else:
-                    self.f = clr_bit( self.f, self.flag_carry)
-                value = value << 1 + 1
-                self.set_d( value)
-                self.pc += 2
-                result = ( "SLS D")
-            elif cmd2 == 0x33:
-                value = self.get_e()
-                if bit_is_set( value, 7):
-                    self.f = set_bit( self.f, self.flag_carry)
-                else:
-                    self.f = clr_bit( self.f, self.flag_carry)
-                value = value << 1 + 1
-                self.set_e( value)
-                self.pc += 2
-                result = ( "SLS E")
-            elif cmd2 == 0x34:
-                value = self.get_h()
-                if bit_is_set( value, 7):
-                    self.f = set_bit( self.f, self.flag_carry)
-                else:
-                    self.f = clr_bit( self.f, self.flag_carry)
-                value = value << 1 + 1
-                self.set_h( value)
-                self.pc += 2
-                result = ( "SLS H")
-            elif cmd2 == 0x35:
-                value = self.get_l()
-                if bit_is_set( value, 7):
-                    self.f = set_bit( self.f, self.flag_carry)
-                else:
-                    self.f = clr_bit( self.f, self.flag_carry)
-                value = value << 1 + 1
-                self.set_l( value)
-                self.pc += 2
-                result = ( "SLS L")
-            elif cmd2 == 0x36:
-                value = mem.read( self.hl)
-                if bit_is_set( value, 7):
-                    self.f = set_bit( self.f, self.flag_carry)
-                else:
-                    self.f = clr_bit( self.f, self.flag_carry)
-                value = value << 1 + 1
-                mem.write( self.hl, value)
-                self.pc += 2
-                result = ( "SLS (HL)")
-            elif cmd2 == 0x37:
-                value = self.a
-                if bit_is_set( value, 7):
-                    self.f = set_bit( self.f, self.flag_carry)
-                else:
-                    self.f = clr_bit( self.f, self.flag_carry)
-                value = value << 1 + 1
-                self.a = value
-                self.pc += 2
-                result = ( "SLS A")
-            elif cmd2 == 0x40:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.get_b(), 0):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 0,B")
-            elif cmd2 == 0x41:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.get_c(), 0):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 0,C")
-            elif cmd2 == 0x42:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.get_d(), 0):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 0,D")
-            elif cmd2 == 0x43:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.get_e(), 0):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 0,E")
-            elif cmd2 == 0x44:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.get_h(), 0):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 0,H")
-            elif cmd2 == 0x45:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.get_l(), 0):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 0,L")
-            elif cmd2 == 0x46:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( mem.read( self.hl), 0):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 0,(HL)")
-            elif cmd2 == 0x47:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.a, 0):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 0,A")
-            elif cmd2 == 0x48:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.get_b(), 1):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 1,B")
-            elif cmd2 == 0x49:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.get_c(), 1):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 1,C")
-            elif cmd2 == 0x4a:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.get_d(), 1):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 1,D")
-            elif cmd2 == 0x4b:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.get_e(), 1):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 1,E")
-            elif cmd2 == 0x4c:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.get_h(), 1):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 1,H")
-            elif cmd2 == 0x4d:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.get_l(), 1):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 1,L")
-            elif cmd2 == 0x4e:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( mem.read( self.hl), 1):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 1,(HL)")
-            elif cmd2 == 0x4f:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.a, 1):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 1,A")
-            elif cmd2 == 0x50:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.get_b(), 2):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 2,B")
-            elif cmd2 == 0x51:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.get_c(), 2):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 2,C")
-            elif cmd2 == 0x52:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.get_d(), 2):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 2,D")
-            elif cmd2 == 0x53:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.get_e(), 2):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 2,E")
-            elif cmd2 == 0x54:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.get_h(), 2):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 2,H")
-            elif cmd2 == 0x55:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.get_l(), 2):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 2,L")
-            elif cmd2 == 0x56:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( mem.read( self.hl), 2):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 2,(HL)")
-            elif cmd2 == 0x57:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.a, 2):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 2,A")
-            elif cmd2 == 0x58:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.get_b(), 3):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 3,B")
-            elif cmd2 == 0x59:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.get_c(), 3):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 3,C")
-            elif cmd2 == 0x5a:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.get_d(), 3):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 3,D")
-            elif cmd2 == 0x5b:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.get_e(), 3):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 3,E")
-            elif cmd2 == 0x5c:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.get_h(), 3):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 3,H")
-            elif cmd2 == 0x5d:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.get_l(), 3):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 3,L")
-            elif cmd2 == 0x5e:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( mem.read( self.hl), 3):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 3,(HL)")
-            elif cmd2 == 0x5f:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.a, 3):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 3,A")
-            elif cmd2 == 0x60:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.get_b(), 4):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 4,B")
-            elif cmd2 == 0x61:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.get_c(), 4):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 4,C")
-            elif cmd2 == 0x62:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.get_d(), 4):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 4,D")
-            elif cmd2 == 0x63:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.get_e(), 4):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 4,E")
-            elif cmd2 == 0x64:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.get_h(), 4):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 4,H")
-            elif cmd2 == 0x65:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.get_l(), 4):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 4,L")
-            elif cmd2 == 0x66:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( mem.read( self.hl), 4):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 4,(HL)")
-            elif cmd2 == 0x67:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.a, 4):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 4,A")
-            elif cmd2 == 0x68:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.get_b(), 5):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 5,B")
-            elif cmd2 == 0x69:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.get_c(), 5):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 5,C")
-            elif cmd2 == 0x6a:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.get_d(), 5):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 5,D")
-            elif cmd2 == 0x6b:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.get_e(), 5):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 5,E")
-            elif cmd2 == 0x6c:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.get_h(), 5):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 5,H")
-            elif cmd2 == 0x6d:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.get_l(), 5):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 5,L")
-            elif cmd2 == 0x6e:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( mem.read( self.hl), 5):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 5,(HL)")
-            elif cmd2 == 0x6f:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.a, 5):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 5,A")
-            elif cmd2 == 0x70:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.get_b(), 6):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 6,B")
-            elif cmd2 == 0x71:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.get_c(), 6):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 6,C")
-            elif cmd2 == 0x72:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.get_d(), 6):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 6,D")
-            elif cmd2 == 0x73:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.get_e(), 6):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 6,E")
-            elif cmd2 == 0x74:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.get_h(), 6):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 6,H")
-            elif cmd2 == 0x75:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.get_l(), 6):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 6,L")
-            elif cmd2 == 0x76:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( mem.read( self.hl), 6):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 6,(HL)")
-            elif cmd2 == 0x77:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.a, 6):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 6,A")
-            elif cmd2 == 0x78:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.get_b(), 7):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 7,B")
-            elif cmd2 == 0x79:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.get_c(), 7):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 7,C")
-            elif cmd2 == 0x7a:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.get_d(), 7):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 7,D")
-            elif cmd2 == 0x7b:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.get_e(), 7):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 7,E")
-            elif cmd2 == 0x7c:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.get_h(), 7):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 7,H")
-            elif cmd2 == 0x7d:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.get_l(), 7):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 7,L")
-            elif cmd2 == 0x7e:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( mem.read( self.hl), 7):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 7,(HL)")
-            elif cmd2 == 0x7f:
-                self.f = set_bit( self.f, self.flag_half)
-                self.f = clr_bit( self.f, self.flag_sub)
-                if bit_is_set( self.a, 7):
-                    self.f = clr_bit( self.f, self.flag_zero)
-                else:
-                    self.f = set_bit( self.f, self.flag_zero)
-                self.pc += 2
-                result = ( "BIT 7,A")
-            elif cmd2 == 0x87:
-                self.a = clr_bit( self.a, 0)
-                self.pc += 2
-                result = ( "RES 0,A")
-            elif cmd2 == 0x8f:
-                self.a = clr_bit( self.a, 1)
-                self.pc += 2
-                result = ( "RES 1,A")
-            elif cmd2 == 0x97:
-                self.a = clr_bit( self.a, 2)
-                self.pc += 2
-                result = ( "RES 2,A")
-            elif cmd2 == 0x9f:
-                self.a = clr_bit( self.a, 3)
-                self.pc += 2
-                result = ( "RES 3,A")
-            elif cmd2 == 0xa7:
-                self.a = clr_bit( self.a, 4)
-                self.pc += 2
-                result = ( "RES 4,A")
-            elif cmd2 == 0xaf:
-                self.a = clr_bit( self.a, 5)
-                self.pc += 2
-                result = ( "RES 5,A")
-            elif cmd2 == 0xb7:
-                self.a = clr_bit( self.a, 6)
-                self.pc += 2
-                result = ( "RES 6,A")
-            elif cmd2 == 0xbf:
-                self.a = clr_bit( self.a, 7)
-                self.pc += 2
-                result = ( "RES 7,A")
-            elif cmd2 == 0xc0:
-                self.set_b( set_bit( self.get_b(), 0))
-                self.pc += 2
-                result = ( "SET 0,B")
-            elif cmd2 == 0xc1:
-                self.set_c( set_bit( self.get_c(), 0))
-                self.pc += 2
-                result = ( "SET 0,C")
-            elif cmd2 == 0xc2:
-                self.set_d( set_bit( self.get_d(), 0))
-                self.pc += 2
-                result = ( "SET 0,D")
-            elif cmd2 == 0xc3:
-                self.set_e( set_bit( self.get_e(), 0))
-                self.pc += 2
-                result = ( "SET 0,E")
-            elif cmd2 == 0xc4:
-                self.set_h( set_bit( self.get_h(), 0))
-                self.pc += 2
-                result = ( "SET 0,H")
-            elif cmd2 == 0xc5:
-                self.set_l( set_bit( self.get_l, 0))
-                self.pc += 2
-                result = ( "SET 0,L")
-            elif cmd2 == 0xc6:
-                value = mem.read( self.hl)
-                result = set_bit( value, 0)
-                mem.write( self.hl, result)
-                self.pc += 2
-                result = ( "SET 0,(HL)")
-            elif cmd2 == 0xc7:
-                self.a = set_bit( self.a, 0)
-                self.pc += 2
-                result = ( "SET 0,A")
-            elif cmd2 == 0xc8:
-                self.set_b( set_bit( self.get_b(), 1))
-                self.pc += 2
-                result = ( "SET 1,B")
-            elif cmd2 == 0xc9:
-                self.set_c( set_bit( self.get_c(), 1))
-                self.pc += 2
-                result = ( "SET 1,C")
-            elif cmd2 == 0xca:
-                self.set_d( set_bit( self.get_d(), 1))
-                self.pc += 2
-                result = ( "SET 1,D")
-            elif cmd2 == 0xcb:
-                self.set_e( set_bit( self.get_e(), 1))
-                self.pc += 2
-                result = ( "SET 1,E")
-            elif cmd2 == 0xcc:
-                self.set_h( set_bit( self.get_h(), 1))
-                self.pc += 2
-                result = ( "SET 1,H")
-            elif cmd2 == 0xcd:
-                self.set_l( set_bit( self.get_l, 1))
-                self.pc += 2
-                result = ( "SET 1,L")
-            elif cmd2 == 0xce:
-                value = mem.read( self.hl)
-                result = set_bit( value, 1)
-                mem.write( self.hl, result)
-                self.pc += 2
-                result = ( "SET 1,(HL)")
-            elif cmd2 == 0xcf:
-                self.a = set_bit( self.a, 1)
-                self.pc += 2
-                result = ( "SET 1,A")
-            elif cmd2 == 0xd0:
-                self.set_b( set_bit( self.get_b(), 2))
-                self.pc += 2
-                result = ( "SET 2,B")
-            elif cmd2 == 0xd1:
-                self.set_c( set_bit( self.get_c(), 2))
-                self.pc += 2
-                result = ( "SET 2,C")
-            elif cmd2 == 0xd2:
-                self.set_d( set_bit( self.get_d(), 2))
-                self.pc += 2
-                result = ( "SET 2,D")
-            elif cmd2 == 0xd3:
-                self.set_e( set_bit( self.get_e(), 2))
-                self.pc += 2
-                result = ( "SET 2,E")
-            elif cmd2 == 0xd4:
-                self.set_h( set_bit( self.get_h(), 2))
-                self.pc += 2
-                result = ( "SET 2,H")
-            elif cmd2 == 0xd5:
-                self.set_l( set_bit( self.get_l, 2))
-                self.pc += 2
-                result = ( "SET 2,L")
-            elif cmd2 == 0xd6:
-                value = mem.read( self.hl)
-                result = set_bit( value, 2)
-                mem.write( self.hl, result)
-                self.pc += 2
-                result = ( "SET 2,(HL)")
-            elif cmd2 == 0xd7:
-                self.a = set_bit( self.a, 2)
-                self.pc += 2
-                result = ( "SET 2,A")
-            elif cmd2 == 0xd8:
-                self.set_b( set_bit( self.get_b(), 3))
-                self.pc += 2
-                result = ( "SET 3,B")
-            elif cmd2 == 0xd9:
-                self.set_c( set_bit( self.get_c(), 3))
-                self.pc += 2
-                result = ( "SET 3,C")
-            elif cmd2 == 0xda:
-                self.set_d( set_bit( self.get_d(), 3))
-                self.pc += 2
-                result = ( "SET 3,D")
-            elif cmd2 == 0xdb:
-                self.set_e( set_bit( self.get_e(), 3))
-                self.pc += 2
-                result = ( "SET 3,E")
-            elif cmd2 == 0xdc:
-                self.set_h( set_bit( self.get_h(), 3))
-                self.pc += 2
-                result = ( "SET 3,H")
-            elif cmd2 == 0xdd:
-                self.set_l( set_bit( self.get_l, 3))
-                self.pc += 2
-                result = ( "SET 3,L")
-            elif cmd2 == 0xde:
-                value = mem.read( self.hl)
-                result = set_bit( value, 3)
-                mem.write( self.hl, result)
-                self.pc += 2
-                result = ( "SET 3,(HL)")
-            elif cmd2 == 0xdf:
-                self.a = set_bit( self.a, 3)
-                self.pc += 2
-                result = ( "SET 3,A")
-            elif cmd2 == 0xe0:
-                self.set_b( set_bit( self.get_b(), 4))
-                self.pc += 2
-                result = ( "SET 4,B")
-            elif cmd2 == 0xe1:
-                self.set_c( set_bit( self.get_c(), 4))
-                self.pc += 2
-                result = ( "SET 4,C")
-            elif cmd2 == 0xe2:
-                self.set_d( set_bit( self.get_d(), 4))
-                self.pc += 2
-                result = ( "SET 4,D")
-            elif cmd2 == 0xe3:
-                self.set_e( set_bit( self.get_e(), 4))
-                self.pc += 2
-                result = ( "SET 4,E")
-            elif cmd2 == 0xe4:
-                self.set_h( set_bit( self.get_h(), 4))
-                self.pc += 2
-                result = ( "SET 4,H")
-            elif cmd2 == 0xe5:
-                self.set_l( set_bit( self.get_l, 4))
-                self.pc += 2
-                result = ( "SET 4,L")
-            elif cmd2 == 0xe6:
-                value = mem.read( self.hl)
-                result = set_bit( value, 4)
-                mem.write( self.hl, result)
-                self.pc += 2
-                result = ( "SET 4,(HL)")
-            elif cmd2 == 0xe7:
-                self.a = set_bit( self.a, 4)
-                self.pc += 2
-                result = ( "SET 4,A")
-            elif cmd2 == 0xe8:
-                self.set_b( set_bit( self.get_b(), 5))
-                self.pc += 2
-                result = ( "SET 5,B")
-            elif cmd2 == 0xe9:
-                self.set_c( set_bit( self.get_c(), 5))
-                self.pc += 2
-                result = ( "SET 5,C")
-            elif cmd2 == 0xea:
-                self.set_d( set_bit( self.get_d(), 5))
-                self.pc += 2
-                result = ( "SET 5,D")
-            elif cmd2 == 0xeb:
-                self.set_e( set_bit( self.get_e(), 5))
-                self.pc += 2
-                result = ( "SET 5,E")
-            elif cmd2 == 0xec:
-                self.set_h( set_bit( self.get_h(), 5))
-                self.pc += 2
-                result = ( "SET 5,H")
-            elif cmd2 == 0xed:
-                self.set_l( set_bit( self.get_l, 5))
-                self.pc += 2
-                result = ( "SET 5,L")
-            elif cmd2 == 0xee:
-                value = mem.read( self.hl)
-                result = set_bit( value, 5)
-                mem.write( self.hl, result)
-                self.pc += 2
-                result = ( "SET 5,(HL)")
-            elif cmd2 == 0xef:
-                self.a = set_bit( self.a, 5)
-                self.pc += 2
-                result = ( "SET 5,A")
-            elif cmd2 == 0xf0:
-                self.set_b( set_bit( self.get_b(), 6))
-                self.pc += 2
-                result = ( "SET 6,B")
-            elif cmd2 == 0xf1:
-                self.set_c( set_bit( self.get_c(), 6))
-                self.pc += 2
-                result = ( "SET 6,C")
-            elif cmd2 == 0xf2:
-                self.set_d( set_bit( self.get_d(), 6))
-                self.pc += 2
-                result = ( "SET 6,D")
-            elif cmd2 == 0xf3:
-                self.set_e( set_bit( self.get_e(), 6))
-                self.pc += 2
-                result = ( "SET 6,E")
-            elif cmd2 == 0xf4:
-                self.set_h( set_bit( self.get_h, 6))
-                self.pc += 2
-                result = ( "SET 6,H")
-            elif cmd2 == 0xf5:
-                self.set_l( set_bit( self.get_l, 6))
-                self.pc += 2
-                result = ( "SET 6,L")
-            elif cmd2 == 0xf6:
-                value = mem.read( self.hl)
-                result = set_bit( value, 6)
-                mem.write( self.hl, result)
-                self.pc += 2
-                result = ( "SET 6,(HL)")
-            elif cmd2 == 0xf7:
-                self.a = set_bit( self.a, 6)
-                self.pc += 2
-                result = ( "SET 6,A")
-            elif cmd2 == 0xf8:
-                self.set_b( set_bit( self.get_b(), 7))
-                self.pc += 2
-                result = ( "SET 7,B")
-            elif cmd2 == 0xf9:
-                self.set_c( set_bit( self.get_c(), 7))
-                self.pc += 2
-                result = ( "SET 7,C")
-            elif cmd2 == 0xfa:
-                self.set_d( set_bit( self.get_d(), 7))
-                self.pc += 2
-                result = ( "SET 7,D")
-            elif cmd2 == 0xfb:
-                self.set_e( set_bit( self.get_e(), 7))
-                self.pc += 2
-                result = ( "SET 7,E")
-            elif cmd2 == 0xfc:
-                self.set_h( set_bit( self.get_h(), 7))
-                self.pc += 2
-                result = ( "SET 7,H")
-            elif cmd2 == 0xfd:
-                self.set_l( set_bit( self.get_l, 7))
-                self.pc += 2
-                result = ( "SET 7,L")
-            elif cmd2 == 0xfe:
-                value = mem.read( self.hl)
-                result = set_bit( value, 7)
-                mem.write( self.hl, result)
-                self.pc += 2
-                result = ( "SET 7,(HL)")
-            elif cmd2 == 0xff:
-                self.a = set_bit( self.a, 7)
-                self.pc += 2
-                result = ( "SET 7,A")
-            else:
-                self.pc += 2
-                print    ( "subcommand CB%02X not implmented!  " % cmd2)
-                result = ( "subcommand CB%02X not implmented!  " % cmd2)
-                raise ValueError
-
-        elif cmd == 0xcc:
-            addr = mem.read16( self.pc + 1)
-            if bit_is_set( self.f, self.flag_zero):
-                self.push_( mem, self.pc + 3)
-                self.pc = addr
-            else:
-                self.pc += 3
-            result = ( "CALL Z,0%04Xh" % addr)
+    def op_ed_b2( self, mem, ios):
+        self.in_block_( mem, ios, 1, True)
 
-        elif cmd == 0xcd:
-            addr = mem.read16( self.pc + 1)
-            self.push_( mem, self.pc + 3)
-            self.pc = addr
-            result = ( "CALL 0%04X" % addr)
-
-        elif cmd == 0xce:
-            value = mem.read( self.pc + 1)
-            self.adc_( value)
-            self.pc += 2
-            result = ( "ADC 0%02Xh" % value)
-
-        elif cmd == 0xcf:
-            self.push_( mem, self.pc + 1)
-            self.pc = 0x08
-            result = ( "RST 08h")
-
-        elif cmd == 0xd0:
-            if bit_is_clear( self.f, self.flag_carry):
-                self.pc = self.pop_( mem)
-            else:
-                self.pc += 1
-            result = ( "RET NC")
-
-        elif cmd == 0xd1:
-            self.de = self.pop_( mem)
-            self.pc += 1
-            result = ( "POP DE")
-
-        elif cmd == 0xd2:
-            addr = mem.read16( self.pc + 1)
-            if bit_is_clear( self.f, self.flag_carry):
-                self.pc = addr
-            else:
-                self.pc += 3
-            result = ( "JP NC,0%04Xh" % addr)
-
-        elif cmd == 0xd3:
-            port = mem.read( self.pc + 1)
-            self.pc += 2
-            result = ( "OUT (0%02Xh),A" % port)
-            for io in ios:
-                io.write( port, self.a)
-
-        elif cmd == 0xd4:
-            addr = mem.read16( self.pc + 1)
-            if bit_is_clear( self.f, self.flag_carry):
-                self.push_( mem, self.pc + 3)
-                self.pc = addr
-            else:
-                self.pc += 3
-            result = ( "CALL NC,0%04Xh" % addr)
-
-        elif cmd == 0xd5:
-            self.push_( mem, self.de)
-            self.pc += 1
-            result = ( "PUSH DE")
-
-        elif cmd == 0xd6:
-            value = mem.read( self.pc + 1)
-            self.sub_( value)
-            self.pc += 2
-            result = ( "SUB 0%02Xh" % value)
-
-        elif cmd == 0xd7:
-            self.push_( mem, self.pc + 1)
-            self.pc = 0x10
-            result = ( "RST 10h")
-
-        elif cmd == 0xd8:
-            if bit_is_set( self.f, self.flag_carry):
-                self.pc = self.pop_( mem)
-            else:
-                self.pc += 1
-            result = ( "RET C")
-
-        elif cmd == 0xd9:
-            self.bc, self.bc_ = self.bc_, self.bc
-            self.de, self.de_ = self.de_, self.de
-            self.hl, self.hl_ = self.hl_, self.hl
-            self.pc += 1
-            result = ( "EXX")
-
-        elif cmd == 0xda:
-            addr = mem.read16( self.pc + 1)
-            if bit_is_set( self.f, self.flag_carry):
-                self.pc = addr
-            else:
-                self.pc += 3
-            result = ( "JP C,0%04Xh" % addr)
-
-        elif cmd == 0xdb:
-            port = mem.read( self.pc + 1)
-            self.pc += 2
-            result = ( "IN A,(0%02Xh)" % port)
-            for io in ios:
-                value = io.read( port)
-                if value:
-                    self.a = value
-                    # keine Flagbeeinflussung
-
-        elif cmd == 0xdc:
-            addr = mem.read16( self.pc + 1)
-            if bit_is_set( self.f, self.flag_carry):
-                self.push_( mem, self.pc + 3)
-                self.pc = addr
-            else:
-                self.pc += 3
-            result = ( "CALL C,0%04Xh" % addr)
-
-        elif cmd == 0xde:
-            value = mem.read( self.pc + 1)
-            self.sbc_( value)
-            self.pc += 2
-            result = ( "SBC 0%02Xh" % value)
-
-        ###################
-        # enhanced commands
-        elif cmd == 0xdd:
-            cmd2 = mem.read( self.pc + 1)
-
-            if cmd2 == 0x09:
-                self.ix += self.bc
-                self.ix %= 0xffff
-                self.pc += 2
-                result = ( "ADD IX,BC")
-
-            elif cmd2 == 0x19:
-                self.ix += self.de
-                self.ix %= 0xffff
-                self.pc += 2
-                result = ( "ADD IX,DE")
-
-            elif cmd2 == 0x21:
-                value = mem.read16( self.pc + 2)
-                self.set_ix( value)
-                self.pc += 4
-                result = ( "LD IX, 0%04Xh" % value)
-
-            elif cmd2 == 0x22:
-                addr = mem.read16( self.pc + 2)
-                mem.write16( addr, self.ix)
-                self.pc += 4
-                result = ( "LD (0%04Xh), IX" % addr)
-
-            elif cmd2 == 0x29:
-                self.ix += self.ix
-                self.ix %= 0xffff
-                self.pc += 2
-                result = ( "ADD IX,IX")
-
-            elif cmd2 == 0x2a:
-                addr = mem.read16( self.pc + 2)
-                self.set_ix( mem.read16( addr))
-                self.pc += 4
-                result = ( "LD IX,(0%04Xh)" % addr)
-
-            elif cmd2 == 0x34:
-                offset = mem.read( self.pc + 2)
-                if offset > 127:
-                    offset -= 256 
-                value = mem.read( self.ix + offset)
-                result = self.inc_( value)
-                mem.write( self.ix + offset, result)
-                self.pc += 3
-                result = ( "INC (IX+0%02Xh)" % ( offset))
-
-            elif cmd2 == 0x36:
-                offset = mem.read( self.pc + 2)
-                value  = mem.read( self.pc + 3)
-                if offset > 127:
-                    offset -= 256 
-                mem.write( self.ix + offset, value)
-                self.pc += 4
-                result = ( "LD (IX+0%02Xh), %02X" % ( offset, value))
-
-            elif cmd2 == 0x39:
-                self.ix += self.sp
-                self.ix %= 0xffff
-                self.pc += 2
-                result = ( "ADD IX,SP")
-
-            elif cmd2 == 0x46:
-                offset = mem.read( self.pc + 2)
-                if offset > 127:
-                    offset -= 256
-                value = mem.read( self.ix + offset)
-                self.set_b( value)
-                self.pc += 3
-                result = ( "LD B, (IX+0%02Xh)" % ( offset))
-
-            elif cmd2 == 0x4e:
-                offset = mem.read( self.pc + 2)
-                if offset > 127:
-                    offset -= 256
-                value = mem.read( self.ix + offset)
-                self.set_c( value)
-                self.pc += 3
-                result = ( "LD C, (IX+0%02Xh)" % ( offset))
-
-            elif cmd2 == 0x56:
-                offset = mem.read( self.pc + 2)
-                if offset > 127:
-                    offset -= 256
-                value = mem.read( self.ix + offset)
-                self.set_d( value)
-                self.pc += 3
-                result = ( "LD D, (IX+0%02Xh)" % ( offset))
-
-            elif cmd2 == 0x5e:
-                offset = mem.read( self.pc + 2)
-                if offset > 127:
-                    offset -= 256
-                value = mem.read( self.ix + offset)
-                self.set_e( value)
-                self.pc += 3
-                result = ( "LD E, (IX+0%02Xh)" % ( offset))
-
-            elif cmd2 == 0x66:
-                offset = mem.read( self.pc + 2)
-                if offset > 127:
-                    offset -= 256 
-                value = mem.read( self.ix + offset)
-                self.set_h( value)
-                self.pc += 3
-                result = ( "LD H, (IX+0%02Xh)" % ( offset))
-
-            elif cmd2 == 0x6e:
-                offset = mem.read( self.pc + 2)
-                if offset > 127:
-                    offset -= 256
-                value = mem.read( self.ix + offset)
-                self.set_l( value)
-                self.pc += 3
-                result = ( "LD L, (IX+0%02Xh)" % ( offset))
-
-            elif cmd2 == 0x75:
-                offset = mem.read( self.pc + 2)
-                if offset > 127:
-                    offset -= 256
-                mem.write( self.ix + offset, lo( self.hl))
-                self.pc += 3
-                result = ( "LD (IX+0%02Xh), L" % offset)
-
-            elif cmd2 == 0x7e:
-                offset = mem.read( self.pc + 2)
-                if offset > 127:
-                    offset -= 256
-                value = mem.read( self.ix + offset)
-                self.a = value
-                self.pc += 3
-                result = ( "LD A, (IX+0%02Xh)" % ( offset))
-
-            elif cmd2 == 0x84:
-                self.add_( hi( self.ix))
-                self.pc += 2
-                result = ( "ADD A,IXH")
-
-            elif cmd2 == 0x85:
-                self.add_( lo( self.ix))
-                self.pc += 2
-                result = ( "ADD A,IXL")
-
-            elif cmd2 == 0x86:
-                offset = mem.read( self.pc + 2)
-                if offset > 127:
-                    offset -= 256 
-                value = mem.read( self.ix + offset)
-                self.add_( value)
-                self.pc += 3
-                result = ( "ADD A,(IX+0%02Xh)" % offset)
-
-            elif cmd2 == 0x8c:
-                self.adc_( hi( self.ix))
-                self.pc += 2
-                result = ( "ADC A,IXH")
-
-            elif cmd2 == 0x8d:
-                self.adc_( lo( self.ix))
-                self.pc += 2
-                result = ( "ADC A,IXL")
-
-            elif cmd2 == 0x8e:
-                offset = mem.read( self.pc + 2)
-                if offset > 127:
-                    offset -= 256 
-                value = mem.read( self.ix + offset)
-                self.adc_( value)
-                self.pc += 3
-                result = ( "ADC A,(IX+0%02Xh)" % offset)
-
-            elif cmd2 == 0x94:
-                self.sub_( hi( self.ix))
-                self.pc += 2
-                result = ( "SUB A,IXH")
-
-            elif cmd2 == 0x95:
-                self.sub_( lo( self.ix))
-                self.pc += 2
-                result = ( "SUB A,IXL")
-
-            elif cmd2 == 0x96:
-                offset = mem.read( self.pc + 2)
-                if offset > 127:
-                    offset -= 256 
-                value = mem.read( self.ix + offset)
-                self.sub_( value)
-                self.pc += 3
-                result = ( "SUB A,(IX+0%02Xh)" % offset)
-
-            elif cmd2 == 0x9c:
-                self.sbc_( hi( self.ix))
-                self.pc += 2
-                result = ( "SBC A,IXH")
-
-            elif cmd2 == 0x9d:
-                self.sbc_( lo( self.ix))
-                self.pc += 2
-                result = ( "SBC A,IXL")
-
-            elif cmd2 == 0x9e:
-                offset = mem.read( self.pc + 2)
-                if offset > 127:
-                    offset -= 256 
-                value = mem.read( self.ix + offset)
-                self.sbc_( value)
-                self.pc += 3
-                result = ( "SBC A,(IX+0%02Xh)" % offset)
-
-            elif cmd2 == 0xa4:
-                self.and_( hi( self.ix))
-                self.pc += 2
-                result = ( "AND A,IXH")
-
-            elif cmd2 == 0xa5:
-                self.and_( lo( self.ix))
-                self.pc += 2
-                result = ( "AND A,IXL")
-
-            elif cmd2 == 0xa6:
-                offset = mem.read( self.pc + 2)
-                if offset > 127:
-                    offset -= 256 
-                value = mem.read( self.ix + offset)
-                self.and_( value)
-                self.pc += 3
-                result = ( "AND A,(IX+0%02Xh)" % offset)
-
-            elif cmd2 == 0xac:
-                self.xor_( hi( self.ix))
-                self.pc += 2
-                result = ( "XOR A,IXH")
-
-            elif cmd2 == 0xad:
-                self.xor_( lo( self.ix))
-                self.pc += 2
-                result = ( "XOR A,IXL")
-
-            elif cmd2 == 0xae:
-                offset = mem.read( self.pc + 2)
-                if offset > 127:
-                    offset -= 256 
-                value = mem.read( self.ix + offset)
-                self.xor_( value)
-                self.pc += 3
-                result = ( "XOR A,(IX+0%02Xh)" % offset)
-
-            elif cmd2 == 0xb4:
-                self.or_( hi( self.ix))
-                self.pc += 2
-                result = ( "OR A,IXH")
-
-            elif cmd2 == 0xb5:
-                self.or_( lo( self.ix))
-                self.pc += 2
-                result = ( "OR A,IXL")
-
-            elif cmd2 == 0xb6:
-                offset = mem.read( self.pc + 2)
-                if offset > 127:
-                    offset -= 256 
-                value = mem.read( self.ix + offset)
-                self.or_( value)
-                self.pc += 3
-                result = ( "OR A,(IX+0%02Xh)" % offset)
-
-            elif cmd2 == 0xbc:
-                self.compare( hi( self.ix))
-                self.pc += 2
-                result = ( "CP A,IXH")
-
-            elif cmd2 == 0xbd:
-                self.compare( lo( self.ix))
-                self.pc += 2
-                result = ( "CP A,IXL")
-
-            elif cmd2 == 0xbe:
-                offset = mem.read( self.pc + 2)
-                if offset > 127:
-                    offset -= 256 
-                value = mem.read( self.ix + offset)
-                self.compare( value)
-                self.pc += 3
-                result = ( "CP A,(IX+0%02Xh)" % offset)
-
-            elif cmd2 == 0xcb:
-                offset = mem.read( self.pc + 2)
-                cmd4   = mem.read( self.pc + 3)
-                if offset > 127:
-                    offset -= 256
-
-                if cmd4 == 0x46:
-                    value = mem.read( self.ix + offset)
-                    self.bit_( value, 0)
-                    self.pc += 4
-                    result = ( "BIT 0,(IX%+i)" % offset)
-
-                elif cmd4 == 0x4e:
-                    value = mem.read( self.ix + offset)
-                    self.bit_( value, 1)
-                    self.pc += 4
-                    result = ( "BIT 1,(IX%+i)" % offset)
-
-                elif cmd4 == 0x56:
-                    value = mem.read( self.ix + offset)
-                    self.bit_( value, 2)
-                    self.pc += 4
-                    result = ( "BIT 2,(IX%+i)" % offset)
-
-                elif cmd4 == 0x5e:
-                    value = mem.read( self.ix + offset)
-                    self.bit_( value, 3)
-                    self.pc += 4
-                    result = ( "BIT 3,(IX%+i)" % offset)
-
-                elif cmd4 == 0x66:
-                    value = mem.read( self.ix + offset)
-                    self.bit_( value, 4)
-                    self.pc += 4
-                    result = ( "BIT 4,(IX%+i)" % offset)
-
-                elif cmd4 == 0x6e:
-                    value = mem.read( self.ix + offset)
-                    self.bit_( value, 5)
-                    self.pc += 4
-                    result = ( "BIT 5,(IX%+i)" % offset)
-
-                elif cmd4 == 0x76:
-                    value = mem.read( self.ix + offset)
-                    self.bit_( value, 6)
-                    self.pc += 4
-                    result = ( "BIT 6,(IX%+i)" % offset)
-
-                elif cmd4 == 0x7e:
-                    value = mem.read( self.ix + offset)
-                    self.bit_( value, 7)
-                    self.pc += 4
-                    result = ( "BIT 7,(IX%+i)" % offset)
-
-                elif cmd4 == 0x86:
-                    value = mem.read( self.ix + offset)
-                    result = clr_bit( value, 0)
-                    mem.write( self.ix + offset, result)
-                    self.pc += 4
-                    result = ( "RES 0,(IX%+i)" % offset)
-
-                elif cmd4 == 0x8e:
-                    value = mem.read( self.ix + offset)
-                    result = clr_bit( value, 1)
-                    mem.write( self.ix + offset, result)
-                    self.pc += 4
-                    result = ( "RES 1,(IX%+i)" % offset)
-
-                elif cmd4 == 0x96:
-                    value = mem.read( self.ix + offset)
-                    result = clr_bit( value, 2)
-                    mem.write( self.ix + offset, result)
-                    self.pc += 4
-                    result = ( "RES 2,(IX%+i)" % offset)
-
-                elif cmd4 == 0x9e:
-                    value = mem.read( self.ix + offset)
-                    result = clr_bit( value, 3)
-                    mem.write( self.ix + offset, result)
-                    self.pc += 4
-                    result = ( "RES 3,(IX%+i)" % offset)
-
-                elif cmd4 == 0xa6:
-                    value = mem.read( self.ix + offset)
-                    result = clr_bit( value, 4)
-                    mem.write( self.ix + offset, result)
-                    self.pc += 4
-                    result = ( "RES 4,(IX%+i)" % offset)
-
-                elif cmd4 == 0xae:
-                    value = mem.read( self.ix + offset)
-                    result = clr_bit( value, 5)
-                    mem.write( self.ix + offset, result)
-                    self.pc += 4
-                    result = ( "RES 5,(IX%+i)" % offset)
-
-                elif cmd4 == 0xb6:
-                    value = mem.read( self.ix + offset)
-                    result = clr_bit( value, 6)
-                    mem.write( self.ix + offset, result)
-                    self.pc += 4
-                    result = ( "RES 6,(IX%+i)" % offset)
-
-                elif cmd4 == 0xbe:
-                    value = mem.read( self.ix + offset)
-                    result = clr_bit( value, 7)
-                    mem.write( self.ix + offset, result)
-                    self.pc += 4
-                    result = ( "RES 7,(IX%+i)" % offset)
-
-                elif cmd4 == 0xc6:
-                    value = mem.read( self.ix + offset)
-                    result = set_bit( value, 0)
-                    mem.write( self.ix + offset, result)
-                    self.pc += 4
-                    result = ( "SET 0,(IX%+i)" % offset)
-
-                elif cmd4 == 0xce:
-                    value = mem.read( self.ix + offset)
-                    result = set_bit( value, 1)
-                    mem.write( self.ix + offset, result)
-                    self.pc += 4
-                    result = ( "SET 1,(IX%+i)" % offset)
-
-                elif cmd4 == 0xd6:
-                    value = mem.read( self.ix + offset)
-                    result = set_bit( value, 2)
-                    mem.write( self.ix + offset, result)
-                    self.pc += 4
-                    result = ( "SET 2,(IX%+i)" % offset)
-
-                elif cmd4 == 0xde:
-                    value = mem.read( self.ix + offset)
-                    result = set_bit( value, 3)
-                    mem.write( self.ix + offset, result)
-                    self.pc += 4
-                    result = ( "SET 3,(IX%+i)" % offset)
-
-                elif cmd4 == 0xe6:
-                    value = mem.read( self.ix + offset)
-                    result = set_bit( value, 4)
-                    mem.write( self.ix + offset, result)
-                    self.pc += 4
-                    result = ( "SET 4,(IX%+i)" % offset)
-
-                elif cmd4 == 0xee:
-                    value = mem.read( self.ix + offset)
-                    result = set_bit( value, 5)
-                    mem.write( self.ix + offset, result)
-                    self.pc += 4
-                    result = ( "SET 5,(IX%+i)" % offset)
-
-                elif cmd4 == 0xf6:
-                    value = mem.read( self.ix + offset)
-                    result = set_bit( value, 6)
-                    mem.write( self.ix + offset, result)
-                    self.pc += 4
-                    result = ( "SET 6,(IX%+i)" % offset)
-
-                elif cmd4 == 0xfe:
-                    value = mem.read( self.ix + offset)
-                    result = set_bit( value, 7)
-                    mem.write( self.ix + offset, result)
-                    self.pc += 4
-                    result = ( "SET 7,(IX%+i)" % offset)
+    def op_ed_b3( self, mem, ios):
+        self.out_block_( mem, ios, 1, True)
 
-                else:
-                    self.pc += 4
-                    print    ( "subcommand DDCB%02X%02X not implmented!  " % ( offset, cmd4))
-                    result = ( "subcommand DDCB%02X%02X not implmented!  " % ( offset, cmd4))
-
-            elif cmd2 == 0xe1:
-                self.ix = self.pop_( mem)
-                self.pc += 2
-                result = ( "POP IX")
-
-            elif cmd2 == 0xe5:
-                self.push_( mem, self.ix)
-                self.pc += 2
-                result = ( "PUSH IX")
-
-            elif cmd2 == 0xe9:
-                addr = mem.read16( self.ix)
-                self.pc = addr
-                result = ( "JP (IX)")
-
-            elif cmd2 == 0xf9:
-                self.set_sp( self.ix)
-                self.pc += 2
-                result = ( "LD SP, IX")
+    def op_ed_b8( self, mem, ios):
+        self.ld_block_( mem, -1, True)
 
-            else:
-                self.pc += 2
-                print    ( "subcommand DD%02X not implmented!  " % cmd2)
-                result = ( "subcommand DD%02X not implmented!  " % cmd2)
-                #raise ValueError
-
-        elif cmd == 0xdf:
-            self.push_( mem, self.pc + 1)
-            self.pc = 0x18
-            result = ( "RST 18h")
-
-        elif cmd == 0xe0:
-            if bit_is_clear( self.f, self.flag_par):
-                self.pc = self.pop_( mem)
-            else:
-                self.pc += 1
-            result = ( "RET PO")
-
-        elif cmd == 0xe1:
-            self.hl = self.pop_( mem)
-            self.pc += 1
-            result = ( "POP HL")
-
-        elif cmd == 0xe2:
-            addr = mem.read16( self.pc + 1)
-            if bit_is_clear( self.f, self.flag_par):
-                self.pc = addr
-            else:
-                self.pc += 3
-            result = ( "JP PO,0%04Xh" % addr)
+    def op_ed_b9( self, mem, ios):
+        self.cp_block_( mem, -1, True)
 
-        elif cmd == 0xe3:
-            value1 = mem.read16( self.sp)
-            value2 = self.hl
+    def op_ed_ba( self, mem, ios):
+        self.in_block_( mem, ios, -1, True)
 
-            mem.write16( self.sp, value2)
-            self.hl = value1
+    def op_ed_bb( self, mem, ios):
+        self.out_block_( mem, ios, -1, True)
 
-            self.pc += 1
-            result = ( "EX (SP),HL")
+    # undocumented mirrors of RETN and IM
+    op_ed_55 = op_ed_5d = op_ed_65 = op_ed_6d = op_ed_75 = op_ed_7d = op_ed_45
+    op_ed_4e = op_ed_66 = op_ed_6e = op_ed_46
+    op_ed_76 = op_ed_56
+    op_ed_7e = op_ed_5e
 
-        elif cmd == 0xe4:
-            addr = mem.read16( self.pc + 1)
-            if bit_is_clear( self.f, self.flag_par):
-                self.push_( mem, self.pc + 3)
-                self.pc = addr
-            else:
-                self.pc += 3
-            result = ( "CALL PO,0%04Xh" % addr)
-
-        elif cmd == 0xe5:
-            self.push_( mem, self.hl)
-            self.pc += 1
-            result = ( "PUSH HL")
-
-        elif cmd == 0xe6:
-            value = mem.read( self.pc + 1)
-            self.and_( value)
-            self.pc += 2
-            result = ( "AND 0%02Xh" % value)
-
-        elif cmd == 0xe7:
-            self.push_( mem, self.pc + 1)
-            self.pc = 0x20
-            result = ( "RST 20h")
-
-        elif cmd == 0xe8:
-            if bit_is_set( self.f, self.flag_par):
-                self.pc = self.pop_( mem)
-            else:
-                self.pc += 1
-            result = ( "RET PE")
+    def op_ed_unknown( self, mem, ios):
+        cmd2 = mem.read( self.pc + 1)
+        self.pc = ( self.pc + 2) & 0xffff
+        print    ( "subcommand ED%02X not implmented!  " % cmd2)
+        #raise ValueError
 
-        elif cmd == 0xe9:
-            self.pc = self.hl
-            result = ( "JP (HL)")
 
-        elif cmd == 0xea:
-            addr = mem.read16( self.pc + 1)
-            if bit_is_set( self.f, self.flag_par):
-                self.pc = addr
-            else:
-                self.pc += 3
-            result = ( "JP PE,0%04Xh" % addr)
-
-        elif cmd == 0xeb:
-            de = self.de
-            hl = self.hl
-            self.hl = de
-            self.de = hl
-            self.pc += 1
-            result = ( "EX DE,HL")
-
-        elif cmd == 0xec:
-            addr = mem.read16( self.pc + 1)
-            if bit_is_set( self.f, self.flag_par):
-                self.push_( mem, self.pc + 3)
-                self.pc = addr
-            else:
-                self.pc += 3
-            result = ( "CALL PE,0%04Xh" % addr)
+##############################
+# generated handlers
+#
+# Commands with semantics in Spec.py are compiled from the generated
+# source, the DD/FD ones once for IX and IY, see index registers below.
 
-        ###################
-        # enhanced commands
-        elif cmd == 0xed:
-            cmd2 = mem.read( self.pc + 1)
-
-            if cmd2 == 0x40:
-                port = self.bc
-                self.pc += 2
-                result = ( "IN B,(C)")
-                for io in ios:
-                    value = io.read( port)
-                    if value:
-                        self.set_b( value)
-                        # Flagbeeinflussung! (unvollständig)
-                        self.f = clr_bit( self.f, self.flag_sub)
-
-            elif cmd2 == 0x41:
-                port = self.bc
-                self.pc += 2
-                result = ( "OUT (C),B")
-                for io in ios:
-                    io.write( port, self.get_b())
-
-            elif cmd2 == 0x42:
-                self.sbc16_( self.bc)
-                self.pc += 2
-                result = ( "SBC HL,BC")
-
-            elif cmd2 == 0x43:
-                addr = mem.read16( self.pc + 2)
-                mem.write16( addr, self.bc)
-                self.pc += 4
-                result = ( "LD (0%04Xh), BC" % addr)
-
-            elif cmd2 == 0x46:
-                print( "8080A interrupt mode")
-                self.set_im( 0)
-                self.pc += 2
-                result = ( "IM 0")
-
-            elif cmd2 == 0x47:
-                self.i = self.a
-                self.pc += 2
-                result = ( "LD I,A")
-
-            elif cmd2 == 0x48:
-                port = self.bc
-                self.pc += 2
-                result = ( "IN C,(C)")
-                for io in ios:
-                    value = io.read( port)
-                    if value:
-                        self.set_c( value)
-                        # Flagbeeinflussung! (unvollständig)
-                        self.f = clr_bit( self.f, self.flag_sub)
-
-            elif cmd2 == 0x49:
-                port = self.bc
-                self.pc += 2
-                result = ( "OUT (C),C")
-                for io in ios:
-                    io.write( port, self.get_c())
-
-            elif cmd2 == 0x4a:
-                self.hl += self.bc
-                if bit_is_set( self.f, self.flag_carry):
-                    self.hl += 1
-                self.hl %= 0xffff
-                self.pc += 2
-                result = ( "ADC HL,BC")
-
-            elif cmd2 == 0x4b:
-                addr = mem.read16( self.pc + 2)
-                self.set_bc( mem.read16( addr))
-                self.pc += 4
-                result = ( "LD BC,(0%04Xh)" % addr)
-
-            elif cmd2 == 0x4f:
-                self.r = self.a
-                self.pc += 2
-                result = ( "LD R,A")
-
-            elif cmd2 == 0x50:
-                port = self.bc
-                self.pc += 2
-                result = ( "IN D,(C)")
-                for io in ios:
-                    value = io.read( port)
-                    if value:
-                        self.set_d( value)
-                        # Flagbeeinflussung! (unvollständig)
-                        self.f = clr_bit( self.f, self.flag_sub)
-
-            elif cmd2 == 0x51:
-                port = self.bc
-                self.pc += 2
-                result = ( "OUT (C),D")
-                for io in ios:
-                    io.write( port, self.get_d())
-
-            elif cmd2 == 0x52:
-                self.sbc16_( self.de)
-                self.pc += 2
-                result = ( "SBC HL,DE")
-
-            elif cmd2 == 0x53:
-                addr = mem.read16( self.pc + 2)
-                mem.write16( addr, self.de)
-                self.pc += 4
-                result = ( "LD (0%04Xh), DE" % addr)
-
-            elif cmd2 == 0x56:
-                print( "all interrupts to 38h")
-                self.set_im( 1)
-                self.pc += 2
-                result = ( "IM 1")
-
-            elif cmd2 == 0x57:
-                self.a = self.i
-                self.pc += 2
-                result = ( "LD A,I")
-
-            elif cmd2 == 0x58:
-                port = self.bc
-                self.pc += 2
-                result = ( "IN E,(C)")
-                for io in ios:
-                    value = io.read( port)
-                    if value:
-                        self.set_e( value)
-                        # Flagbeeinflussung! (unvollständig)
-                        self.f = clr_bit( self.f, self.flag_sub)
-
-            elif cmd2 == 0x59:
-                port = self.bc
-                self.pc += 2
-                result = ( "OUT (C),E")
-                for io in ios:
-                    io.write( port, self.get_e())
-
-            elif cmd2 == 0x5a:
-                self.hl += self.de
-                if bit_is_set( self.f, self.flag_carry):
-                    self.hl += 1
-                self.hl %= 0xffff
-                self.pc += 2
-                result = ( "ADC HL,DE")
-
-            elif cmd2 == 0x5b:
-                addr = mem.read16( self.pc + 2)
-                self.set_de( mem.read16( addr))
-                self.pc += 4
-                result = ( "LD DE,(0%04Xh)" % addr)
-
-            elif cmd2 == 0x5e:
-                print( "set vectored interrupts")
-                self.set_im( 2)
-                self.pc += 2
-                result = ( "IM 2")
-
-            elif cmd2 == 0x60:
-                port = self.bc
-                self.pc += 2
-                result = ( "IN H,(C)")
-                for io in ios:
-                    value = io.read( port)
-                    if value:
-                        self.set_h( value)
-                        # Flagbeeinflussung! (unvollständig)
-                        self.f = clr_bit( self.f, self.flag_sub)
-
-            elif cmd2 == 0x61:
-                port = self.bc
-                self.pc += 2
-                result = ( "OUT (C),H")
-                for io in ios:
-                    io.write( port, self.get_h())
-
-            elif cmd2 == 0x62:
-                self.sbc16_( self.hl)
-                self.pc += 2
-                result = ( "SBC HL,HL")
-
-            elif cmd2 == 0x68:
-                port = self.bc
-                self.pc += 2
-                result = ( "IN L,(C)")
-                for io in ios:
-                    value = io.read( port)
-                    if value:
-                        self.set_l( value)
-                        # Flagbeeinflussung! (unvollständig)
-                        self.f = clr_bit( self.f, self.flag_sub)
-
-            elif cmd2 == 0x69:
-                port = self.bc
-                self.pc += 2
-                result = ( "OUT (C),L")
-                for io in ios:
-                    io.write( port, self.get_l())
-
-            elif cmd2 == 0x6a:
-                self.hl += self.hl
-                if bit_is_set( self.f, self.flag_carry):
-                    self.hl += 1
-                self.hl %= 0xffff
-                self.pc += 2
-                result = ( "ADC HL,HL")
-
-            elif cmd2 == 0x72:
-                self.sbc16_( self.sp)
-                self.pc += 2
-                result = ( "SBC HL,SP")
-
-            elif cmd2 == 0x73:
-                addr = mem.read16( self.pc + 2)
-                mem.write16( addr, self.sp)
-                self.pc += 4
-                result = ( "LD (0%04Xh), SP" % addr)
-
-            elif cmd2 == 0x78:
-                port = self.bc
-                self.pc += 2
-                result = ( "IN A,(C)")
-                for io in ios:
-                    value = io.read( port)
-                    if value:
-                        self.a = value
-                        # keine Flagbeeinflussung
-
-            elif cmd2 == 0x79:
-                port = self.bc
-                self.pc += 2
-                result = ( "OUT (C),A")
-                for io in ios:
-                    io.write( port, self.a)
-
-            elif cmd2 == 0x7a:
-                self.hl += self.sp
-                if bit_is_set( self.f, self.flag_carry):
-                    self.hl += 1
-                self.hl %= 0xffff
-                self.pc += 2
-                result = ( "ADC HL,SP")
-
-            elif cmd2 == 0x7b:
-                addr = mem.read16( self.pc + 2)
-                self.set_sp( mem.read16( addr))
-                self.pc += 4
-                result = ( "LD SP,(0%04Xh)" % addr)
-
-            elif cmd2 == 0xa1:
-                value = mem.read( self.hl)
-                self.compare( value)
-                self.hl += 1
-                self.bc -= 1
-                if self.bc == 0:
-                    self.f = clr_bit( self.f, self.flag_par)
-                else:
-                    self.f = set_bit( self.f, self.flag_par)
-                self.pc += 2
-                result = ( "CPI")
-
-            elif cmd2 == 0xa3:
-                value = mem.read( self.hl)
-                port = self.bc
-                self.hl += 1
-                self.set_b( self.dec_( self.get_b()))
-                for io in ios:
-                    io.write( port, value)
-                self.pc += 2
-                result = ( "OUTI")
-
-            elif cmd2 == 0xb0:
-                while True:
-                    mem.write( self.de, mem.read( self.hl))
-                    self.de += 1
-                    self.hl += 1
-                    self.bc -= 1
-                    if self.bc == 0:
-                        break
-                self.pc += 2
-                result = ( "LDIR")
-
-            elif cmd2 == 0xb3:
-                while True:
-                    value = mem.read( self.hl)
-                    port = self.bc
-                    self.hl += 1
-                    self.set_b( self.dec_( self.get_b()))
-                    for io in ios:
-                        io.write( port, value)
-                    if self.get_b() == 0:
-                        break
-                self.pc += 2
-                result = ( "OTIR")
+def load_generated( source):
+    # the functions of the generated source, they see the globals of this file
+    namespace = dict( globals())
+    exec( compile( source, Spec.__file__, "exec"), namespace)
+    return namespace
 
-            else:
-                self.pc += 2
-                print    ( "subcommand ED%02X not implmented!  " % cmd2)
-                result = ( "subcommand ED%02X not implmented!  " % cmd2)
-                #raise ValueError
-
-        elif cmd == 0xee:
-            value = mem.read( self.pc + 1)
-            self.xor_( value)
-            self.pc += 2
-            result = ( "XOR 0%02Xh" % value)
-
-        elif cmd == 0xef:
-            self.push_( mem, self.pc + 1)
-            self.pc = 0x28
-            result = ( "RST 28h")
-
-        elif cmd == 0xf0:
-            if bit_is_clear( self.f, self.flag_sign):
-                self.pc = self.pop_( mem)
-            else:
-                self.pc += 1
-            result = ( "RET P")
-
-        elif cmd == 0xf1:
-            self.set_af( self.pop_( mem))
-            self.pc += 1
-            result = ( "POP AF")
-
-        elif cmd == 0xf2:
-            addr = mem.read16( self.pc + 1)
-            if bit_is_clear( self.f, self.flag_sign):
-                self.pc = addr
-            else:
-                self.pc += 3
-            result = ( "JP P,0%04Xh" % addr)
-
-        elif cmd == 0xf3:
-            self.pc += 1
-            result = ( "DI")
-
-        elif cmd == 0xf4:
-            addr = mem.read16( self.pc + 1)
-            if bit_is_clear( self.f, self.flag_sign):
-                self.push_( mem, self.pc + 3)
-                self.pc = addr
-            else:
-                self.pc += 3
-            result = ( "CALL P,0%04Xh" % addr)
-
-        elif cmd == 0xf5:
-            value = self.get_af()
-            self.push_( mem, value)
-            self.pc += 1
-            result = ( "PUSH AF")
-
-        elif cmd == 0xf6:
-            value = mem.read( self.pc + 1)
-            self.or_( value)
-            self.pc += 2
-            result = ( "OR 0%02Xh" % value)
-
-        elif cmd == 0xf7:
-            self.push_( mem, self.pc + 1)
-            self.pc = 0x30
-            result = ( "RST 30h")
-
-        elif cmd == 0xf8:
-            if bit_is_set( self.f, self.flag_sign):
-                self.pc = self.pop_( mem)
-            else:
-                self.pc += 1
-            result = ( "RET M")
-
-        elif cmd == 0xf9:
-            self.set_sp( self.hl)
-            self.pc += 1
-            result = ( "LD SP, HL")
-
-        elif cmd == 0xfa:
-            addr = mem.read16( self.pc + 1)
-            if bit_is_set( self.f, self.flag_sign):
-                self.pc = addr
-            else:
-                self.pc += 3
-            result = ( "JP M,0%04Xh" % addr)
-
-        elif cmd == 0xfb:
-            self.pc += 1
-            result = ( "EI")
-
-        elif cmd == 0xfc:
-            addr = mem.read16( self.pc + 1)
-            if bit_is_set( self.f, self.flag_sign):
-                self.push_( mem, self.pc + 3)
-                self.pc = addr
-            else:
-                self.pc += 3
-            result = ( "CALL M,0%04Xh" % addr)
-
-        ###################
-        # enhanced commands
-        elif cmd == 0xfd:
-            cmd2 = mem.read( self.pc + 1)
-
-            if cmd2 == 0x09:
-                self.iy += self.bc
-                self.iy %= 0xffff
-                self.pc += 2
-                result = ( "ADD IY,BC")
-
-            elif cmd2 == 0x19:
-                self.iy += self.de
-                self.iy %= 0xffff
-                self.pc += 2
-                result = ( "ADD IY,DE")
-
-            elif cmd2 == 0x21:
-                value = mem.read16( self.pc + 2)
-                self.set_iy( value)
-                self.pc += 4
-                result = ( "LD IY, 0%04Xh" % value)
-
-            elif cmd2 == 0x22:
-                addr = mem.read16( self.pc + 2)
-                mem.write16( addr, self.iy)
-                self.pc += 4
-                result = ( "LD (0%04Xh), IY" % addr)
-
-            elif cmd2 == 0x29:
-                self.iy += self.iy
-                self.iy %= 0xffff
-                self.pc += 2
-                result = ( "ADD IY,IY")
-
-            elif cmd2 == 0x2a:
-                addr = mem.read16( self.pc + 2)
-                self.set_iy( mem.read16( addr))
-                self.pc += 4
-                result = ( "LD IY,(0%04Xh)" % addr)
-
-            elif cmd2 == 0x34:
-                offset = mem.read( self.pc + 2)
-                if offset > 127:
-                    offset -= 256 
-                value = mem.read( self.iy + offset)
-                result = self.inc_( value)
-                mem.write( self.iy + offset, result)
-                self.pc += 3
-                result = ( "INC (IY+0%02Xh)" % ( offset))
-
-            elif cmd2 == 0x36:
-                offset = mem.read( self.pc + 2)
-                value  = mem.read( self.pc + 3)
-                if offset > 127:
-                    offset -= 256
-                mem.write( self.iy + offset, value)
-                self.pc += 4
-                result = ( "LD (IY+0%02X), %02X" % ( offset, value))
-
-            elif cmd2 == 0x39:
-                self.iy += self.sp
-                self.iy %= 0xffff
-                self.pc += 2
-                result = ( "ADD IY,SP")
-
-            elif cmd2 == 0x46:
-                offset = mem.read( self.pc + 2)
-                if offset > 127:
-                    offset -= 256
-                value = mem.read( self.iy + offset)
-                self.set_b( value)
-                self.pc += 3
-                result = ( "LD B, (IY+0%02Xh)" % ( offset))
-
-            elif cmd2 == 0x4e:
-                offset = mem.read( self.pc + 2)
-                if offset > 127:
-                    offset -= 256
-                value = mem.read( self.iy + offset)
-                self.set_c( value)
-                self.pc += 3
-                result = ( "LD C, (IY+0%02Xh)" % ( offset))
-
-            elif cmd2 == 0x56:
-                offset = mem.read( self.pc + 2)
-                if offset > 127:
-                    offset -= 256
-                value = mem.read( self.iy + offset)
-                self.set_d( value)
-                self.pc += 3
-                result = ( "LD D, (IY+0%02Xh)" % ( offset))
-
-            elif cmd2 == 0x5e:
-                offset = mem.read( self.pc + 2)
-                if offset > 127:
-                    offset -= 256
-                value = mem.read( self.iy + offset)
-                self.set_e( value)
-                self.pc += 3
-                result = ( "LD E, (IY+0%02Xh)" % ( offset))
-
-            elif cmd2 == 0x66:
-                offset = mem.read( self.pc + 2)
-                if offset > 127:
-                    offset -= 256
-                value = mem.read( self.iy + offset)
-                self.set_h( value)
-                self.pc += 3
-                result = ( "LD H, (IY+0%02Xh)" % ( offset))
-
-            elif cmd2 == 0x6e:
-                offset = mem.read( self.pc + 2)
-                if offset > 127:
-                    offset -= 256
-                value = mem.read( self.iy + offset)
-                self.set_l( value)
-                self.pc += 3
-                result = ( "LD L, (IY+0%02Xh)" % ( offset))
-
-            elif cmd2 == 0x75:
-                value = mem.read( self.pc + 2)
-                if value > 127:
-                    value -= 256
-                mem.write( self.iy + value, lo( self.hl))
-                self.pc += 3
-                result = ( "LD (IY+0%02Xh), L" % value)
-
-            elif cmd2 == 0x7e:
-                offset = mem.read( self.pc + 2)
-                if offset > 127:
-                    offset -= 256
-                value = mem.read( self.iy + offset)
-                self.a = value
-                self.pc += 3
-                result = ( "LD A, (IY+0%02Xh)" % ( offset))
-
-            elif cmd2 == 0x84:
-                self.add_( hi( self.iy))
-                self.pc += 2
-                result = ( "ADD A,IYH")
-
-            elif cmd2 == 0x85:
-                self.add_( lo( self.iy))
-                self.pc += 2
-                result = ( "ADD A,IYL")
-
-            elif cmd2 == 0x86:
-                offset = mem.read( self.pc + 2)
-                if offset > 127:
-                    offset -= 256 
-                value = mem.read( self.iy + offset)
-                self.add_( value)
-                self.pc += 3
-                result = ( "ADD A,(IY+0%02Xh)" % offset)
-
-            elif cmd2 == 0x8c:
-                self.adc_( hi( self.iy))
-                self.pc += 2
-                result = ( "ADC A,IYH")
-
-            elif cmd2 == 0x8d:
-                self.adc_( lo( self.iy))
-                self.pc += 2
-                result = ( "ADC A,IYL")
-
-            elif cmd2 == 0x8e:
-                offset = mem.read( self.pc + 2)
-                if offset > 127:
-                    offset -= 256 
-                value = mem.read( self.ix + offset)
-                self.adc_( value)
-                self.pc += 3
-                result = ( "ADC A,(IY+0%02Xh)" % offset)
-
-            elif cmd2 == 0x94:
-                self.sub_( hi( self.iy))
-                self.pc += 2
-                result = ( "SUB A,IYH")
-
-            elif cmd2 == 0x95:
-                self.sub_( lo( self.iy))
-                self.pc += 2
-                result = ( "SUB A,IYL")
-
-            elif cmd2 == 0x96:
-                offset = mem.read( self.pc + 2)
-                if offset > 127:
-                    offset -= 256 
-                value = mem.read( self.iy + offset)
-                self.sub_( value)
-                self.pc += 3
-                result = ( "SUB A,(IY+0%02Xh)" % offset)
-
-            elif cmd2 == 0x9c:
-                self.sbc_( hi( self.iy))
-                self.pc += 2
-                result = ( "SBC A,IYH")
-
-            elif cmd2 == 0x9d:
-                self.sbc_( lo( self.iy))
-                self.pc += 2
-                result = ( "SBC A,IYL")
-
-            elif cmd2 == 0x9e:
-                offset = mem.read( self.pc + 2)
-                if offset > 127:
-                    offset -= 256 
-                value = mem.read( self.iy + offset)
-                self.sbc_( value)
-                self.pc += 3
-                result = ( "SBC A,(IY+0%02Xh)" % offset)
-
-            elif cmd2 == 0xa4:
-                self.and_( hi( self.iy))
-                self.pc += 2
-                result = ( "AND A,IYH")
-
-            elif cmd2 == 0xa5:
-                self.and_( lo( self.iy))
-                self.pc += 2
-                result = ( "AND A,IYL")
-
-            elif cmd2 == 0xa6:
-                offset = mem.read( self.pc + 2)
-                if offset > 127:
-                    offset -= 256 
-                value = mem.read( self.iy + offset)
-                self.and_( value)
-                self.pc += 3
-                result = ( "AND A,(IY+0%02Xh)" % offset)
-
-            elif cmd2 == 0xac:
-                self.xor_( hi( self.iy))
-                self.pc += 2
-                result = ( "XOR A,IYH")
-
-            elif cmd2 == 0xad:
-                self.xor_( lo( self.iy))
-                self.pc += 2
-                result = ( "XOR A,IYL")
-
-            elif cmd2 == 0xae:
-                offset = mem.read( self.pc + 2)
-                if offset > 127:
-                    offset -= 256 
-                value = mem.read( self.iy + offset)
-                self.xor_( value)
-                self.pc += 3
-                result = ( "XOR A,(IY+0%02Xh)" % offset)
-
-            elif cmd2 == 0xb4:
-                self.or_( hi( self.iy))
-                self.pc += 2
-                result = ( "OR A,IYH")
-
-            elif cmd2 == 0xb5:
-                self.or_( lo( self.iy))
-                self.pc += 2
-                result = ( "OR A,IYL")
-
-            elif cmd2 == 0xb6:
-                offset = mem.read( self.pc + 2)
-                if offset > 127:
-                    offset -= 256 
-                value = mem.read( self.iy + offset)
-                self.or_( value)
-                self.pc += 3
-                result = ( "OR A,(IY+0%02Xh)" % offset)
-
-            elif cmd2 == 0xbc:
-                self.compare( hi( self.iy))
-                self.pc += 2
-                result = ( "CP A,IYH")
-
-            elif cmd2 == 0xbd:
-                self.compare( lo( self.iy))
-                self.pc += 2
-                result = ( "CP A,IYL")
-
-            elif cmd2 == 0xbe:
-                offset = mem.read( self.pc + 2)
-                if offset > 127:
-                    offset -= 256 
-                value = mem.read( self.iy + offset)
-                self.compare( value)
-                self.pc += 3
-                result = ( "CP A,(IY+0%02Xh)" % offset)
-
-
-            elif cmd2 == 0xcb:
-                offset = mem.read( self.pc + 2)
-                cmd4   = mem.read( self.pc + 3)
-                if offset > 127:
-                    offset -= 256 
-
-                if cmd4 == 0x46:
-                    value = mem.read( self.iy + offset)
-                    self.bit_( value, 0)
-                    self.pc += 4
-                    result = ( "BIT 0,(IY%+i)" % offset)
-
-                elif cmd4 == 0x4e:
-                    value = mem.read( self.iy + offset)
-                    self.bit_( value, 1)
-                    self.pc += 4
-                    result = ( "BIT 1,(IY%+i)" % offset)
-
-                elif cmd4 == 0x56:
-                    value = mem.read( self.iy + offset)
-                    self.bit_( value, 2)
-                    self.pc += 4
-                    result = ( "BIT 2,(IY%+i)" % offset)
-
-                elif cmd4 == 0x5e:
-                    value = mem.read( self.iy + offset)
-                    self.bit_( value, 3)
-                    self.pc += 4
-                    result = ( "BIT 3,(IY%+i)" % offset)
-
-                elif cmd4 == 0x66:
-                    value = mem.read( self.iy + offset)
-                    self.bit_( value, 4)
-                    self.pc += 4
-                    result = ( "BIT 4,(IY%+i)" % offset)
-
-                elif cmd4 == 0x6e:
-                    value = mem.read( self.iy + offset)
-                    self.bit_( value, 5)
-                    self.pc += 4
-                    result = ( "BIT 5,(IY%+i)" % offset)
-
-                elif cmd4 == 0x76:
-                    value = mem.read( self.iy + offset)
-                    self.bit_( value, 6)
-                    self.pc += 4
-                    result = ( "BIT 6,(IY%+i)" % offset)
-
-                elif cmd4 == 0x7e:
-                    value = mem.read( self.iy + offset)
-                    self.bit_( value, 7)
-                    self.pc += 4
-                    result = ( "BIT 7,(IY%+i)" % offset)
-
-                elif cmd4 == 0x86:
-                    value = mem.read( self.iy + offset)
-                    result = clr_bit( value, 0)
-                    mem.write( self.iy + offset, result)
-                    self.pc += 4
-                    result = ( "RES 0,(IY%+i)" % offset)
-
-                elif cmd4 == 0x8e:
-                    value = mem.read( self.iy + offset)
-                    result = clr_bit( value, 1)
-                    mem.write( self.iy + offset, result)
-                    self.pc += 4
-                    result = ( "RES 1,(IY%+i)" % offset)
-
-                elif cmd4 == 0x96:
-                    value = mem.read( self.iy + offset)
-                    result = clr_bit( value, 2)
-                    mem.write( self.iy + offset, result)
-                    self.pc += 4
-                    result = ( "RES 2,(IY%+i)" % offset)
-
-                elif cmd4 == 0x9e:
-                    value = mem.read( self.iy + offset)
-                    result = clr_bit( value, 3)
-                    mem.write( self.iy + offset, result)
-                    self.pc += 4
-                    result = ( "RES 3,(IY%+i)" % offset)
-
-                elif cmd4 == 0xa6:
-                    value = mem.read( self.iy + offset)
-                    result = clr_bit( value, 4)
-                    mem.write( self.iy + offset, result)
-                    self.pc += 4
-                    result = ( "RES 4,(IY%+i)" % offset)
-
-                elif cmd4 == 0xae:
-                    value = mem.read( self.iy + offset)
-                    result = clr_bit( value, 5)
-                    mem.write( self.iy + offset, result)
-                    self.pc += 4
-                    result = ( "RES 5,(IY%+i)" % offset)
-
-                elif cmd4 == 0xb6:
-                    value = mem.read( self.iy + offset)
-                    result = clr_bit( value, 6)
-                    mem.write( self.iy + offset, result)
-                    self.pc += 4
-                    result = ( "RES 6,(IY%+i)" % offset)
-
-                elif cmd4 == 0xbe:
-                    value = mem.read( self.iy + offset)
-                    result = clr_bit( value, 7)
-                    mem.write( self.iy + offset, result)
-                    self.pc += 4
-                    result = ( "RES 7,(IY%+i)" % offset)
-
-                elif cmd4 == 0xc6:
-                    value = mem.read( self.iy + offset)
-                    result = set_bit( value, 0)
-                    mem.write( self.iy + offset, result)
-                    self.pc += 4
-                    result = ( "SET 0,(IY%+i)" % offset)
-
-                elif cmd4 == 0xce:
-                    value = mem.read( self.iy + offset)
-                    result = set_bit( value, 1)
-                    mem.write( self.iy + offset, result)
-                    self.pc += 4
-                    result = ( "SET 1,(IY%+i)" % offset)
-
-                elif cmd4 == 0xd6:
-                    value = mem.read( self.iy + offset)
-                    result = set_bit( value, 2)
-                    mem.write( self.iy + offset, result)
-                    self.pc += 4
-                    result = ( "SET 2,(IY%+i)" % offset)
-
-                elif cmd4 == 0xde:
-                    value = mem.read( self.iy + offset)
-                    result = set_bit( value, 3)
-                    mem.write( self.iy + offset, result)
-                    self.pc += 4
-                    result = ( "SET 3,(IY%+i)" % offset)
-
-                elif cmd4 == 0xe6:
-                    value = mem.read( self.iy + offset)
-                    result = set_bit( value, 4)
-                    mem.write( self.iy + offset, result)
-                    self.pc += 4
-                    result = ( "SET 4,(IY%+i)" % offset)
-
-                elif cmd4 == 0xee:
-                    value = mem.read( self.iy + offset)
-                    result = set_bit( value, 5)
-                    mem.write( self.iy + offset, result)
-                    self.pc += 4
-                    result = ( "SET 5,(IY%+i)" % offset)
-
-                elif cmd4 == 0xf6:
-                    value = mem.read( self.iy + offset)
-                    result = set_bit( value, 6)
-                    mem.write( self.iy + offset, result)
-                    self.pc += 4
-                    result = ( "SET 6,(IY%+i)" % offset)
-
-                elif cmd4 == 0xfe:
-                    value = mem.read( self.iy + offset)
-                    result = set_bit( value, 7)
-                    mem.write( self.iy + offset, result)
-                    self.pc += 4
-                    result = ( "SET 7,(IY%+i)" % offset)
+generated = load_generated( spec_source( main_spec) + "\n" + index_source( dd_spec))
+for name, handler in generated.items():
+    if name.startswith( "op_"):
+        setattr( Register, name, handler)
 
-                else:
-                    self.pc += 4
-                    print    ( "subcommand FDCB%02X%02X not implmented!  " % ( offset, cmd3))
-                    result = ( "subcommand FDCB%02X%02X not implmented!  " % ( offset, cmd3))
 
 
-            elif cmd2 == 0xe1:
-                self.iy = self.pop_( mem)
-                self.pc += 2
-                result = ( "POP IY")
+##############################
+# rotate and shift
+#
+# CB 00..3F and the (IX+d)/(IY+d) forms of DDCB/FDCB, one handler per
+# operation and register field. Result and flags come from
+# shift_result and shift_flags in Flags.py.
+
+# register pair of B C D E H L
+reg_pairs   = ( "bc", "bc", "de", "de", "hl", "hl")
+
+def shift_handler( cmd):
+    base = ( cmd & 0x38) << 6
+    source = cmd & 0x07
+
+    if source == 6:
+        def handler( self, mem, ios):
+            index = base | ( ( self.f & mask_carry) << 8) | mem.read( self.hl)
+            mem.write( self.hl, shift_result[ index])
+            self.f = shift_flags[ index]
+            self.pc = ( self.pc + 2) & 0xffff
+    elif source == 7:
+        def handler( self, mem, ios):
+            index = base | ( ( self.f & mask_carry) << 8) | self.a
+            self.a = shift_result[ index]
+            self.f = shift_flags[ index]
+            self.pc = ( self.pc + 2) & 0xffff
+    elif source & 1:
+        pair = reg_pairs[ source]
+        def handler( self, mem, ios):
+            value = getattr( self, pair)
+            index = base | ( ( self.f & mask_carry) << 8) | ( value & 0xff)
+            setattr( self, pair, ( value & 0xff00) | shift_result[ index])
+            self.f = shift_flags[ index]
+            self.pc = ( self.pc + 2) & 0xffff
+    else:
+        pair = reg_pairs[ source]
+        def handler( self, mem, ios):
+            value = getattr( self, pair)
+            index = base | ( ( self.f & mask_carry) << 8) | ( value >> 8)
+            setattr( self, pair, ( shift_result[ index] << 8) | ( value & 0xff))
+            self.f = shift_flags[ index]
+            self.pc = ( self.pc + 2) & 0xffff
+    return handler
+
+def index_shift_handler( cmd, register):
+    # DDCB/FDCB, the displacement comes as argument
+    base = ( cmd & 0x38) << 6
+
+    def handler( self, mem, ios, offset):
+        address = ( getattr( self, register) + offset) & 0xffff
+        index = base | ( ( self.f & mask_carry) << 8) | mem.read( address)
+        mem.write( address, shift_result[ index])
+        self.f = shift_flags[ index]
+        self.pc = ( self.pc + 4) & 0xffff
+    return handler
+
+def build_shift_handlers():
+    handlers = {}
+    for cmd in range( 0x40):
+        handlers[ "op_cb_%02x" % cmd] = shift_handler( cmd)
+    for cmd in range( 0x06, 0x40, 8):
+        handlers[ "op_ddcb_%02x" % cmd] = index_shift_handler( cmd, "ix")
+        handlers[ "op_fdcb_%02x" % cmd] = index_shift_handler( cmd, "iy")
+    for name, handler in handlers.items():
+        handler.__name__ = name
+    return handlers
+
+for name, handler in build_shift_handlers().items():
+    setattr( Register, name, handler)
 
-            elif cmd2 == 0xe5:
-                self.push_( mem, self.iy)
-                self.pc += 2
-                result = ( "PUSH IY")
 
-            elif cmd2 == 0xe9:
-                addr = mem.read16( self.iy)
-                self.pc = addr
-                result = ( "JP (IY)")
 
-            elif cmd2 == 0xf9:
-                self.set_sp( self.iy)
-                self.pc += 2
-                result = ( "LD SP, IY")
+##############################
+# index registers
+#
+# The handlers of the DD and FD pages are written once, register is the
+# name of the index register they work on:
+#   the commands with semantics in Spec.py are generated, see above,
+#   the ones on HL as a whole and BIT, RES and SET of DDCB/FDCB are
+#   below,
+#   the others do not touch HL, the prefix only costs time, they run
+#   the unprefixed handler one byte further.
+# HALT and the prefixes are unknown, DD CB runs the DDCB page.
+
+index_skip = frozenset( ( 0x76, 0xcb, 0xdd, 0xed, 0xfd))
+
+def index_pair_handlers( register):
+    # IX or IY as a whole, HL in the unprefixed commands
+    def add_handler( pair):
+        def handler( self, mem, ios):
+            setattr( self, register, self.add16_( getattr( self, register), getattr( self, pair)))
+            self.pc = ( self.pc + 2) & 0xffff
+        return handler
+
+    def op_21( self, mem, ios):
+        setattr( self, register, mem.read16( self.pc + 2))
+        self.pc = ( self.pc + 4) & 0xffff
+
+    def op_22( self, mem, ios):
+        addr = mem.read16( self.pc + 2)
+        mem.write16( addr, getattr( self, register))
+        self.pc = ( self.pc + 4) & 0xffff
+
+    def op_23( self, mem, ios):
+        setattr( self, register, ( getattr( self, register) + 1) & 0xffff)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_2a( self, mem, ios):
+        addr = mem.read16( self.pc + 2)
+        setattr( self, register, mem.read16( addr))
+        self.pc = ( self.pc + 4) & 0xffff
+
+    def op_2b( self, mem, ios):
+        setattr( self, register, ( getattr( self, register) - 1) & 0xffff)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_e1( self, mem, ios):
+        setattr( self, register, self.pop_( mem))
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_e3( self, mem, ios):
+        value = mem.read16( self.sp)
+        mem.write16( self.sp, getattr( self, register))
+        setattr( self, register, value)
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_e5( self, mem, ios):
+        self.push_( mem, getattr( self, register))
+        self.pc = ( self.pc + 2) & 0xffff
+
+    def op_e9( self, mem, ios):
+        self.pc = getattr( self, register)
+
+    def op_f9( self, mem, ios):
+        self.set_sp( getattr( self, register))
+        self.pc = ( self.pc + 2) & 0xffff
+
+    return { 0x09: add_handler( "bc"), 0x19: add_handler( "de"), 0x29: add_handler( register), 0x39: add_handler( "sp"),
+             0x21: op_21, 0x22: op_22, 0x23: op_23, 0x2a: op_2a, 0x2b: op_2b,
+             0xe1: op_e1, 0xe3: op_e3, 0xe5: op_e5, 0xe9: op_e9, 0xf9: op_f9}
+
+def index_prefix_handler( handler):
+    # the unprefixed handler behind the prefix
+    def prefixed( self, mem, ios):
+        self.pc = ( self.pc + 1) & 0xffff
+        handler( self, mem, ios)
+    return prefixed
+
+def index_bit_handler( cmd, register):
+    # DDCB/FDCB BIT, RES and SET, the displacement comes as argument
+    bit = ( cmd >> 3) & 0x07
+    if cmd < 0x80:
+        def handler( self, mem, ios, offset):
+            self.bit_( mem.read( ( getattr( self, register) + offset) & 0xffff), bit)
+            self.pc = ( self.pc + 4) & 0xffff
+        return handler
+
+    change = clr_bit if cmd < 0xc0 else set_bit
+    def handler( self, mem, ios, offset):
+        address = ( getattr( self, register) + offset) & 0xffff
+        mem.write( address, change( mem.read( address), bit))
+        self.pc = ( self.pc + 4) & 0xffff
+    return handler
+
+def build_index_handlers( register):
+    # opcode -> handler of the DD/FD page and of the DDCB/FDCB page
+    handlers = {}
+    for code in range( 256):
+        name = "op_%02x" % code
+        if code not in index_skip and hasattr( Register, name):
+            handlers[ code] = index_prefix_handler( getattr( Register, name))
+    handlers.update( generated[ "index_handlers"]( register))
+    handlers.update( index_pair_handlers( register))
+    cb_handlers = { cmd: index_bit_handler( cmd, register) for cmd in range( 0x46, 0x100, 8)}
+    return handlers, cb_handlers
+
+for prefix, register in ( ( "dd", "ix"), ( "fd", "iy")):
+    for page, handlers in zip( ( prefix, prefix + "cb"), build_index_handlers( register)):
+        for code, handler in handlers.items():
+            handler.__name__ = "op_%s_%02x" % ( page, code)
+            setattr( Register, handler.__name__, handler)
+    setattr( Register, "op_%s_cb" % prefix, Register.op_index_cb)
 
-            else:
-                self.pc += 2
-                print    ( "subcommand DD%02X not implmented!  " % cmd2)
-                result = ( "subcommand DD%02X not implmented!  " % cmd2)
-                #raise ValueError
-
-        elif cmd == 0xfe:
-            value = mem.read( self.pc + 1)
-            self.compare( value)
-            self.pc += 2
-            result = ( "CP 0%02Xh" % value)
-
-        elif cmd == 0xff:
-            self.push_( mem, self.pc + 1)
-            self.pc = 0x38
-            result = ( "RST 38h")
 
-        else:
-            self.pc += 1
-            print    ( "command %02X not implmented!  " % cmd)
-            result = ( "command %02X not implmented!  " % cmd)
-            #raise ValueError
+
+##############################
+# dispatch tables
+
+def build_table( prefix, default):
+    table = []
+    for code in range( 256):
+        table.append( getattr( Register, "op_%s%02x" % ( prefix, code), default))
+    return table
+
+Register.main_table = build_table( "",      Register.op_unknown)
+Register.cb_table   = build_table( "cb_",   Register.op_cb_unknown)
+Register.dd_table   = build_table( "dd_",   Register.op_index_unknown)
+Register.ddcb_table = build_table( "ddcb_", Register.op_index_cb_unknown)
+Register.ed_table   = build_table( "ed_",   Register.op_ed_unknown)
+Register.fd_table   = build_table( "fd_",   Register.op_index_unknown)
+Register.fdcb_table = build_table( "fdcb_", Register.op_index_cb_unknown)
+
+def build_known( prefix):
+    return bytes( [ hasattr( Register, "op_%s%02x" % ( prefix, code)) for code in range( 256)])
+
+main_known = build_known( "")
+cb_known   = build_known( "cb_")
+dd_known   = build_known( "dd_")
+ddcb_known = build_known( "ddcb_")
+ed_known   = build_known( "ed_")
+fd_known   = build_known( "fd_")
+fdcb_known = build_known( "fdcb_")
+
+
+
+
+##############################
+# trace text
+#
+# execute( trace = True) shows the command as listed in Spec.py, the
+# operands are read before it runs. An unknown command shows the note
+# its handler prints.
+
+def build_trace( spec, known, note, operands = ()):
+    # ( format, operand kinds) for each opcode
+    table = []
+    for item in spec:
+        if known[ item.code]:
+            table.append( ( item.text, item.operands))
+        else:
+            table.append( ( note % item.code, operands))
+    return table
+
+main_trace = build_trace( main_spec, main_known, "command %02X not implmented!  ")
+cb_trace   = build_trace( cb_spec,   cb_known,   "subcommand CB%02X not implmented!  ")
+dd_trace   = build_trace( dd_spec,   dd_known,   "subcommand DD%02X not implmented!  ")
+ddcb_trace = build_trace( ddcb_spec, ddcb_known, "subcommand DDCB%%02X%02X not implmented!  ", ( "d",))
+ed_trace   = build_trace( ed_spec,   ed_known,   "subcommand ED%02X not implmented!  ")
+fd_trace   = build_trace( fd_spec,   fd_known,   "subcommand FD%02X not implmented!  ")
+fdcb_trace = build_trace( fdcb_spec, fdcb_known, "subcommand FDCB%%02X%02X not implmented!  ", ( "d",))
+
+# printed along with IM
+im_notes = { "IM 0": "8080A interrupt mode", "IM 1": "all interrupts to 38h", "IM 2": "set vectored interrupts"}
+
+def trace_text( mem, pc):
+    # the command at pc as text
+    cmd = mem.read( pc)
+    position = pc + 1
+    if cmd == 0xcb or cmd == 0xed:
+        page = cb_trace if cmd == 0xcb else ed_trace
+        cmd = mem.read( position & 0xffff)
+        position += 1
+    elif cmd == 0xdd or cmd == 0xfd:
+        cmd2 = mem.read( position & 0xffff)
+        position += 1
+        if cmd2 == 0xcb:
+            # DDCB d op
+            page = ddcb_trace if cmd == 0xdd else fdcb_trace
+            cmd2 = mem.read( ( pc + 3) & 0xffff)
+        else:
+            page = dd_trace if cmd == 0xdd else fd_trace
+        cmd = cmd2
+    else:
+        page = main_trace
+    text, kinds = page[ cmd]
+
+    values = []
+    for kind in kinds:
+        value = mem.read( position & 0xffff)
+        if kind == "nn":
+            value |= mem.read( ( position + 1) & 0xffff) << 8
+            position += 1
+        elif kind != "n" and value > 127:
+            # e and d are signed
+            value -= 256
+        position += 1
+        values.append( value)
+    if page is ed_trace and text in im_notes:
+        print( im_notes[ text])
+    return text % tuple( values)
+
+
+##############################
+# instruction lengths for the decode cache
+#
+# an entry may be longer than the real instruction, it only must cover
+# every byte the handler reads, on the DD/FD page the byte behind the
+# prefix as well.
+
+main_length  = bytes( [ item.length for item in main_spec])
+ed_length    = bytes( [ item.length for item in ed_spec])
+index_length = bytes( [ max( item.length, 2) for item in dd_spec])
 
 
-        self.a  &= 0xff
-        self.bc &= 0xffff
-        self.de &= 0xffff
-        self.hl &= 0xffff
-        self.pc &= 0xffff
-        self.sp &= 0xffff
 
-        # refresh
-        self.r += 1
-        self.r = self.r % 0x7f
+##############################
+# T-states
+#
+# Conditional jumps, calls and returns are listed with the time when
+# not taken, the handler adds the rest when taken (JR/DJNZ +5, RET +6,
+# CALL +7). The block instructions add their repeats themselves.
+# The pages are in Spec.py, DDCB d op runs from the DD CB entry.
+
+main_cycles     = bytes( [ item.cycles for item in main_spec])
+cb_cycles       = bytes( [ item.cycles for item in cb_spec])
+ed_cycles       = bytes( [ item.cycles for item in ed_spec])
+index_cycles    = bytes( [ item.cycles for item in dd_spec])
+index_cb_cycles = bytes( [ item.cycles for item in ddcb_spec])
+
+
+##############################
+# operands
+#
+# Generated handlers get the immediate byte n and the displacement of
+# (IX+d) as arguments offset and n behind self, mem, ios. decode() binds
+# them as defaults of a copy of the handler, so a cached command does
+# not read them again, a write into them drops the entry.
+
+# operand layouts: n, offset, offset and n
+operand_layouts = { ( "n",): 1, ( "offset",): 2, ( "offset", "n"): 3}
+
+def build_operand_layouts():
+    # handler -> layout, for the handlers with operands
+    layouts = {}
+    for page in ( "main", "cb", "dd", "ddcb", "ed", "fd", "fdcb"):
+        for handler in getattr( Register, page + "_table"):
+            code = handler.__code__
+            if code.co_argcount > 3:
+                layouts[ handler] = operand_layouts[ code.co_varnames[ 3 : code.co_argcount]]
+    return layouts
+
+handler_layouts = build_operand_layouts()
+
+# ( handler, operands) -> copy, shared by all cpus, one copy for each
+# operand value a handler was decoded with
+bound_handlers = {}
+
+def bind_operands( handler, mem, address):
+    # the handler with its operands read from address on
+    layout = handler_layouts.get( handler)
+    if layout is None:
+        return handler
+    value = mem.read( address & 0xffff)
+    if layout == 1:
+        key = ( handler, ( value,))
+    else:
+        if value > 127:
+            value -= 256
+        if layout == 2:
+            key = ( handler, ( value,))
+        else:
+            key = ( handler, ( value, mem.read( ( address + 1) & 0xffff)))
+    bound = bound_handlers.get( key)
+    if bound is None:
+        bound = types.FunctionType( handler.__code__, handler.__globals__, handler.__name__, key[ 1], handler.__closure__)
+        bound_handlers[ key] = bound
+    return bound
+
+
+
+##############################
+# idle loops
+#
+# A short loop which jumps back to itself and neither writes memory nor
+# does output, like JR $ or IN A,(n) / AND m / JR Z,loop, can only
+# change when an event runs. Its backward jump gets a quiet handler
+# which compares the registers after two passes: when nothing changed
+# and the pass took the straight path, all whole passes up to the next
+# deadline are skipped at once, only cycles and R advance.
+# The trace handlers are not touched.
+
+idle_branches = frozenset( ( 0x18, 0x20, 0x28, 0x30, 0x38,
+                             0xc2, 0xc3, 0xca, 0xd2, 0xda, 0xe2, 0xea, 0xf2, 0xfa))
+
+# longest loop body in bytes
+idle_body = 32
+
+def build_idle_safe():
+    # unprefixed commands without memory writes, stack and output,
+    # CB has its own check in idle_loop()
+    table = bytearray( 256)
+    for code in range( 0x40, 0xc0):
+        table[ code] = not 0x70 <= code <= 0x77
+    for code in ( 0x00, 0x07, 0x0f, 0x17, 0x1f, 0x27, 0x2f, 0x37, 0x3f,
+                  0x01, 0x11, 0x21, 0x31, 0x03, 0x0b, 0x13, 0x1b, 0x23, 0x2b, 0x33, 0x3b,
+                  0x04, 0x05, 0x0c, 0x0d, 0x14, 0x15, 0x1c, 0x1d, 0x24, 0x25, 0x2c, 0x2d, 0x3c, 0x3d,
+                  0x06, 0x0e, 0x16, 0x1e, 0x26, 0x2e, 0x3e,
+                  0xc6, 0xce, 0xd6, 0xde, 0xe6, 0xee, 0xf6, 0xfe,
+                  0x08, 0xd9, 0xeb, 0x0a, 0x1a, 0x2a, 0x3a, 0xdb, 0xcb):
+        table[ code] = 1
+    # exits out of the loop
+    for code in idle_branches:
+        table[ code] = 1
+    table[ 0x18] = 0
+    table[ 0xc3] = 0
+    return bytes( a & b for a, b in zip( table, main_known))
+
+idle_safe = build_idle_safe()
+
+def idle_loop( mem, pc, cmd):
+    # ( target, T-states and commands of one pass, reads input) for
+    # the backward jump at pc, None if it does not close an idle loop
+    if cmd < 0x40:
+        offset = mem.read( ( pc + 1) & 0xffff)
+        if offset > 127:
+            offset -= 256
+        target = ( pc + 2 + offset) & 0xffff
+        # JR cc taken
+        cycles = 12
+    else:
+        target = mem.read16( ( pc + 1) & 0xffff)
+        cycles = 10
+    if not 0 <= pc - target <= idle_body:
+        return None
+
+    count = 1
+    inputs = False
+    address = target
+    while address < pc:
+        code = mem.read( address)
+        if not idle_safe[ code]:
+            return None
+        if code == 0xcb:
+            code2 = mem.read( ( address + 1) & 0xffff)
+            if not cb_known[ code2] or ( code2 & 7 == 6 and not 0x40 <= code2 < 0x80):
+                return None
+            cycles += cb_cycles[ code2]
+        else:
+            cycles += main_cycles[ code]
+        if code == 0xdb:
+            inputs = True
+        address += main_length[ code]
+        count += 1
+    if address != pc:
+        return None
+    return target, cycles, count, inputs
+
+def idle_state( cpu):
+    # everything a pass of an idle loop could change, except R
+    return ( cpu.a, cpu.f, cpu.bc, cpu.de, cpu.hl, cpu.ix, cpu.iy, cpu.sp,
+             cpu.a_, cpu.f_, cpu.bc_, cpu.de_, cpu.hl_, cpu.i)
+
+def idle_handler( quiet, target, cycles, count, inputs):
+    # cycles, registers, volatile reads and called events after the last pass
+    last = [ None, None, None, None]
+    def idle( self, mem, ios):
+        quiet( self, mem, ios)
+        if self.pc & 0xffff != target:
+            last[ 0] = None
+            return
+        state = idle_state( self)
+        reads = None
+        if inputs:
+            reads = getattr( ios, "volatile_reads", None)
+        called = 0
+        if self.scheduler is not None:
+            called = self.scheduler.called
+        if last[ 0] == self.cycles - cycles and last[ 1] == state and last[ 2] == reads \
+           and last[ 3] == called and ( reads is not None or not inputs):
+            # nothing changes before the next deadline, without one
+            # the loop runs on pass by pass
+            if self.deadline != never:
+                skip = ( self.deadline - self.cycles) // cycles
+                if skip > 0:
+                    self.cycles += skip * cycles
+                    self.r = ( self.r & 0x80) | ( ( self.r + skip * count) & 0x7f)
+        last[ 0] = self.cycles
+        last[ 1] = state
+        last[ 2] = reads
+        last[ 3] = called
+    return idle
+
+
+
+##############################
+# delay loops
+#
+# Countdown loops which only wait, with NOPs as the only other commands:
+#   DJNZ loop
+#   loop: DEC r / JR NZ,loop
+#   loop: DEC rr / LD A,hi / OR lo / JR NZ,loop
+# (JP NZ instead of JR NZ as well). When the jump back is taken, the
+# passes still to come are known, they are done in one go up to the
+# next deadline. The last pass is interpreted, so the loop leaves as
+# usual. Nested loops profit by their inner loop.
+
+delay_branches = frozenset( ( 0x10, 0x20, 0xc2))
+
+# DEC r in opcode order: ( register, shift), ( HL) is no delay
+delay_registers = ( ( "bc", 8), ( "bc", 0), ( "de", 8), ( "de", 0),
+                    ( "hl", 8), ( "hl", 0), None, ( "a", 0))
+
+def delay_loop( mem, pc, cmd):
+    # ( target, kind, register, T-states and commands of a pass)
+    # of the countdown loop closed at pc, None for anything else
+    if cmd == 0xc2:
+        target = mem.read16( ( pc + 1) & 0xffff)
+        taken = 10
+    else:
+        offset = mem.read( ( pc + 1) & 0xffff)
+        if offset > 127:
+            offset -= 256
+        target = ( pc + 2 + offset) & 0xffff
+        taken = 13 if cmd == 0x10 else 12
+    if not 0 <= pc - target <= idle_body:
+        return None
+
+    # only one byte commands, so bytes are commands
+    body = [ mem.read( address) for address in range( target, pc)]
+    nops = body.count( 0x00)
+    rest = [ code for code in body if code != 0x00]
+    cycles = 4 * nops + taken
+    if cmd == 0x10:
+        if rest:
+            return None
+        return target, "djnz", None, cycles, nops + 1
+    if len( rest) == 1 and rest[ 0] & 0xc7 == 0x05 and delay_registers[ rest[ 0] >> 3] is not None:
+        return target, "dec8", delay_registers[ rest[ 0] >> 3], cycles + 4, nops + 2
+    if len( rest) == 3 and rest[ 0] in ( 0x0b, 0x1b, 0x2b):
+        high = ( rest[ 0] >> 4) * 2
+        low  = high + 1
+        if ( rest[ 1], rest[ 2]) in ( ( 0x78 | high, 0xb0 | low), ( 0x78 | low, 0xb0 | high)):
+            return target, "dec16", ( "bc", "de", "hl")[ rest[ 0] >> 4], cycles + 14, nops + 4
+    return None
+
+def delay_handler( quiet, target, kind, register, cycles, count):
+    def delay( self, mem, ios):
+        quiet( self, mem, ios)
+        if self.pc & 0xffff != target:
+            return
+        # the counter after this pass, not 0 as the jump was taken
+        if kind == "djnz":
+            value = self.bc >> 8
+        elif kind == "dec8":
+            value = ( getattr( self, register[ 0]) >> register[ 1]) & 0xff
+        else:
+            value = getattr( self, register)
+        # passes with the jump taken, up to the deadline
+        skip = value - 1
+        if self.deadline != never:
+            limit = ( self.deadline - self.cycles) // cycles
+            if limit < skip:
+                skip = limit
+        if skip <= 0:
+            return
+
+        value -= skip
+        if kind == "djnz":
+            self.bc = ( value << 8) | ( self.bc & 0x00ff)
+        elif kind == "dec8":
+            name, shift = register
+            setattr( self, name, ( getattr( self, name) & ~( 0xff << shift)) | ( value << shift))
+            self.f = ( self.f & mask_carry) | dec_flags[ value + 1]
+        else:
+            setattr( self, register, value)
+            self.a = ( value >> 8) | ( value & 0xff)
+            self.f = szp[ self.a]
+        self.cycles += skip * cycles
+        self.r = ( self.r & 0x80) | ( ( self.r + skip * count) & 0x7f)
+    return delay
+
 
-        return( "cmd: 0%02Xh   %-17s" % ( cmd, result))
+
+##############################
+# superinstructions
+#
+# A pair of unprefixed commands, the second directly behind the first,
+# runs in one dispatch of run(). The second command runs from its own
+# decode cache entry, if the first one fell through, nothing is due and
+# the entry is still valid. Else run() goes on with the second command
+# as usual. Cycles, R and the steps of run() are counted per command.
+
+prefixes = frozenset( ( 0xcb, 0xdd, 0xed, 0xfd))
+
+# the usual pairs of compare and countdown loops:
+# LD A,(HL) + CP n, CP n + JR Z/NZ, AND n + CP n, DEC B + JR NZ, INC HL + LD A,(HL)
+fusion_pairs = frozenset( ( ( 0x7e, 0xfe), ( 0xfe, 0x28), ( 0xfe, 0x20),
+                            ( 0xe6, 0xfe), ( 0x05, 0x20), ( 0x23, 0x7e)))
+
+def fused_handler( first, second, next_pc):
+    quiet  = second[ 1]
+    cycles = second[ 4]
+    def fused( self, mem, ios):
+        first( self, mem, ios)
+        self.r = ( self.r & 0x80) | ( ( self.r + 1) & 0x7f)
+        if self.pc != next_pc or self.cycles >= self.deadline or self.decoded.get( next_pc) is not second:
+            return 1
+        self.cycles += cycles
+        quiet( self, mem, ios)
+        self.r = ( self.r & 0x80) | ( ( self.r + 1) & 0x7f)
+        return 2
+    return fused
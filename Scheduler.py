@@ -0,0 +1,76 @@
+import heapq
+
+
+##############################
+# event scheduler
+#
+# Devices schedule callbacks at a T-state of the cpu (timer ticks, a
+# received byte, vsync, ...). Register.run() executes straight to the
+# next deadline and calls every due event there, no device is polled
+# per command.
+#
+# An event is the list [ cycle, number, callback, args], cancel() only
+# removes the callback, the entry leaves the heap when it is due.
+
+class Scheduler:
+    "events on the cycle counter of a cpu"
+
+    def __init__( self, cpu):
+        self.cpu    = cpu
+        self.queue  = []
+        self.number = 0
+        # cycle of the running event, None outside of service()
+        self.current = None
+        # number of called events
+        self.called = 0
+        cpu.scheduler = self
+
+    def time( self):
+        # an event scheduling the next one counts from its own cycle,
+        # so periodic events do not drift
+        if self.current is not None:
+            return self.current
+        return self.cpu.cycles
+
+    def at( self, cycle, callback, *args):
+        event = [ cycle, self.number, callback, args]
+        self.number += 1
+        heapq.heappush( self.queue, event)
+        # a running Register.run() stops at the new deadline
+        if cycle < self.cpu.deadline:
+            self.cpu.deadline = cycle
+        return event
+
+    def after( self, delay, callback, *args):
+        return self.at( self.time() + delay, callback, *args)
+
+    def cancel( self, event):
+        event[ 2] = None
+        event[ 3] = ()
+
+    def next_cycle( self):
+        # cycle of the next event, None if there is none
+        queue = self.queue
+        while queue and queue[ 0][ 2] is None:
+            heapq.heappop( queue)
+        if queue:
+            return queue[ 0][ 0]
+        return None
+
+    def service( self, cycle):
+        # call every event due at cycle, in order of time and scheduling
+        queue = self.queue
+        while queue and queue[ 0][ 0] <= cycle:
+            event = heapq.heappop( queue)
+            callback = event[ 2]
+            if callback is None:
+                continue
+            self.current = event[ 0]
+            self.called += 1
+            try:
+                callback( *event[ 3])
+            finally:
+                self.current = None
+
+    def __len__( self):
+        return sum( 1 for event in self.queue if event[ 2] is not None)
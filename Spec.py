@@ -0,0 +1,420 @@
+from collections import namedtuple
+
+
+##############################
+# instruction specification of the unprefixed, CB and ED pages, the DD
+# and FD pages are made from them below
+#
+# One row per command or group of commands:
+#   ( opcode, mnemonic, T-states, flags, semantics)
+#
+# The opcode is written as 8 bits, letters are fields expanded over all
+# their values:
+#   r  register B C D E H L (HL) A, bits 5 4 3
+#   s  register B C D E H L (HL) A, bits 2 1 0
+#   p  register pair BC DE HL SP
+#   q  register pair BC DE HL AF
+#   c  condition NZ Z NC C PO PE P M
+#   k  condition NZ Z NC C of JR
+#   t  restart address
+#   o  rotate or shift operation of CB
+#   b  bit number of CB
+#   i  interrupt mode of IM
+#   x  any bit
+# The first row matching an opcode wins, so HALT comes before LD r,r'.
+#
+# Operands in the mnemonic are {n} byte, {nn} word and {e} relative
+# jump, they give the length together with the opcode bytes of the
+# page. T-states are a pair when the command has
+# a (HL) form. Conditional jumps, calls and returns are listed with the
+# time when not taken, the handler adds the rest when taken.
+#
+# Flags are given in the order S Z 5 H 3 P/V N C:
+#   - unchanged, * changed, 0 reset, 1 set
+#
+# The semantics are python statements, a row without them keeps its
+# hand-written handler in Register. {r} and {s} read the register,
+# "{r} = value" writes it, a value written must be a name or in
+# brackets. n is the byte operand, also for {s} of the immediate ALU
+# commands. A command copying a register to itself only steps pc.
+
+reg_names   = ( "B", "C", "D", "E", "H", "L", "(HL)", "A")
+pair_names  = ( "BC", "DE", "HL", "SP")
+stack_names = ( "BC", "DE", "HL", "AF")
+cond_names  = ( "NZ", "Z", "NC", "C", "PO", "PE", "P", "M")
+rst_names   = ( "00h", "08h", "10h", "18h", "20h", "28h", "30h", "38h")
+shift_names = ( "RLC", "RRC", "RL", "RR", "SLA", "SRA", "SLS", "SRL")
+bit_names   = ( "0", "1", "2", "3", "4", "5", "6", "7")
+im_names    = ( "0", "0", "1", "2", "0", "0", "1", "2")
+
+field_names = { "r": reg_names, "s": reg_names, "p": pair_names, "q": stack_names,
+                "c": cond_names, "k": cond_names, "t": rst_names,
+                "o": shift_names, "b": bit_names, "i": im_names}
+
+# operand -> ( bytes, trace format), d is the displacement of (IX+d)
+operand_kinds = { "n": ( 1, "0%02Xh"), "nn": ( 2, "0%04Xh"), "e": ( 1, "%+i"), "d": ( 1, "%+04Xh")}
+
+# the prefixes count alone, CB with the command behind it
+prefix_length = { 0xcb: 2, 0xdd: 1, 0xed: 1, 0xfd: 1}
+
+# DD and FD: HL becomes IX, H and L become IXH and IXL, (HL) becomes
+# (IX+d) and there H and L stay. EX DE,HL and EXX keep HL.
+index_keep_hl = frozenset( ( 0xd9, 0xeb))
+index_names   = { "HL": "IX", "H": "IXH", "L": "IXL"}
+
+# 8 bit registers as python source, in opcode order
+reg_read  = ( "( self.bc >> 8)", "( self.bc & 0xff)", "( self.de >> 8)", "( self.de & 0xff)",
+              "( self.hl >> 8)", "( self.hl & 0xff)", "mem.read( self.hl)", "self.a")
+reg_write = ( "self.bc = ( %s << 8) | ( self.bc & 0x00ff)", "self.bc = ( self.bc & 0xff00) | %s",
+              "self.de = ( %s << 8) | ( self.de & 0x00ff)", "self.de = ( self.de & 0xff00) | %s",
+              "self.hl = ( %s << 8) | ( self.hl & 0x00ff)", "self.hl = ( self.hl & 0xff00) | %s",
+              "mem.write( self.hl, %s)", "self.a = %s")
+
+alu_add = ( "index = ( self.a << 8) | {s}",
+            "self.a = adc_result[ index]",
+            "self.f = adc_flags[ index]")
+alu_adc = ( "index = ( ( self.f & mask_carry) << 16) | ( self.a << 8) | {s}",
+            "self.a = adc_result[ index]",
+            "self.f = adc_flags[ index]")
+alu_sub = ( "index = ( self.a << 8) | {s}",
+            "self.a = sbc_result[ index]",
+            "self.f = sbc_flags[ index]")
+alu_sbc = ( "index = ( ( self.f & mask_carry) << 16) | ( self.a << 8) | {s}",
+            "self.a = sbc_result[ index]",
+            "self.f = sbc_flags[ index]")
+alu_and = ( "self.a &= {s}",
+            "self.f = and_flags[ self.a]")
+alu_xor = ( "self.a ^= {s}",
+            "self.f = szp[ self.a]")
+alu_or  = ( "self.a |= {s}",
+            "self.f = szp[ self.a]")
+alu_cp  = ( "self.f = cp_flags[ ( self.a << 8) | {s}]",)
+
+main_rows = (
+    ( "00000000", "NOP",                  4,       "--------", None),
+    ( "00pp0001", "LD {p}, {nn}",         10,      "--------", None),
+    ( "00000010", "LD (BC), A",           7,       "--------", None),
+    ( "00001010", "LD A, (BC)",           7,       "--------", None),
+    ( "00010010", "LD (DE), A",           7,       "--------", None),
+    ( "00011010", "LD A, (DE)",           7,       "--------", None),
+    ( "00100010", "LD ({nn}), HL",        16,      "--------", None),
+    ( "00101010", "LD HL, ({nn})",        16,      "--------", None),
+    ( "00110010", "LD ({nn}), A",         13,      "--------", None),
+    ( "00111010", "LD A, ({nn})",         13,      "--------", None),
+    ( "00pp0011", "INC {p}",              6,       "--------", None),
+    ( "00pp1011", "DEC {p}",              6,       "--------", None),
+    ( "00rrr100", "INC {r}",              ( 4, 11), "******0-",
+        ( "value = {r}",
+          "self.f = ( self.f & mask_carry) | inc_flags[ value]",
+          "value = ( value + 1) & 0xff",
+          "{r} = value")),
+    ( "00rrr101", "DEC {r}",              ( 4, 11), "******1-",
+        ( "value = {r}",
+          "self.f = ( self.f & mask_carry) | dec_flags[ value]",
+          "value = ( value - 1) & 0xff",
+          "{r} = value")),
+    ( "00rrr110", "LD {r}, {n}",          ( 7, 10), "--------", ( "{r} = n",)),
+    ( "00000111", "RLCA",                 4,       "--*0*-0*", None),
+    ( "00001111", "RRCA",                 4,       "--*0*-0*", None),
+    ( "00010111", "RLA",                  4,       "--*0*-0*", None),
+    ( "00011111", "RRA",                  4,       "--*0*-0*", None),
+    ( "00001000", "EX AF,AF'",            4,       "********", None),
+    ( "00pp1001", "ADD HL,{p}",           11,      "--***-0*", None),
+    ( "00010000", "DJNZ {e}",             8,       "--------", None),
+    ( "00011000", "JR {e}",               12,      "--------", None),
+    ( "001kk000", "JR {k}, {e}",          7,       "--------", None),
+    ( "00100111", "DAA",                  4,       "******-*", None),
+    ( "00101111", "CPL",                  4,       "--*1*-1-", None),
+    ( "00110111", "SCF",                  4,       "--*0*-01", None),
+    ( "00111111", "CCF",                  4,       "--***-0*", None),
+    ( "01110110", "HALT",                 4,       "--------", None),
+    ( "01rrrsss", "LD {r}, {s}",          ( 4, 7), "--------", ( "{r} = {s}",)),
+    ( "10000sss", "ADD {s}",              ( 4, 7), "******0*", alu_add),
+    ( "10001sss", "ADC {s}",              ( 4, 7), "******0*", alu_adc),
+    ( "10010sss", "SUB {s}",              ( 4, 7), "******1*", alu_sub),
+    ( "10011sss", "SBC {s}",              ( 4, 7), "******1*", alu_sbc),
+    ( "10100sss", "AND {s}",              ( 4, 7), "***1**00", alu_and),
+    ( "10101sss", "XOR {s}",              ( 4, 7), "***0**00", alu_xor),
+    ( "10110sss", "OR {s}",               ( 4, 7), "***0**00", alu_or),
+    ( "10111sss", "CP {s}",               ( 4, 7), "******1*", alu_cp),
+    ( "11ccc000", "RET {c}",              5,       "--------", None),
+    ( "11110001", "POP AF",               10,      "********", None),
+    ( "11qq0001", "POP {q}",              10,      "--------", None),
+    ( "11001001", "RET",                  10,      "--------", None),
+    ( "11011001", "EXX",                  4,       "--------", None),
+    ( "11101001", "JP (HL)",              4,       "--------", None),
+    ( "11111001", "LD SP, HL",            6,       "--------", None),
+    ( "11ccc010", "JP {c},{nn}",          10,      "--------", None),
+    ( "11000011", "JP {nn}",              10,      "--------", None),
+    ( "11001011", "CB",                   0,       "--------", None),
+    ( "11010011", "OUT ({n}),A",          11,      "--------", None),
+    ( "11011011", "IN A,({n})",           11,      "--------", None),
+    ( "11100011", "EX (SP),HL",           19,      "--------", None),
+    ( "11101011", "EX DE,HL",             4,       "--------", None),
+    ( "11110011", "DI",                   4,       "--------", None),
+    ( "11111011", "EI",                   4,       "--------", None),
+    ( "11ccc100", "CALL {c},{nn}",        10,      "--------", None),
+    ( "11qq0101", "PUSH {q}",             11,      "--------", None),
+    ( "11001101", "CALL {nn}",            17,      "--------", None),
+    ( "11011101", "DD",                   0,       "--------", None),
+    ( "11101101", "ED",                   0,       "--------", None),
+    ( "11111101", "FD",                   0,       "--------", None),
+    ( "11000110", "ADD {n}",              7,       "******0*", alu_add),
+    ( "11001110", "ADC {n}",              7,       "******0*", alu_adc),
+    ( "11010110", "SUB {n}",              7,       "******1*", alu_sub),
+    ( "11011110", "SBC {n}",              7,       "******1*", alu_sbc),
+    ( "11100110", "AND {n}",              7,       "***1**00", alu_and),
+    ( "11101110", "XOR {n}",              7,       "***0**00", alu_xor),
+    ( "11110110", "OR {n}",               7,       "***0**00", alu_or),
+    ( "11111110", "CP {n}",               7,       "******1*", alu_cp),
+    ( "11ttt111", "RST {t}",              11,      "--------", None),
+    )
+
+cb_rows = (
+    ( "00ooosss", "{o} {s}",              ( 8, 15), "***0**0*", None),
+    ( "01bbbsss", "BIT {b},{s}",          ( 8, 12), "***1**0-", None),
+    ( "10bbbsss", "RES {b},{s}",          ( 8, 15), "--------", None),
+    ( "11bbbsss", "SET {b},{s}",          ( 8, 15), "--------", None),
+    )
+
+# the undefined commands act as NOP, the repeating block commands are
+# listed with the time of the last pass
+ed_rows = (
+    ( "01110000", "IN F,(C)",             12,      "***0**0-", None),
+    ( "01rrr000", "IN {r},(C)",           12,      "***0**0-", None),
+    ( "01110001", "OUT (C),0",            12,      "--------", None),
+    ( "01rrr001", "OUT (C),{r}",          12,      "--------", None),
+    ( "01pp0010", "SBC HL,{p}",           15,      "******1*", None),
+    ( "01pp1010", "ADC HL,{p}",           15,      "******0*", None),
+    ( "01pp0011", "LD ({nn}), {p}",       20,      "--------", None),
+    ( "01pp1011", "LD {p},({nn})",        20,      "--------", None),
+    ( "01xxx100", "NEG",                  8,       "******1*", None),
+    ( "01001101", "RETI",                 14,      "--------", None),
+    ( "01xxx101", "RETN",                 14,      "--------", None),
+    ( "01iii110", "IM {i}",               8,       "--------", None),
+    ( "01000111", "LD I,A",               9,       "--------", None),
+    ( "01001111", "LD R,A",               9,       "--------", None),
+    ( "01010111", "LD A,I",               9,       "***0**0-", None),
+    ( "01011111", "LD A,R",               9,       "***0**0-", None),
+    ( "01100111", "RRD",                  18,      "***0**0-", None),
+    ( "01101111", "RLD",                  18,      "***0**0-", None),
+    ( "10100000", "LDI",                  16,      "--*0**0-", None),
+    ( "10100001", "CPI",                  16,      "******1-", None),
+    ( "10100010", "INI",                  16,      "********", None),
+    ( "10100011", "OUTI",                 16,      "********", None),
+    ( "10101000", "LDD",                  16,      "--*0**0-", None),
+    ( "10101001", "CPD",                  16,      "******1-", None),
+    ( "10101010", "IND",                  16,      "********", None),
+    ( "10101011", "OUTD",                 16,      "********", None),
+    ( "10110000", "LDIR",                 16,      "--*0**0-", None),
+    ( "10110001", "CPIR",                 16,      "******1-", None),
+    ( "10110010", "INIR",                 16,      "********", None),
+    ( "10110011", "OTIR",                 16,      "********", None),
+    ( "10111000", "LDDR",                 16,      "--*0**0-", None),
+    ( "10111001", "CPDR",                 16,      "******1-", None),
+    ( "10111010", "INDR",                 16,      "********", None),
+    ( "10111011", "OTDR",                 16,      "********", None),
+    ( "xxxxxxxx", "NOP",                  8,       "--------", None),
+    )
+
+# text: trace format of the mnemonic, operands: kinds in text order
+Instruction = namedtuple( "Instruction", "code text operands length cycles flags semantics")
+
+
+# pattern -> ( mask, value) of its fixed bits
+fixed_bits = {}
+
+def match( pattern, code):
+    # field letter -> value, None if the opcode does not match
+    bits = fixed_bits.get( pattern)
+    if bits is None:
+        mask  = int( "".join( "1" if char in "01" else "0" for char in pattern), 2)
+        value = int( "".join( char if char in "01" else "0" for char in pattern), 2)
+        bits = fixed_bits[ pattern] = ( mask, value)
+    if code & bits[ 0] != bits[ 1]:
+        return None
+    fields = {}
+    for index, char in enumerate( pattern):
+        bit = ( code >> ( 7 - index)) & 1
+        if char in "01":
+            if int( char) != bit:
+                return None
+        else:
+            fields[ char] = ( fields.get( char, 0) << 1) | bit
+    return fields
+
+def expand( row, code, fields, size, prefixes):
+    # size: opcode bytes of the page
+    pattern, mnemonic, cycles, flags, semantics = row
+    # the (HL) form takes longer
+    if isinstance( cycles, tuple):
+        cycles = cycles[ 6 in ( fields.get( "r"), fields.get( "s"))]
+
+    names = dict( ( char, field_names[ char][ value]) for char, value in fields.items() if char in field_names)
+    operands = []
+    text = mnemonic.replace( "%", "%%")
+    for kind in ( "nn", "n", "e"):
+        if "{%s}" % kind in text:
+            operands.append( kind)
+    operands.sort( key = lambda kind: text.index( "{%s}" % kind))
+    length = prefixes.get( code, size + sum( operand_kinds[ kind][ 0] for kind in operands))
+    for kind in operands:
+        names[ kind] = operand_kinds[ kind][ 1]
+    text = text.format( **names)
+
+    if semantics is not None:
+        semantics = tuple( line for line in ( statement( line, fields) for line in semantics) if line)
+    return Instruction( code, text, tuple( operands), length, cycles, flags, semantics)
+
+def statement( line, fields, read = reg_read, write = reg_write):
+    # python source of one line of the semantics, None if it is left out
+    for char in "rs":
+        if line.startswith( "{%s} = " % char):
+            value = line[ 6:]
+            if value in ( "{r}", "{s}") and fields[ char] == fields[ value[ 1]]:
+                return None
+            return write[ fields[ char]] % statement( value, fields, read, write)
+    for char, value in fields.items():
+        if char in "rs":
+            line = line.replace( "{%s}" % char, read[ value])
+    # the immediate form of the ALU commands
+    return line.replace( "{s}", "n")
+
+def find_row( rows, code):
+    # the first row matching code and its fields
+    for row in rows:
+        fields = match( row[ 0], code)
+        if fields is not None:
+            return row, fields
+    raise ValueError( "opcode %02X missing in the specification" % code)
+
+def build_spec( rows, size = 1, prefixes = {}):
+    spec = []
+    for code in range( 256):
+        row, fields = find_row( rows, code)
+        spec.append( expand( row, code, fields, size, prefixes))
+    return spec
+
+main_spec = build_spec( main_rows, 1, prefix_length)
+cb_spec   = build_spec( cb_rows, 2)
+ed_spec   = build_spec( ed_rows, 2)
+
+
+##############################
+# DD and FD pages
+#
+# Made from the unprefixed page, see index_names. (HL) becomes (IX+d),
+# the displacement d follows the opcode. The prefix takes 4 T-states,
+# reading and adding d another 8, LD (IX+d),n reads n meanwhile.
+# DDCB/FDCB d op: every command works on (IX+d), 8 T-states more than
+# on (HL), besides BIT the undocumented ones copy the result into the
+# register.
+#
+# The semantics are those of the unprefixed page, one source for IX and
+# IY: the handlers get the name of the index register as register and
+# the displacement as offset.
+
+index_read  = { 4: "( getattr( self, register) >> 8)", 5: "( getattr( self, register) & 0xff)",
+                6: "mem.read( ( getattr( self, register) + offset) & 0xffff)"}
+index_write = { 4: "setattr( self, register, ( %s << 8) | ( getattr( self, register) & 0x00ff))",
+                5: "setattr( self, register, ( getattr( self, register) & 0xff00) | %s)",
+                6: "mem.write( ( getattr( self, register) + offset) & 0xffff, %s)"}
+
+def rename_words( text, names):
+    # the words of text found in names replaced
+    parts = []
+    word = ""
+    for char in text + " ":
+        if char.isalnum():
+            word += char
+        else:
+            parts.append( names.get( word, word) + char)
+            word = ""
+    return "".join( parts)[ : -1]
+
+def index_semantics( semantics, fields):
+    # (HL) becomes (IX+d) and H and L stay, else H and L become IXH and IXL
+    read  = list( reg_read)
+    write = list( reg_write)
+    for index in ( 6,) if 6 in ( fields.get( "r"), fields.get( "s")) else ( 4, 5):
+        read[ index]  = index_read[ index]
+        write[ index] = index_write[ index]
+    return tuple( line for line in ( statement( line, fields, read, write) for line in semantics) if line)
+
+def index_instruction( item, register):
+    code = item.code
+    text = item.text
+    row, fields = find_row( main_rows, code)
+    semantics = row[ 4]
+    if semantics is not None:
+        semantics = index_semantics( semantics, fields)
+    # JP (HL) jumps to HL, it does not read memory
+    memory = "(HL)" in text and code != 0xe9
+    if code == 0xcb:
+        # DDCB is on its own page, d comes before the opcode
+        return Instruction( code, "CB", (), 4, 0, item.flags, None)
+    if code in prefix_length:
+        # a prefix ends the one before, that is a NOP then
+        return Instruction( code, "NOP", (), 1, 4, "--------", None)
+    if memory:
+        text = text.replace( "(HL)", "(%s%s)" % ( register, operand_kinds[ "d"][ 1]))
+        cycles = item.cycles + ( 9 if "n" in item.operands else 12)
+        return Instruction( code, text, ( "d",) + item.operands, item.length + 2, cycles, item.flags, semantics)
+    if code not in index_keep_hl:
+        text = rename_words( text, index_names)
+        text = text.replace( "IX", register)
+    return Instruction( code, text, item.operands, item.length + 1, item.cycles + 4, item.flags, semantics)
+
+def build_index_spec( register):
+    return [ index_instruction( item, register) for item in main_spec]
+
+def build_index_cb_spec( register):
+    spec = []
+    for item in cb_spec:
+        memory = cb_spec[ ( item.code & 0xf8) | 6]
+        text = memory.text.replace( "(HL)", "(%s%s)" % ( register, operand_kinds[ "d"][ 1]))
+        if item.code & 0x07 != 6 and item.code & 0xc0 != 0x40:
+            text += "," + reg_names[ item.code & 0x07]
+        spec.append( Instruction( item.code, text, ( "d",), 4, memory.cycles + 8, memory.flags, None))
+    return spec
+
+dd_spec   = build_index_spec( "IX")
+fd_spec   = build_index_spec( "IY")
+ddcb_spec = build_index_cb_spec( "IX")
+fdcb_spec = build_index_cb_spec( "IY")
+
+
+
+##############################
+# handler generator
+#
+# Source of a Register handler, in the form of the hand-written ones.
+# The immediate byte and the displacement are arguments, Register.decode()
+# reads them once. The trace text is the mnemonic, Register.execute()
+# formats it.
+
+# operand -> argument of the handler
+operand_args = { "d": "offset", "n": "n"}
+
+def handler_source( instruction):
+    args = "".join( ", " + operand_args[ kind] for kind in instruction.operands if kind in operand_args)
+    lines = [ "def op_%02x( self, mem, ios%s):" % ( instruction.code, args)]
+    for line in instruction.semantics:
+        lines.append( "    " + line)
+    lines.append( "    self.pc = ( self.pc + %d) & 0xffff" % instruction.length)
+    return "\n".join( lines) + "\n"
+
+def spec_source( spec):
+    # all handlers with semantics
+    return "\n".join( handler_source( item) for item in spec if item.semantics is not None)
+
+def index_source( spec):
+    # index_handlers( register) of the DD or FD page, register is "ix" or
+    # "iy", it returns the handlers with semantics by opcode
+    lines = [ "def index_handlers( register):", "    handlers = {}"]
+    for item in spec:
+        if item.semantics is not None:
+            lines += [ "    " + line for line in handler_source( item).splitlines()]
+            lines.append( "    handlers[ 0x%02x] = op_%02x" % ( item.code, item.code))
+    lines.append( "    return handlers")
+    return "\n".join( lines) + "\n"
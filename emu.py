@@ -1,14 +1,28 @@
 #! /usr/bin/env python3
 
+import random
+import tempfile
+import time
+
 from Memory import Memory
-from Register import Register
+from BankedMemory import BankedMemory, BankSelect
+from Register import Register, main_known, cb_known, ed_known, dd_known, fd_known
+from Spec import main_spec, cb_spec, ed_spec, dd_spec, fd_spec
+from Flags import mask_zero, mask_par
 from IOtest         import IOtest
+from IOBus          import IOBus
+from Compiler       import BlockCompiler
+from Scheduler      import Scheduler
+from Disassembler   import Disassembler
+from Analyzer       import Analyzer
+from Recorder       import FlightRecorder
 
 # globals
 mem = Memory()
 cpu = Register()
 iotest = IOtest( address = 0x20, value = 0x55, verbose = True)
-ios = [ iotest]
+ios = IOBus()
+ios.register( iotest)
 
 def test( test_index, verbose = True):
     # init regs
@@ -18,15 +32,17 @@ def test( test_index, verbose = True):
     if verbose:
         cpu.print()
 
-    steps = 0
-    while True:
-        steps += 1
-        result = cpu.execute( mem, ios)
-        if verbose:
+    if verbose:
+        steps = 0
+        while True:
+            steps += 1
+            result = cpu.execute( mem, ios)
             print( result, end = '')
             cpu.print_one()
-        if cpu.pc == 0:
-            break
+            if cpu.pc == 0:
+                break
+    else:
+        steps = cpu.run( mem, ios, stop_pc = [ 0]).steps
     result = cpu.bc >> 8
     if cpu.pc == 0:
         print( "program finish after %d steps!, test value: %02X  result: %d" % ( steps, test_index, result))
@@ -46,15 +62,17 @@ def test_xx( test_index, verbose, prebyte):
     mem.write( 0, prebyte)
     mem.write( 1, test_index)
 
-    steps = 0
-    while True: 
-        steps += 1
-        result = cpu.execute( mem, ios)
-        if verbose:
+    if verbose:
+        steps = 0
+        while True:
+            steps += 1
+            result = cpu.execute( mem, ios)
             print( result, end = '')
             cpu.print_one()
-        if cpu.pc == 0:
-            break
+            if cpu.pc == 0:
+                break
+    else:
+        steps = cpu.run( mem, ios, stop_pc = [ 0]).steps
     result = cpu.bc >> 8
     print( "program finish after %d steps!, test value: %02X%02X  result: %d" % ( steps, prebyte, test_index, result))
 
@@ -72,20 +90,642 @@ def test_xxCB( test_index, verbose, prebyte):
     mem.write( 1, 0xcb)
     mem.write( 2, test_index)
 
-    steps = 0
-    while True: 
-        steps += 1
-        result = cpu.execute( mem, ios)
-        if verbose:
+    if verbose:
+        steps = 0
+        while True:
+            steps += 1
+            result = cpu.execute( mem, ios)
             print( result, end = '')
             cpu.print_one()
-        if cpu.pc == 0:
-            break
+            if cpu.pc == 0:
+                break
+    else:
+        steps = cpu.run( mem, ios, stop_pc = [ 0]).steps
     result = cpu.bc >> 8
     print( "program finish after %d steps!, test value: %02XCB%02X  result: %d" % ( steps, prebyte, test_index, result))
 
 
 
+def test_compiler( test_index, max_steps = 100000):
+    # run compiled blocks and the interpreter side by side
+    # and compare the registers after each block
+    compiler = BlockCompiler()
+    compiled    = Register()
+    interpreted = Register()
+    mem_compiled    = Memory()
+    mem_interpreted = Memory()
+    mem_compiled.load( 'binary.bin', org)
+    mem_interpreted.load( 'binary.bin', org)
+    for cpu_ in ( compiled, interpreted):
+        cpu_.set_hl( test_index)
+        cpu_.set_pc( org)
+        cpu_.set_sp( 0xfffe)
+
+    steps = 0
+    while steps < max_steps:
+        count = compiler.step( compiled, mem_compiled, ios)
+        for index in range( count):
+            interpreted.execute( mem_interpreted, ios)
+        steps += count
+        if compiled.get_state() != interpreted.get_state() or compiled.cycles != interpreted.cycles or mem_compiled.mem != mem_interpreted.mem:
+            print( "difference after %d steps, test value: %02X" % ( steps, test_index))
+            compiled.print_one()
+            interpreted.print_one()
+            return False
+        if compiled.pc == 0:
+            break
+    print( "compiler ok after %d steps, test value: %02X" % ( steps, test_index))
+    return True
+
+
+def test_fusion( test_index, chunk = 7):
+    # fused pairs of the profile against single commands, run() in
+    # chunks of steps so a pair is split at the end of a chunk as well
+    profiled = Register()
+    mem_profile = Memory()
+    mem_profile.load( 'binary.bin', org)
+    profiled.set_pc( org)
+    profiled.fuse( profiled.profile_pairs( mem_profile, ios, 2000))
+
+    fused  = Register()
+    single = Register()
+    fused.fusion  = profiled.fusion
+    single.fusion = frozenset()
+    mem_fused  = Memory()
+    mem_single = Memory()
+    mem_fused.load( 'binary.bin', org)
+    mem_single.load( 'binary.bin', org)
+    for cpu_ in ( fused, single):
+        cpu_.set_hl( test_index)
+        cpu_.set_pc( org)
+        cpu_.set_sp( 0xfffe)
+
+    steps = 0
+    while True:
+        result_fused  = fused.run( mem_fused, ios, chunk, stop_pc = [ 0])
+        result_single = single.run( mem_single, ios, chunk, stop_pc = [ 0])
+        steps += result_fused.steps
+        if result_fused != result_single or fused.get_state() != single.get_state():
+            print( "difference after %d steps, test value: %02X" % ( steps, test_index))
+            fused.print_one()
+            single.print_one()
+            return False
+        if fused.pc == 0:
+            break
+    print( "fusion ok after %d steps, test value: %02X" % ( steps, test_index))
+    return True
+
+
+def test_scheduler( test_index, period = 7):
+    # a periodic event must not change the program,
+    # it is called once per period at the next command boundary
+    plain     = Register()
+    scheduled = Register()
+    mem_plain     = Memory()
+    mem_scheduled = Memory()
+    mem_plain.load( 'binary.bin', org)
+    mem_scheduled.load( 'binary.bin', org)
+    for cpu_ in ( plain, scheduled):
+        cpu_.set_hl( test_index)
+        cpu_.set_pc( org)
+        cpu_.set_sp( 0xfffe)
+
+    ticks = []
+    scheduler = Scheduler( scheduled)
+    def tick():
+        ticks.append( ( scheduler.time(), scheduled.cycles))
+        scheduler.after( period, tick)
+    scheduler.at( period, tick)
+
+    plain.run( mem_plain, ios, stop_pc = [ 0])
+    scheduled.run( mem_scheduled, ios, stop_pc = [ 0])
+    late = [ cycles - cycle for cycle, cycles in ticks if not 0 <= cycles - cycle < 24]
+    if plain.get_state() != scheduled.get_state() or plain.cycles != scheduled.cycles \
+       or len( ticks) != scheduled.cycles // period or late:
+        print( "scheduler failed, test value: %02X, %d ticks in %d T-states" % ( test_index, len( ticks), scheduled.cycles))
+        return False
+    print( "scheduler ok after %d ticks, test value: %02X" % ( len( ticks), test_index))
+    return True
+
+
+def test_interrupt( mode, period = 1000, count = 100):
+    # a timer interrupts a HALT loop, the handler counts in B,
+    # the halted cpu has to skip to each tick instead of stepping
+    mem_int = Memory()
+    # LD SP,8000h / IM mode / LD A,12h / LD I,A / EI / HALT / JR -3
+    mem_int.store( bytes( [ 0x31, 0x00, 0x80, 0xed, ( 0x46, 0x56, 0x5e)[ mode],
+                            0x3e, 0x12, 0xed, 0x47, 0xfb, 0x76, 0x18, 0xfd]), 0)
+    # handler at 38h and at 5000h by the IM 2 vector at 12FEh: INC B / EI / RETI
+    mem_int.store( bytes( [ 0x04, 0xfb, 0xed, 0x4d]), 0x38)
+    mem_int.store( bytes( [ 0x04, 0xfb, 0xed, 0x4d]), 0x5000)
+    mem_int.write16( 0x12fe, 0x5000)
+
+    cpu_int = Register()
+    scheduler = Scheduler( cpu_int)
+    def tick():
+        cpu_int.interrupt( 0xfe if mode == 2 else 0xff)
+        scheduler.after( period, tick)
+    scheduler.at( period, tick)
+
+    result = cpu_int.run( mem_int, ios, max_cycles = period * count + period // 2)
+    ticks = cpu_int.bc >> 8
+    if ticks != count or result.steps > count * 10:
+        print( "interrupt failed, IM %d: %d ticks in %d steps" % ( mode, ticks, result.steps))
+        return False
+    print( "interrupt ok, IM %d: %d ticks in %d steps" % ( mode, ticks, result.steps))
+    return True
+
+
+class StatusPort:
+    "input port for test_idle, set by an event"
+
+    stable_read = True
+
+    def __init__( self, address):
+        self.address = address
+        self.value = 0
+        self.writes = 0
+
+    def read( self, address):
+        return self.value
+
+    def write( self, address, data):
+        self.writes += 1
+
+    def dump( self):
+        print( "STATUS %04X: %02X" % ( self.address, self.value))
+
+
+def test_idle( ready = 100003, end = 200000):
+    # a polling loop waits for an event, run() skips the idle passes,
+    # the traced execute() steps through them, both must end alike
+    results = []
+    for skip in ( True, False):
+        mem_idle = Memory()
+        # poll: IN A,(10h) / AND 1 / JR Z,poll / INC B / JR $
+        mem_idle.store( bytes( [ 0xdb, 0x10, 0xe6, 0x01, 0x28, 0xfa, 0x04, 0x18, 0xfe]), 0)
+        cpu_idle = Register()
+        status = StatusPort( 0x10)
+        ios_idle = IOBus()
+        ios_idle.register( status)
+        scheduler = Scheduler( cpu_idle)
+        def set_ready():
+            status.value = 1
+        scheduler.at( ready, set_ready)
+        if skip:
+            steps = cpu_idle.run( mem_idle, ios_idle, None, max_cycles = end).steps
+        else:
+            steps = 0
+            while cpu_idle.cycles < end:
+                cpu_idle.execute( mem_idle, ios_idle)
+                steps += 1
+        results.append( ( cpu_idle.get_state(), cpu_idle.cycles, steps))
+    if results[ 0][ : 2] != results[ 1][ : 2] or results[ 0][ 2] > 100:
+        print( "idle loop failed: %r" % results)
+        return False
+    print( "idle loop ok, %d steps instead of %d" % ( results[ 0][ 2], results[ 1][ 2]))
+    return True
+
+
+def test_idle_patch( patch = 50003, end = 100000):
+    # an event turns IN A,(10h) of a polling loop into OUT (10h),A,
+    # which takes as long, the loop must not be skipped any more
+    results = []
+    for skip in ( True, False):
+        mem_idle = Memory()
+        # poll: IN A,(10h) / AND 1 / JR Z,poll
+        mem_idle.store( bytes( [ 0xdb, 0x10, 0xe6, 0x01, 0x28, 0xfa]), 0)
+        cpu_idle = Register()
+        status = StatusPort( 0x10)
+        ios_idle = IOBus()
+        ios_idle.register( status)
+        scheduler = Scheduler( cpu_idle)
+        def set_out():
+            mem_idle.write( 0, 0xd3)
+        scheduler.at( patch, set_out)
+        if skip:
+            cpu_idle.run( mem_idle, ios_idle, None, max_cycles = end)
+        else:
+            while cpu_idle.cycles < end:
+                cpu_idle.execute( mem_idle, ios_idle)
+        results.append( ( cpu_idle.get_state(), cpu_idle.cycles, status.writes))
+    if results[ 0] != results[ 1] or not results[ 0][ 2]:
+        print( "patched idle loop failed: %r" % results)
+        return False
+    print( "patched idle loop ok, %d writes" % results[ 0][ 2])
+    return True
+
+
+def test_delay( period = 3001, end = 300000):
+    # countdown loops, run() does the passes in one go, the traced
+    # execute() steps through them, events land on the same cycle
+    results = []
+    for skip in ( True, False):
+        mem_delay = Memory()
+        # LD C,3 / LD B,0 / DJNZ $ / DEC C / JR NZ / LD BC,1234h /
+        # DEC BC / LD A,B / OR C / JR NZ / INC E / JR 0
+        mem_delay.store( bytes( [ 0x0e, 0x03, 0x06, 0x00, 0x10, 0xfe, 0x0d, 0x20, 0xf9,
+                                  0x01, 0x34, 0x12, 0x0b, 0x78, 0xb1, 0x20, 0xfb,
+                                  0x1c, 0x18, 0xec]), 0)
+        cpu_delay = Register()
+        ios_delay = IOBus()
+        scheduler = Scheduler( cpu_delay)
+        log = []
+        def tick():
+            log.append( ( scheduler.time(), cpu_delay.pc, cpu_delay.bc))
+            scheduler.after( period, tick)
+        scheduler.at( period, tick)
+        if skip:
+            steps = cpu_delay.run( mem_delay, ios_delay, None, max_cycles = end).steps
+        else:
+            steps = 0
+            while cpu_delay.cycles < end:
+                cpu_delay.execute( mem_delay, ios_delay)
+                steps += 1
+        results.append( ( cpu_delay.get_state(), cpu_delay.cycles, log, steps))
+    if results[ 0][ : 3] != results[ 1][ : 3]:
+        print( "delay loop failed: %r" % ( results[ 0][ : 2] + results[ 1][ : 2],))
+        return False
+    print( "delay loop ok, %d steps instead of %d" % ( results[ 0][ 3], results[ 1][ 3]))
+    return True
+
+
+def test_delay_patch():
+    # the program turns the NOP of its delay loop into INC D, the
+    # loop must not be skipped with the old body
+    results = []
+    for skip in ( True, False):
+        mem_patch = Memory()
+        # LD B,0Ah / NOP / DJNZ -3 / LD A,14h / LD (0002h),A /
+        # INC C / LD A,C / CP 2 / JR NZ,0 / HALT
+        mem_patch.store( bytes( [ 0x06, 0x0a, 0x00, 0x10, 0xfd, 0x3e, 0x14, 0x32, 0x02, 0x00,
+                                  0x0c, 0x79, 0xfe, 0x02, 0x20, 0xf0, 0x76]), 0)
+        cpu_patch = Register()
+        ios_patch = IOBus()
+        if skip:
+            cpu_patch.run( mem_patch, ios_patch, stop_pc = [ 0x10])
+        else:
+            while cpu_patch.pc != 0x10:
+                cpu_patch.execute( mem_patch, ios_patch)
+        results.append( ( cpu_patch.get_state(), cpu_patch.cycles))
+    if results[ 0] != results[ 1] or results[ 0][ 0][ 5] >> 8 != 0x0a:
+        print( "patched delay loop failed: %r" % results)
+        return False
+    print( "patched delay loop ok")
+    return True
+
+
+def test_operand_patch():
+    # the program rewrites the immediate byte of ADD A,n and the
+    # displacement of ADD A,(IX+d), the operands bound at decode
+    # have to follow
+    # LD IX,0180h / LD A,0 / ADD A,1 / ADD A,(IX+0) / LD (0007h),A /
+    # INC A / LD (000Ah),A / INC C / LD A,C / CP 4 / JR NZ,4 / HALT
+    code = bytes( [ 0xdd, 0x21, 0x80, 0x01, 0x3e, 0x00, 0xc6, 0x01, 0xdd, 0x86, 0x00,
+                    0x32, 0x07, 0x00, 0x3c, 0x32, 0x0a, 0x00, 0x0c, 0x79, 0xfe, 0x04,
+                    0x20, 0xec, 0x76])
+    data = bytes( [ ( address * 7) & 0x1f for address in range( 0x100, 0x200)])
+    n, d = 1, 0
+    for count in range( 4):
+        n = ( n + data[ 0x80 + ( d - 256 if d > 127 else d)]) & 0xff
+        d = ( n + 1) & 0xff
+    results = []
+    for skip in ( True, False):
+        mem_patch = Memory()
+        mem_patch.store( code, 0)
+        mem_patch.store( data, 0x100)
+        cpu_patch = Register()
+        ios_patch = IOBus()
+        if skip:
+            cpu_patch.run( mem_patch, ios_patch, stop_pc = [ 0x18])
+        else:
+            while cpu_patch.pc != 0x18:
+                cpu_patch.execute( mem_patch, ios_patch)
+        results.append( ( mem_patch.read( 0x07), mem_patch.read( 0x0a)))
+    if results != [ ( n, d)] * 2:
+        print( "patched operands failed: %r, expected %r" % ( results, ( n, d)))
+        return False
+    print( "patched operands ok")
+    return True
+
+
+def test_block_moves():
+    # LDIR, LDDR and CPIR done in one go against a byte by byte
+    # reference, with overlapping ranges and wrapping at 0FFFFh
+    data = bytes( ( address * 13 + ( address >> 8)) & 0xff for address in range( 0x10000))
+    # ( opcode, hl, de, bc), LDIR at 0B0h, LDDR at 0B8h
+    moves = [ ( 0xb0, 0x1000, 0x1001, 0x100), ( 0xb0, 0x1000, 0x1003, 0x100),
+              ( 0xb0, 0x1003, 0x1000, 0x100), ( 0xb8, 0x1100, 0x10ff, 0x100),
+              ( 0xb8, 0x1100, 0x10fd, 0x100), ( 0xb0, 0xfff0, 0x0004, 0x20),
+              ( 0xb0, 0xfff8, 0xfffa, 0x20), ( 0xb8, 0x0008, 0x000a, 0x20),
+              ( 0xb8, 0x0004, 0xfff0, 0x20)]
+    ios_block = IOBus()
+    for opcode, hl, de, bc in moves:
+        step = 1 if opcode == 0xb0 else -1
+        expected = bytearray( data)
+        source, dest = hl, de
+        for count in range( bc):
+            expected[ dest] = expected[ source]
+            source = ( source + step) & 0xffff
+            dest = ( dest + step) & 0xffff
+        expected[ 0x8000 : 0x8003] = bytes( [ 0xed, opcode, 0x76])
+        mem_block = Memory()
+        mem_block.store( data, 0)
+        mem_block.store( bytes( [ 0xed, opcode, 0x76]), 0x8000)
+        cpu_block = Register()
+        cpu_block.set_hl( hl)
+        cpu_block.set_de( de)
+        cpu_block.set_bc( bc)
+        cpu_block.set_pc( 0x8000)
+        cpu_block.run( mem_block, ios_block, stop_pc = [ 0x8002])
+        result = ( mem_block.read_block( 0, 0x10000), cpu_block.hl, cpu_block.de, cpu_block.bc, cpu_block.cycles)
+        if result != ( bytes( expected), source, dest, 0, 21 * bc - 5):
+            print( "block move %02X %04X %04X %04X failed" % ( opcode, hl, de, bc))
+            return False
+    # ( a, hl, bc) for CPIR
+    searches = [ ( data[ 0x2010], 0x2000, 0x100), ( 0x100, 0x2000, 0x40),
+                 ( data[ 0x0004], 0xfff0, 0x40), ( data[ 0xfff8], 0xfff0, 0x40)]
+    for a, hl, bc in searches:
+        a &= 0xff
+        address, count, found = hl, bc, False
+        while count and not found:
+            found = data[ address] == a
+            address = ( address + 1) & 0xffff
+            count -= 1
+        mem_block = Memory()
+        mem_block.store( data, 0)
+        mem_block.store( bytes( [ 0xed, 0xb1, 0x76]), 0x8000)
+        cpu_block = Register()
+        cpu_block.a = a
+        cpu_block.set_hl( hl)
+        cpu_block.set_bc( bc)
+        cpu_block.set_pc( 0x8000)
+        cpu_block.run( mem_block, ios_block, stop_pc = [ 0x8002])
+        result = ( cpu_block.hl, cpu_block.bc, bool( cpu_block.f & mask_zero), bool( cpu_block.f & mask_par))
+        if result != ( address, count, found, count != 0):
+            print( "block compare %02X %04X %04X failed: %r" % ( a, hl, bc, result))
+            return False
+    print( "block moves ok")
+    return True
+
+
+def test_block_deadline( event = 1000):
+    # an event in the middle of a long LDIR, run() stops the passes
+    # at the first one reaching it as the traced execute() does
+    results = []
+    for skip in ( True, False):
+        mem_block = Memory()
+        mem_block.store( bytes( [ 0xed, 0xb0, 0x76]), 0x8000)
+        cpu_block = Register()
+        cpu_block.set_hl( 0x1000)
+        cpu_block.set_de( 0x2000)
+        cpu_block.set_bc( 0x1000)
+        cpu_block.set_pc( 0x8000)
+        ios_block = IOBus()
+        scheduler = Scheduler( cpu_block)
+        log = []
+        scheduler.at( event, lambda: log.append( ( cpu_block.cycles, cpu_block.bc)))
+        if skip:
+            cpu_block.run( mem_block, ios_block, stop_pc = [ 0x8002])
+        else:
+            while cpu_block.pc != 0x8002:
+                cpu_block.execute( mem_block, ios_block)
+        results.append( ( log, cpu_block.cycles))
+    passes = -( -event // 21)
+    expected = ( [ ( 21 * passes, 0x1000 - passes)], 21 * 0x1000 - 5)
+    if results != [ expected] * 2:
+        print( "block deadline failed: %r, expected %r" % ( results, expected))
+        return False
+    print( "block deadline ok")
+    return True
+
+
+def test_banked():
+    # a routine at 0C000h in two pages switched by a port, the code
+    # decoded from the first page must not run after the switch, and
+    # writes into the ROM page are ignored
+    # CALL 0C000h / LD B,A / LD A,4 / OUT (10h),A / CALL 0C000h / LD C,A /
+    # LD A,0AAh / LD (0100h),A / LD (0C010h),A / LD A,3 / OUT (10h),A /
+    # LD A,(0C010h) / LD E,A / IN A,(10h) / LD D,A / HALT
+    code = bytes( [ 0xcd, 0x00, 0xc0, 0x47, 0x3e, 0x04, 0xd3, 0x10, 0xcd, 0x00, 0xc0,
+                    0x4f, 0x3e, 0xaa, 0x32, 0x00, 0x01, 0x32, 0x10, 0xc0, 0x3e, 0x03,
+                    0xd3, 0x10, 0x3a, 0x10, 0xc0, 0x5f, 0xdb, 0x10, 0x57, 0x76])
+    results = []
+    for skip in ( True, False):
+        mem_bank = BankedMemory()
+        mem_bank.store_page( code, 0)
+        mem_bank.set_rom( 0)
+        # LD A,1 / RET in page 3, LD A,2 / RET in page 4
+        mem_bank.store_page( bytes( [ 0x3e, 0x01, 0xc9]), 3)
+        mem_bank.store_page( bytes( [ 0x55]), 3, 0x10)
+        mem_bank.store_page( bytes( [ 0x3e, 0x02, 0xc9]), 4)
+        ios_bank = IOBus()
+        ios_bank.register( BankSelect( mem_bank, 0x10, 3))
+        cpu_bank = Register()
+        cpu_bank.set_sp( 0x8000)
+        if skip:
+            cpu_bank.run( mem_bank, ios_bank, stop_pc = [ 0x1f])
+        else:
+            while cpu_bank.pc != 0x1f:
+                cpu_bank.execute( mem_bank, ios_bank)
+        results.append( ( cpu_bank.bc, cpu_bank.de, mem_bank.physical[ 0x100], mem_bank.physical[ 4 * 0x4000 + 0x10]))
+    expected = ( 0x0102, 0x0355, 0x00, 0xaa)
+    if results != [ expected] * 2:
+        print( "banked memory failed: %r, expected %r" % ( results, expected))
+        return False
+    print( "banked memory ok")
+    return True
+
+
+def test_load_mmap():
+    # the mapped image against load(), an empty file and close()
+    # while a slice of the view is still held
+    mem_file = Memory()
+    mem_file.load( 'binary.bin', org)
+    mem_map = Memory()
+    view = mem_map.load_mmap( 'binary.bin', org)
+    if mem_map.mem != mem_file.mem or bytes( view) != mem_file.read_block( org, len( view)):
+        print( "load_mmap failed")
+        return False
+    part = view[ : 4]
+    used = mem_map.close()
+    part.release()
+    if used != 1 or mem_map.close() != 0:
+        print( "load_mmap failed to close: %d images in use" % used)
+        return False
+    with tempfile.NamedTemporaryFile() as empty:
+        if len( mem_map.load_mmap( empty.name, org)) != 0 or mem_map.images:
+            print( "load_mmap failed on an empty file")
+            return False
+    print( "load_mmap ok")
+    return True
+
+
+def test_index_registers():
+    # the same program on HL, IX and IY, the undocumented IXH/IXL
+    # commands have to end like H/L
+    # LD HL,1234h / LD H,56h / INC L / LD A,H / ADD A,L / LD L,A /
+    # INC HL / LD H,L / ADD HL,HL / DEC H / SUB H / DEC HL
+    program = [ [ 0x21, 0x34, 0x12], [ 0x26, 0x56], [ 0x2c], [ 0x7c], [ 0x85], [ 0x6f],
+                [ 0x23], [ 0x65], [ 0x29], [ 0x25], [ 0x94], [ 0x2b]]
+    results = []
+    for prefix, name in ( ( [], "hl"), ( [ 0xdd], "ix"), ( [ 0xfd], "iy")):
+        code = bytes( sum( ( prefix + command for command in program), []))
+        mem_index = Memory()
+        mem_index.store( code, 0)
+        cpu_index = Register()
+        cpu_index.run( mem_index, IOBus(), stop_pc = [ len( code)])
+        results.append( ( getattr( cpu_index, name), cpu_index.a, cpu_index.f))
+    if results.count( results[ 0]) != len( results):
+        print( "index register failed: %r" % ( results,))
+        return False
+    print( "index register ok")
+    return True
+
+
+def test_flags_spec( count = 20):
+    # the flags of each command against the flags column of Spec.py,
+    # those kept, reset or set ( -, 0, 1), from random registers
+    pages = ( ( [], main_spec, main_known), ( [ 0xcb], cb_spec, cb_known), ( [ 0xed], ed_spec, ed_known),
+              ( [ 0xdd], dd_spec, dd_known), ( [ 0xfd], fd_spec, fd_known))
+    values = random.Random( 5)
+    mem_flags = Memory()
+    mem_flags.store( bytes( values.randrange( 256) for address in range( 0x10000)), 0)
+    ios_flags = IOBus()
+    failed = []
+    for prefix, spec, known in pages:
+        for item in spec:
+            # a prefix runs the command behind it
+            if not known[ item.code] or item.text in ( "CB", "DD", "ED", "FD"):
+                continue
+            for step in range( count):
+                mem_flags.store( bytes( prefix + [ item.code] + [ values.randrange( 256) for index in range( 3)]), 0x4000)
+                cpu_flags = Register()
+                cpu_flags.set_pc( 0x4000)
+                cpu_flags.set_sp( values.randrange( 0x8000, 0xc000))
+                for name in ( "bc", "de", "hl", "ix", "iy"):
+                    setattr( cpu_flags, name, values.randrange( 0x10000))
+                if prefix == [ 0xed] and item.code & 0xf4 == 0xb0:
+                    # a few repeats of the block commands
+                    cpu_flags.set_bc( values.randrange( 1, 4))
+                cpu_flags.a = values.randrange( 256)
+                flags = cpu_flags.f = values.randrange( 256)
+                cpu_flags.execute( mem_flags, ios_flags, False)
+                changed = flags ^ cpu_flags.f
+                for bit, kind in zip( range( 7, -1, -1), item.flags):
+                    mask = 1 << bit
+                    if ( kind == "-" and changed & mask) or ( kind == "0" and cpu_flags.f & mask) or \
+                       ( kind == "1" and not cpu_flags.f & mask):
+                        failed.append( "%s %s" % ( bytes( prefix + [ item.code]).hex().upper(), item.text))
+                        break
+                else:
+                    continue
+                break
+    if failed:
+        print( "flags against the spec failed: %s" % ", ".join( failed))
+        return False
+    print( "flags against the spec ok")
+    return True
+
+
+def test_disassembler( test_index, max_steps = 100000):
+    # every executed command has to continue behind its length,
+    # at one of its targets or after a return
+    disassembler = Disassembler( mem)
+    cpu_dis = Register()
+    cpu_dis.set_hl( test_index)
+    cpu_dis.set_pc( org)
+    cpu_dis.set_sp( 0xfffe)
+    steps = 0
+    while cpu_dis.pc != 0 and steps < max_steps:
+        line = disassembler.line( cpu_dis.pc)
+        cpu_dis.execute( mem, ios, False)
+        steps += 1
+        if cpu_dis.pc == ( line.address + line.length) & 0xffff:
+            continue
+        if cpu_dis.pc in line.targets or line.kind == "return":
+            continue
+        print( "disassembler failed at %04X: %s, next %04X" % ( line.address, line.mnemonic, cpu_dis.pc))
+        return False
+    start = time.time()
+    lines = disassembler.disassemble( 0, 0x10000)
+    print( "disassembler ok, %d steps, cache %d/%d, 64K in %d commands, %.3f s" %
+           ( steps, disassembler.hits, disassembler.misses, len( lines), time.time() - start))
+    return True
+
+
+def test_analyzer( analyzer, test_index, max_steps = 100000):
+    # every executed command has to be known, a jump, call or
+    # return has to land on a block start
+    cpu_flow = Register()
+    cpu_flow.set_hl( test_index)
+    cpu_flow.set_pc( org)
+    cpu_flow.set_sp( 0xfffe)
+    steps = 0
+    while cpu_flow.pc != 0 and steps < max_steps:
+        line = analyzer.lines.get( cpu_flow.pc)
+        if line is None:
+            print( "analyzer failed, %04X not found" % cpu_flow.pc)
+            return False
+        cpu_flow.execute( mem, ios, False)
+        steps += 1
+        if line.kind is not None and cpu_flow.pc != 0 and cpu_flow.pc not in analyzer.blocks:
+            print( "analyzer failed, %04X after %s is no block" % ( cpu_flow.pc, line.mnemonic))
+            return False
+    return True
+
+
+def test_recorder( test_index, size = 16):
+    # the recorded entries against the registers before each command,
+    # run() stops and dumps at the breakpoint
+    cpu_rec = Register()
+    recorder = FlightRecorder( cpu_rec, size, report = lambda line: None)
+    cpu_rec.set_hl( test_index)
+    cpu_rec.set_pc( org)
+    cpu_rec.set_sp( 0xfffe)
+    states = []
+    while cpu_rec.pc != 0:
+        states.append( ( cpu_rec.pc, ( cpu_rec.a << 8) | cpu_rec.f, cpu_rec.bc, cpu_rec.de,
+                         cpu_rec.hl, cpu_rec.ix, cpu_rec.iy, cpu_rec.sp))
+        cpu_rec.execute( mem, ios, False)
+    recorded = [ registers for registers, data in recorder.entries()]
+    if recorded != states[ -size :] or recorder.count != len( states):
+        print( "recorder failed: %d of %d commands" % ( recorder.count, len( states)))
+        return False
+    recorder.set_breakpoints( [ states[ -1][ 0]])
+    cpu_rec.set_pc( org)
+    cpu_rec.set_sp( 0xfffe)
+    result = cpu_rec.run( mem, ios, stop_pc = [ 0])
+    if result.pc != states[ -1][ 0] or recorder.dumps != 1:
+        print( "recorder failed at breakpoint %04X: %r" % ( states[ -1][ 0], result))
+        return False
+
+    # run() has to record the same, the fused pairs as two commands
+    cpu_run = Register()
+    recorder = FlightRecorder( cpu_run, size, report = lambda line: None)
+    cpu_run.set_hl( test_index)
+    cpu_run.set_pc( org)
+    cpu_run.set_sp( 0xfffe)
+    cpu_run.run( mem, ios, stop_pc = [ 0])
+    recorded = [ registers for registers, data in recorder.entries()]
+    if recorded != states[ -size :] or recorder.count != len( states):
+        print( "recorder failed in run(): %d of %d commands" % ( recorder.count, len( states)))
+        return False
+    return True
+
+def test_recorder_loop():
+    # a delay loop is recorded pass by pass, not skipped
+    # LD B,0Ah / DJNZ $ / HALT
+    mem_loop = Memory()
+    mem_loop.store( bytes( [ 0x06, 0x0a, 0x10, 0xfe, 0x76]), 0)
+    cpu_loop = Register()
+    recorder = FlightRecorder( cpu_loop, 16, report = lambda line: None)
+    cpu_loop.run( mem_loop, IOBus(), stop_pc = [ 4])
+    pcs = [ registers[ 0] for registers, data in recorder.entries()]
+    if pcs != [ 0] + [ 2] * 10:
+        print( "recorder failed in a delay loop: %r" % pcs)
+        return False
+    return True
 
 
 
@@ -163,6 +803,97 @@ if 0:
         if test_index % 16 == 15:
             print()
 
+# differential test, compiled blocks against the interpreter
+if 0:
+    for test_index in range( 256):
+        if not test_compiler( test_index):
+            break
+
+# differential test, fused pairs against single commands
+if 0:
+    for test_index in range( 256):
+        if not test_fusion( test_index):
+            break
+
+# periodic event during the test program
+if 0:
+    for test_index in range( 256):
+        if not test_scheduler( test_index):
+            break
+
+# timer interrupts in IM 0, 1 and 2
+if 0:
+    for mode in range( 3):
+        test_interrupt( mode)
+
+# polling loop skipped up to the event
+if 0:
+    test_idle()
+    test_idle_patch()
+
+# countdown loops done in one go
+if 0:
+    test_delay()
+    test_delay_patch()
+
+# operands bound at decode
+if 0:
+    test_operand_patch()
+
+# block commands in one go
+if 0:
+    test_block_moves()
+    test_block_deadline()
+
+# bank switching by a port
+if 0:
+    test_banked()
+
+# IX and IY with the undocumented IXH/IXL commands
+if 0:
+    test_index_registers()
+
+# flags against the spec
+if 0:
+    test_flags_spec()
+
+# disassembly against the executed program
+if 0:
+    for test_index in range( 0, 256, 16):
+        if not test_disassembler( test_index):
+            break
+    for line in Disassembler( mem).listing( org, org + 32):
+        print( line)
+
+# control flow of the test program against its execution
+if 0:
+    analyzer = Analyzer( mem, org, org + 0x100)
+    print( "analyzer: %d blocks" % analyzer.analyze( [ org]))
+    for test_index in range( 256):
+        if not test_analyzer( analyzer, test_index):
+            break
+    else:
+        print( "analyzer ok")
+    analyzer.dump()
+
+# flight recorder against the executed program
+if 0:
+    for test_index in range( 256):
+        if not test_recorder( test_index):
+            break
+    else:
+        if test_recorder_loop():
+            print( "recorder ok")
+    cpu_rec = Register()
+    FlightRecorder( cpu_rec, 8).set_breakpoints( [ 0x0141])
+    cpu_rec.set_hl( 0x21)
+    cpu_rec.set_pc( org)
+    cpu_rec.run( mem, ios, stop_pc = [ 0])
+
+# loading memory mapped images
+if 0:
+    test_load_mmap()
+
 
 if 1:
     # Test single command, verbose